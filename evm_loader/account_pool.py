@@ -0,0 +1,325 @@
+"""Pool of holder and storage accounts for iterative transactions.
+
+Creating a 128 KiB account per transaction costs an extra confirmed transaction and
+leaks its rent. AccountPool creates `size` accounts once, with seeds derived from their
+index the same way the evm_loader derives holder seeds from the holder id, and leases
+them to transactions in flight. A storage account is only handed out when its header is
+Empty or FinalizedStorage; one still holding a Storage header belongs to an iterative
+call in progress (or an abandoned one) and is set aside as busy. Busy accounts are
+checked again when the pool runs dry, so finished calls come back; abandoned ones are
+cancelled with CancelWithNonce by cancel_busy(). The pool is kept in a JSON file, so it
+survives process restarts.
+"""
+import base64
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+from construct import Bytes, Int64ul, Struct as cStruct
+from sha3 import keccak_256
+from solana.publickey import PublicKey
+from solana.rpc.types import TxOpts
+from solana.transaction import AccountMeta, Transaction, TransactionInstruction
+from spl.token.constants import TOKEN_PROGRAM_ID
+
+from confirmation import confirm_transactions
+from program_address import program_address_cache
+from solana_utils import CANCEL_HEADER, accountWithSeed, associated_token_address, createAccountWithSeed, \
+    incinerator, keccakprog, rentid, sysinstruct, system, sysvarclock
+
+EMPTY_TAG = 0
+STORAGE_TAG = 3
+FINALIZED_STORAGE_TAG = 5
+
+STORAGE_LAYOUT = cStruct(
+    "caller" / Bytes(20),
+    "nonce" / Int64ul,
+    "gas_limit" / Int64ul,
+    "gas_price" / Int64ul,
+    "slot" / Int64ul,
+    "operator" / Bytes(32),
+    "accounts_len" / Int64ul,
+    "executor_data_size" / Int64ul,
+    "evm_data_size" / Int64ul,
+    "gas_used_and_paid" / Int64ul,
+    "number_of_payments" / Int64ul,
+    "sign" / Bytes(65),
+)
+
+FINALIZED_STORAGE_LAYOUT = cStruct(
+    "sender" / Bytes(20),
+    "sign" / Bytes(65),
+)
+
+# the tag and the largest header that is decoded
+HEADER_SIZE = 1 + STORAGE_LAYOUT.sizeof()
+# createAccountWithSeed instructions per transaction
+CREATE_BATCH = 4
+# seconds between two header checks of the busy storage accounts by lease()
+RECHECK_INTERVAL = 1.0
+# accounts of a stored call that CancelWithNonce does not write
+READONLY_ACCOUNTS = {system, sysinstruct, sysvarclock, rentid, keccakprog, str(TOKEN_PROGRAM_ID)}
+
+
+def _seed(prefix, index):
+    index_bytes = index.to_bytes((index.bit_length() + 7) // 8, 'big')
+    return keccak_256(prefix + index_bytes).hexdigest()[:32]
+
+
+def holder_seed(holder_id):
+    """The seed the evm_loader expects for the holder of `holder_id` (see WriteHolder)."""
+    return _seed(b'holder', holder_id)
+
+
+def storage_seed(index):
+    return _seed(b'storage', index)
+
+
+def decode_header(data):
+    """(tag, Storage or FinalizedStorage container or None) of an evm_loader account."""
+    if not data:
+        return (EMPTY_TAG, None)
+    tag = data[0]
+    if tag == STORAGE_TAG:
+        return (tag, STORAGE_LAYOUT.parse(data[1:1 + STORAGE_LAYOUT.sizeof()]))
+    if tag == FINALIZED_STORAGE_TAG:
+        return (tag, FINALIZED_STORAGE_LAYOUT.parse(data[1:1 + FINALIZED_STORAGE_LAYOUT.sizeof()]))
+    return (tag, None)
+
+
+class PoolAccount(NamedTuple):
+    index: int
+    seed: str
+    pubkey: PublicKey
+
+
+class AccountPool:
+    SEEDS = {'holder': holder_seed, 'storage': storage_seed}
+
+    def __init__(self, rpc, blockhash_provider, signer, program_id, kind, size, space=128 * 1024, path=None):
+        """rpc is an rpc_client.RpcClient; kind is 'holder' or 'storage'."""
+        self.rpc = rpc
+        self.blockhash_provider = blockhash_provider
+        self.signer = signer
+        self.program_id = PublicKey(program_id)
+        self.kind = kind
+        self.space = space
+        self.path = path
+        base = signer.public_key()
+        self.accounts = [PoolAccount(i, self.SEEDS[kind](i), accountWithSeed(base, self.SEEDS[kind](i), self.program_id))
+                         for i in range(size)]
+        self.created = set()
+        # storage accounts found with a Storage header, index -> slot of the iterative call
+        self.busy = {}
+        self._free = deque()
+        self._leased = set()
+        self._cond = threading.Condition()
+        self._load()
+
+    def _state_key(self):
+        return "{}:{}:{}".format(self.kind, self.signer.public_key(), self.program_id)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            state = json.load(f).get(self._state_key(), {})
+        self.created = set(state.get('created', [])) & set(range(len(self.accounts)))
+        self.busy = {index: slot for (index, slot) in state.get('busy', []) if index < len(self.accounts)}
+
+    def save(self):
+        if not self.path:
+            return
+        state = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+        with self._cond:
+            state[self._state_key()] = {'created': sorted(self.created), 'busy': sorted(self.busy.items()),
+                                        'saved_at': int(time.time())}
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(state, f, indent=1)
+        os.replace(self.path + '.tmp', self.path)
+
+    def headers(self, accounts):
+        """{index: account data header, None for accounts that do not exist} in one getMultipleAccounts."""
+        values = self.rpc.get_multiple_accounts([account.pubkey for account in accounts], data_slice=(0, HEADER_SIZE))
+        return {account.index: (base64.b64decode(value['data'][0]) if value is not None else None)
+                for (account, value) in zip(accounts, values)}
+
+    def prepare(self, cancel=False):
+        """Create the missing accounts and put the idle ones into the pool, cancel the busy ones if `cancel`."""
+        headers = self.headers(self.accounts)
+        missing = [account for account in self.accounts if headers[account.index] is None]
+        if missing:
+            self._create(missing)
+        with self._cond:
+            self.created = set(range(len(self.accounts)))
+            self.busy = {}
+            self._free.clear()
+            for account in self.accounts:
+                if account.index in self._leased:
+                    continue
+                (tag, header) = decode_header(headers[account.index])
+                if self.kind == 'storage' and tag == STORAGE_TAG:
+                    self.busy[account.index] = header.slot
+                else:
+                    self._free.append(account)
+            self._cond.notify_all()
+        if self.busy:
+            print("{} pool: {} storage accounts hold an unfinished call".format(self.kind, len(self.busy)))
+            if cancel:
+                self.cancel_busy()
+        self.save()
+        return self
+
+    def _create(self, accounts):
+        lamports = self.rpc.get_minimum_balance_for_rent_exemption(self.space)['result']
+        base = self.signer.public_key()
+        signatures = []
+        for i in range(0, len(accounts), CREATE_BATCH):
+            trx = Transaction()
+            for account in accounts[i:i + CREATE_BATCH]:
+                trx.add(createAccountWithSeed(base, base, account.seed, lamports, self.space, self.program_id))
+            self.blockhash_provider.sign(trx, self.signer)
+            resp = self.rpc.send_raw_transaction(trx.serialize(), opts=TxOpts(skip_confirmation=True,
+                                                                              preflight_commitment="confirmed"))
+            if not resp.get('result'):
+                raise Exception("failed to create {} accounts: {}".format(self.kind, resp.get('error')))
+            signatures.append(resp['result'])
+        for (signature, status) in confirm_transactions(self.rpc, signatures).items():
+            if isinstance(status, Exception):
+                raise status
+        print("{} pool: created {} accounts".format(self.kind, len(accounts)))
+
+    def _idle(self, account):
+        if self.kind != 'storage':
+            return True
+        (tag, header) = decode_header(self.headers([account])[account.index])
+        if tag == STORAGE_TAG:
+            with self._cond:
+                self.busy[account.index] = header.slot
+            return False
+        return True
+
+    def recheck(self):
+        """Return the busy storage accounts whose call has finished to the pool: number of accounts returned."""
+        with self._cond:
+            busy = [self.accounts[index] for index in self.busy if index not in self._leased]
+        if not busy:
+            return 0
+        headers = self.headers(busy)
+        returned = 0
+        with self._cond:
+            for account in busy:
+                if account.index not in self.busy or account.index in self._leased:
+                    continue
+                (tag, header) = decode_header(headers[account.index])
+                if tag == STORAGE_TAG:
+                    self.busy[account.index] = header.slot
+                else:
+                    del self.busy[account.index]
+                    self._free.append(account)
+                    returned += 1
+            if returned:
+                self._cond.notify_all()
+        return returned
+
+    def _exhausted(self):
+        message = "no idle {} account in the pool".format(self.kind)
+        if self.busy:
+            message += ": {} storage accounts hold an unfinished call ({}), run with --cancel_abandoned to " \
+                       "cancel them with CancelWithNonce".format(
+                           len(self.busy), ", ".join("{} slot {}".format(self.accounts[index].pubkey, slot)
+                                                     for (index, slot) in sorted(self.busy.items())))
+        return message
+
+    def lease(self, timeout=None):
+        """Take an idle account out of the pool, wait up to `timeout` seconds for one."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        rechecked = None
+        while True:
+            account = None
+            with self._cond:
+                while not self._free and not (self.busy and (rechecked is None or
+                                                             time.monotonic() - rechecked >= RECHECK_INTERVAL)):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise Exception(self._exhausted())
+                    if self.busy and (remaining is None or remaining > RECHECK_INTERVAL):
+                        remaining = RECHECK_INTERVAL
+                    self._cond.wait(remaining)
+                if self._free:
+                    account = self._free.popleft()
+                    self._leased.add(account.index)
+            if account is None:
+                # the pool ran dry: calls in busy storage accounts may have finished since
+                rechecked = time.monotonic()
+                self.recheck()
+                continue
+            # a storage account is checked every time: the previous call may not have finished
+            if self._idle(account):
+                return account
+            with self._cond:
+                self._leased.discard(account.index)
+
+    def cancel(self, account):
+        """Send CancelWithNonce (0x15) for the call left in a storage account: the signature, None if idle."""
+        (tag, header) = decode_header(self.headers([account])[account.index])
+        if tag != STORAGE_TAG:
+            return None
+        # the keys of the call follow the Storage header
+        value = self.rpc.get_multiple_accounts([account.pubkey], data_slice=(HEADER_SIZE, header.accounts_len * 32))[0]
+        data = base64.b64decode(value['data'][0])
+        stored = [PublicKey(data[i:i + 32]) for i in range(0, len(data), 32)]
+        operator = self.signer.public_key()
+        (caller, _) = program_address_cache.get(self.program_id, header.caller)
+        readonly = READONLY_ACCOUNTS | {str(self.program_id)}
+        keys = [AccountMeta(pubkey=account.pubkey, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=operator, is_signer=True, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(operator), is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(caller), is_signer=False, is_writable=True),
+                AccountMeta(pubkey=PublicKey(incinerator), is_signer=False, is_writable=True),
+                AccountMeta(pubkey=PublicKey(system), is_signer=False, is_writable=False)]
+        keys += [AccountMeta(pubkey=key, is_signer=False, is_writable=str(key) not in readonly) for key in stored]
+        trx = Transaction().add(TransactionInstruction(program_id=self.program_id, keys=keys,
+                                                       data=CANCEL_HEADER.pack(0x15, header.nonce)))
+        self.blockhash_provider.sign(trx, self.signer)
+        resp = self.rpc.send_raw_transaction(trx.serialize(), opts=TxOpts(skip_confirmation=True,
+                                                                          preflight_commitment="confirmed"))
+        if not resp.get('result'):
+            raise Exception("failed to cancel the call of nonce {} in {}: {}".format(header.nonce, account.pubkey,
+                                                                                    resp.get('error')))
+        return resp['result']
+
+    def cancel_busy(self):
+        """Cancel the calls left in the busy storage accounts and return the accounts to the pool."""
+        with self._cond:
+            busy = [self.accounts[index] for index in self.busy if index not in self._leased]
+        signatures = [signature for signature in map(self.cancel, busy) if signature is not None]
+        for (signature, status) in confirm_transactions(self.rpc, signatures).items():
+            if isinstance(status, Exception):
+                print("{} pool: cancel {} failed: {}".format(self.kind, signature, status))
+        returned = self.recheck()
+        print("{} pool: cancelled {} calls, {} accounts returned".format(self.kind, len(signatures), returned))
+        self.save()
+        return returned
+
+    def release(self, account):
+        with self._cond:
+            self._leased.discard(account.index)
+            self.busy.pop(account.index, None)
+            self._free.append(account)
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def leased(self, timeout=None):
+        account = self.lease(timeout)
+        try:
+            yield account
+        finally:
+            self.release(account)
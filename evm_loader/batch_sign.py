@@ -0,0 +1,70 @@
+"""Batch signing of Neon transactions on a process pool.
+
+Transactions are sharded into chunks and signed by worker processes with
+eth_tx_utils.sign_tx(); every worker keeps its own eth_keys key cache. Nonces must be
+assigned by the caller before a tx is handed over, so they stay deterministic per
+sender no matter which worker signs it. Results are streamed back in input order.
+"""
+import multiprocessing
+import os
+from collections import deque
+
+from eth_tx_utils import sign_tx
+
+
+def _sign_chunk(chunk, verify):
+    return [sign_tx(tx, pr_key, verify) for (tx, pr_key) in chunk]
+
+
+def _chunks(items, chunk_size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BatchSigner:
+    def __init__(self, processes=None, chunk_size=256, max_pending=None):
+        """processes=None or 0 uses all cores, processes=1 signs in the calling process."""
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        # bound the number of chunks in flight so a huge workload is not queued at once
+        self.max_pending = max_pending or self.processes * 4
+        self.pool = multiprocessing.Pool(self.processes) if self.processes > 1 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def sign(self, items, verify=False):
+        """Sign (tx dict, private key, context) items and yield (context, (from, sign, msg)) in order.
+
+        `context` never leaves this process, it is just handed back next to the result.
+        """
+        pending = deque()
+        for chunk in _chunks(items, self.chunk_size):
+            contexts = [context for (_, _, context) in chunk]
+            payload = [(tx, pr_key) for (tx, pr_key, _) in chunk]
+            if self.pool is None:
+                yield from zip(contexts, _sign_chunk(payload, verify))
+                continue
+            pending.append((contexts, self.pool.apply_async(_sign_chunk, (payload, verify))))
+            if len(pending) >= self.max_pending:
+                (contexts, result) = pending.popleft()
+                yield from zip(contexts, result.get())
+
+        while pending:
+            (contexts, result) = pending.popleft()
+            yield from zip(contexts, result.get())
@@ -0,0 +1,120 @@
+"""Recent blockhash shared by all transaction builders.
+
+solana.rpc.api.Client.send_transaction() asks the node for a recent blockhash before
+every transaction. BlockhashProvider refreshes it on a background thread instead, and
+get() hands out the freshest one without an RPC round trip. It also keeps the slot the
+blockhash was observed at and its last valid slot, as reported by getFees. When the
+refreshes fail, the blockhash is handed out for at most max_age seconds and only while
+the slot estimated from its age stays clear of the last valid slot.
+"""
+import threading
+import time
+from typing import NamedTuple
+
+from solana.blockhash import Blockhash
+
+# approximate duration of a slot, to estimate the current slot between refreshes
+SLOT_DURATION = 0.4
+# slots a transaction needs to land before its blockhash expires
+LAST_VALID_SLOT_MARGIN = 20
+
+
+class RecentBlockhash(NamedTuple):
+    blockhash: Blockhash
+    slot: int
+    last_valid_slot: int
+    fetched_at: float
+
+
+class BlockhashProvider:
+    def __init__(self, http_client, refresh_interval=1.0, max_age=20, commitment="confirmed",
+                 slot_duration=SLOT_DURATION):
+        self.client = http_client
+        self.refresh_interval = refresh_interval
+        # a blockhash lives for about 150 slots (~60 s); do not hand out one older than max_age seconds
+        self.max_age = max_age
+        self.slot_duration = slot_duration
+        self.commitment = commitment
+        self.refreshes = 0
+        self._recent = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def fetch(self):
+        resp = self.client.get_fees(self.commitment)
+        if not resp.get("result"):
+            raise RuntimeError("failed to get recent blockhash: {}".format(resp.get("error")))
+        value = resp["result"]["value"]
+        # a slot, like the one estimated in current_slot(); lastValidBlockHeight is not comparable
+        recent = RecentBlockhash(Blockhash(value["blockhash"]), resp["result"]["context"]["slot"],
+                                 value.get("lastValidSlot"), time.monotonic())
+        self._recent = recent
+        self.refreshes += 1
+        return recent
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self.fetch()
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name="BlockhashProvider", daemon=True)
+                self._thread.start()
+        return self
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    def stop(self):
+        with self._lock:
+            if self._thread is not None:
+                self._stopped.set()
+                self._thread.join()
+                self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self.refresh_interval):
+            try:
+                self.fetch()
+            except Exception as err:
+                # keep handing out the previous blockhash until it gets too old
+                print("BlockhashProvider: {}".format(err))
+
+    def recent(self):
+        """Return the latest RecentBlockhash, starting the refresh thread on first use."""
+        if self._thread is None:
+            self.start()
+        recent = self._recent
+        age = time.monotonic() - recent.fetched_at
+        if age > self.max_age:
+            raise RuntimeError("recent blockhash {} is stale, last refresh {:.1f}s ago".format(recent.blockhash, age))
+        if recent.last_valid_slot is not None and \
+                self.current_slot() > recent.last_valid_slot - LAST_VALID_SLOT_MARGIN:
+            raise RuntimeError("recent blockhash {} expires at slot {}, current slot is about {}".format(
+                recent.blockhash, recent.last_valid_slot, self.current_slot()))
+        return recent
+
+    def current_slot(self):
+        """Slot of the last refresh plus the slots estimated to have passed since."""
+        recent = self._recent
+        return recent.slot + int((time.monotonic() - recent.fetched_at) / self.slot_duration)
+
+    def get(self):
+        return self.recent().blockhash
+
+    @property
+    def last_valid_slot(self):
+        return self.recent().last_valid_slot
+
+    def sign(self, trx, *signers):
+        trx.recent_blockhash = self.get()
+        trx.sign(*signers)
+        return trx
+
+    def send_transaction(self, trx, *signers, opts=None):
+        """Drop-in for Client.send_transaction() without the getRecentBlockhash request."""
+        self.sign(trx, *signers)
+        if opts is None:
+            return self.client.send_raw_transaction(trx.serialize())
+        return self.client.send_raw_transaction(trx.serialize(), opts=opts)
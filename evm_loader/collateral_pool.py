@@ -0,0 +1,132 @@
+"""Choice of the collateral pool for every transaction in flight.
+
+Every 0x05/0x13/0x14/0x16 instruction takes the collateral pool account writable, so
+transactions given the same pool index are serialized by the write lock on it even
+when nothing else is shared. CollateralPoolScheduler hands out the pools that exist
+(created by `run.py --step create_collateral`, or found on chain) round-robin or
+least-recently-used, and counts how often a pool was given to a transaction while
+another one still had it. IterativePipeline takes a scheduler and holds one pool per
+iterative call; CollateralPool.index_buf and .address are the arguments of
+PartialCallBuilder and create_neon_evm_instr_05_single.
+"""
+import contextlib
+import json
+import os
+import threading
+from typing import NamedTuple
+
+from solana.publickey import PublicKey
+
+from solana_utils import create_collateral_pool_address
+
+# collateral_pool_base::NEON_POOL_COUNT in program/src/config.rs
+NEON_POOL_COUNT = 128
+
+
+class CollateralPool(NamedTuple):
+    index: int
+    address: PublicKey
+
+    @property
+    def index_buf(self):
+        return self.index.to_bytes(4, 'little')
+
+
+def read_collateral_file(path):
+    """Pools listed by erc20.create_collateral_pool, one json object per line."""
+    pools = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                pools[item['index']] = CollateralPool(item['index'], PublicKey(item['account']))
+    return [pools[index] for index in sorted(pools)]
+
+
+def discover_collateral_pools(rpc, path=None, count=NEON_POOL_COUNT):
+    """The pools from `path` if it exists, otherwise the first `count` pool accounts that exist.
+
+    rpc is an rpc_client.RpcClient; the accounts are checked with getMultipleAccounts.
+    """
+    if path and os.path.exists(path):
+        pools = read_collateral_file(path)
+    else:
+        pools = [CollateralPool(index, create_collateral_pool_address(index)) for index in range(count)]
+    values = rpc.get_multiple_accounts([pool.address for pool in pools], data_slice=(0, 0))
+    found = [pool for (pool, value) in zip(pools, values) if value is not None]
+    if not found:
+        raise Exception("no collateral pool account found, run create_collateral first")
+    return found
+
+
+class CollateralPoolScheduler:
+    POLICIES = ('round_robin', 'lru')
+
+    def __init__(self, pools, policy='lru'):
+        if policy not in self.POLICIES:
+            raise Exception("unknown collateral pool policy {}, expected one of {}".format(policy, self.POLICIES))
+        if not pools:
+            raise Exception("CollateralPoolScheduler: no collateral pools")
+        self.pools = list(pools)
+        self.policy = policy
+        self._next = 0
+        self._clock = 0
+        # index -> transactions in flight holding the pool
+        self.in_flight = {pool.index: 0 for pool in self.pools}
+        # index -> clock of the last release
+        self._released = {pool.index: 0 for pool in self.pools}
+        self.assigned = 0
+        # assignments of a pool that another transaction in flight already had
+        self.shared = 0
+        self.max_sharing = 1
+        self._lock = threading.Lock()
+
+    @classmethod
+    def discover(cls, rpc, path=None, count=NEON_POOL_COUNT, policy='lru'):
+        return cls(discover_collateral_pools(rpc, path, count), policy)
+
+    def _choose(self):
+        if self.policy == 'round_robin':
+            pool = self.pools[self._next % len(self.pools)]
+            self._next += 1
+            return pool
+        # the least loaded pool; among those the one released longest ago
+        return min(self.pools, key=lambda pool: (self.in_flight[pool.index], self._released[pool.index]))
+
+    def acquire(self):
+        with self._lock:
+            pool = self._choose()
+            self.assigned += 1
+            if self.in_flight[pool.index] > 0:
+                self.shared += 1
+            self.in_flight[pool.index] += 1
+            self.max_sharing = max(self.max_sharing, self.in_flight[pool.index])
+            return pool
+
+    def release(self, pool):
+        with self._lock:
+            if self.in_flight[pool.index] <= 0:
+                raise Exception("collateral pool {} was not acquired".format(pool.index))
+            self.in_flight[pool.index] -= 1
+            self._clock += 1
+            self._released[pool.index] = self._clock
+
+    @contextlib.contextmanager
+    def use(self):
+        pool = self.acquire()
+        try:
+            yield pool
+        finally:
+            self.release(pool)
+
+    def counters(self):
+        with self._lock:
+            return {'pools': len(self.pools), 'policy': self.policy, 'assigned': self.assigned,
+                    'shared': self.shared, 'max_sharing': self.max_sharing,
+                    'in_flight': sum(self.in_flight.values())}
+
+    def report(self):
+        counters = self.counters()
+        share = counters['shared'] / counters['assigned'] if counters['assigned'] else 0
+        print("collateral pools: {pools} ({policy}), {assigned} assigned, {shared} shared".format(**counters),
+              "({:.1%}), at most {} transactions on one pool".format(share, counters['max_sharing']))
@@ -0,0 +1,168 @@
+"""Batched confirmation of Solana transaction signatures.
+
+Instead of polling getSignatureStatuses with one signature at a time, a
+ConfirmationTracker polls every pending signature in chunks of up to 256 (the RPC
+limit), backs off while nothing changes and resolves a Future per signature as soon as
+it reaches the requested commitment.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+MAX_SIGNATURES_PER_REQUEST = 256
+
+COMMITMENT_RANK = {'processed': 0, 'confirmed': 1, 'finalized': 2}
+
+
+def is_confirmed(status, commitment='confirmed', confirmations=0):
+    if status is None:
+        return False
+    confirmation_status = status.get('confirmationStatus')
+    if confirmation_status == 'finalized':
+        return True
+    if COMMITMENT_RANK.get(confirmation_status, -1) < COMMITMENT_RANK[commitment]:
+        return False
+    return (status.get('confirmations') or 0) >= confirmations
+
+
+class ConfirmationTracker:
+    def __init__(self, http_client, commitment='confirmed', confirmations=0, timeout=30,
+                 min_sleep=0.1, max_sleep=2.0, backoff=1.5):
+        self.client = http_client
+        self.commitment = commitment
+        self.confirmations = confirmations
+        self.timeout = timeout
+        self.min_sleep = min_sleep
+        self.max_sleep = max_sleep
+        self.backoff = backoff
+        self.requests = 0
+        self._pending = {}  # signature -> (future, deadline)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+
+    def add(self, tx_sig, callback=None, timeout=None):
+        """Track a signature; returns a Future resolved with its status or failed on timeout.
+
+        `callback(future)` is called once the signature is resolved.
+        """
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._lock:
+            if tx_sig in self._pending:
+                # the same signature sent twice resolves both futures
+                (previous, _) = self._pending[tx_sig]
+                previous.add_done_callback(lambda f: _copy_result(f, future))
+                return future
+            self._pending[tx_sig] = (future, deadline)
+        self._wakeup.set()
+        return future
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def poll(self):
+        """Run one round of getSignatureStatuses over all pending signatures, return how many got resolved."""
+        with self._lock:
+            signatures = list(self._pending)
+        resolved = 0
+        for i in range(0, len(signatures), MAX_SIGNATURES_PER_REQUEST):
+            chunk = signatures[i:i + MAX_SIGNATURES_PER_REQUEST]
+            # wait() and the background thread may poll at the same time
+            with self._lock:
+                self.requests += 1
+            resp = self.client.get_signature_statuses(chunk)
+            if not resp.get("result"):
+                continue
+            for (tx_sig, status) in zip(chunk, resp['result']['value']):
+                if is_confirmed(status, self.commitment, self.confirmations):
+                    resolved += self._resolve(tx_sig, status)
+
+        now = time.monotonic()
+        with self._lock:
+            expired = [(tx_sig, future) for (tx_sig, (future, deadline)) in self._pending.items() if deadline <= now]
+            for (tx_sig, _) in expired:
+                del self._pending[tx_sig]
+        for (tx_sig, future) in expired:
+            future.set_exception(RuntimeError("could not confirm transaction: ", tx_sig))
+        return resolved + len(expired)
+
+    def _resolve(self, tx_sig, status):
+        with self._lock:
+            item = self._pending.pop(tx_sig, None)
+        if item is None:
+            return 0
+        item[0].set_result(status)
+        return 1
+
+    def _sleep_time(self, sleep_time, resolved):
+        return self.min_sleep if resolved else min(sleep_time * self.backoff, self.max_sleep)
+
+    def wait(self):
+        """Poll in the calling thread until every tracked signature is confirmed or timed out."""
+        sleep_time = self.min_sleep
+        while self.pending():
+            resolved = self.poll()
+            if self.pending():
+                sleep_time = self._sleep_time(sleep_time, resolved)
+                time.sleep(sleep_time)
+
+    def confirm(self, signatures):
+        """Block until all signatures are resolved; return {signature: status or exception}."""
+        futures = [(tx_sig, self.add(tx_sig)) for tx_sig in signatures]
+        if self._thread is None:
+            self.wait()
+        result = {}
+        for (tx_sig, future) in futures:
+            error = future.exception()
+            result[tx_sig] = error if error is not None else future.result()
+        return result
+
+    def start(self):
+        """Poll on a background thread so add() can be used from a send loop."""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="ConfirmationTracker", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        sleep_time = self.min_sleep
+        while not self._stopped.is_set():
+            if not self.pending():
+                self._wakeup.wait()
+                self._wakeup.clear()
+                sleep_time = self.min_sleep
+                continue
+            try:
+                resolved = self.poll()
+            except Exception as err:
+                print("ConfirmationTracker: getSignatureStatuses error {}".format(err))
+                resolved = 0
+            sleep_time = self._sleep_time(sleep_time, resolved)
+            self._stopped.wait(sleep_time)
+
+
+def _copy_result(source, target):
+    error = source.exception()
+    if error is not None:
+        target.set_exception(error)
+    else:
+        target.set_result(source.result())
+
+
+def confirm_transactions(http_client, signatures, confirmations=0, timeout=30):
+    """Confirm many signatures with batched polling; returns {signature: status or exception}."""
+    tracker = ConfirmationTracker(http_client, confirmations=confirmations, timeout=timeout)
+    return tracker.confirm(signatures)
@@ -0,0 +1,166 @@
+"""Compute units and heap used by evm_loader instructions, taken from transaction logs.
+
+Every evm_loader instruction logs `Total memory occupied: N` before it returns and the
+runtime logs `Program <id> consumed X of Y compute units`. parse_receipt() splits the
+logMessages of a confirmed transaction into the top-level invocations and pairs them
+with the instructions of the message, for any instruction type. Instructions without
+logs (the Keccak precompile) and missing lines are tolerated. Profiler adds the numbers
+up per instruction and per Neon transaction (the begin and all continue steps of an
+iterative call), aggregates p50/p95/max per contract and selector, and writes JSON and
+CSV, so profiles of two evm_loader.so builds can be compared.
+"""
+import csv
+import json
+import math
+import re
+from typing import NamedTuple, Optional
+
+from base58 import b58decode
+
+from step_tuner import INVOKE_PATTERN, RESULT_PATTERN, invocation_units, invocations
+
+MEMORY_PATTERN = re.compile(r'Program log: Total memory occupied: ([0-9]+)')
+
+INSTRUCTION_NAMES = {
+    0x05: 'CallFromRawEthereumTX',
+    0x0D: 'PartialCallOrContinueFromRawEthereumTX',
+    0x0E: 'ExecuteTrxFromAccountDataIterativeOrContinue',
+    0x12: 'WriteHolder',
+    0x13: 'PartialCallFromRawEthereumTXv02',
+    0x14: 'ContinueV02',
+    0x15: 'CancelWithNonce',
+    0x16: 'ExecuteTrxFromAccountDataIterativeV02',
+}
+
+
+class InstructionMeasurement(NamedTuple):
+    index: int
+    tag: Optional[int]
+    consumed: Optional[int]
+    limit: Optional[int]
+    memory: Optional[int]
+    success: Optional[bool]
+
+    @property
+    def name(self):
+        return INSTRUCTION_NAMES.get(self.tag, str(self.tag))
+
+
+def _measure(index, program_id, data, logs):
+    (consumed, limit) = invocation_units(program_id, logs) or (None, None)
+    (memory, success) = (None, None)
+    depth = 0
+    for log in logs:
+        invoke = INVOKE_PATTERN.match(log)
+        if invoke:
+            depth = int(invoke.group(2))
+            continue
+        if depth == 1:
+            memory_match = MEMORY_PATTERN.match(log)
+            if memory_match:
+                memory = int(memory_match.group(1))
+        result = RESULT_PATTERN.match(log)
+        if result:
+            if depth == 1 and result.group(1) == program_id:
+                success = result.group(2) == 'success'
+            depth -= 1
+    return InstructionMeasurement(index, data[0] if data else None, consumed, limit, memory, success)
+
+
+def parse_receipt(receipt, program_id):
+    """InstructionMeasurements of the program_id instructions of a getConfirmedTransaction response (or result)."""
+    program_id = str(program_id)
+    result = receipt.get('result', receipt) if receipt else None
+    if not result or 'transaction' not in result:
+        return []
+    message = result['transaction']['message']
+    accounts = message['accountKeys']
+    invoked = invocations((result.get('meta') or {}).get('logMessages') or [])
+    measurements = []
+    for (index, instr) in enumerate(message['instructions']):
+        program = accounts[instr['programIdIndex']]
+        logs = []
+        # precompiles do not log their invocation
+        if invoked and invoked[0][0] == program:
+            logs = invoked.pop(0)[1]
+        if program == program_id:
+            measurements.append(_measure(index, program_id, b58decode(instr['data']), logs))
+    return measurements
+
+
+def percentile(values, q):
+    """Nearest-rank percentile, q in 0..100."""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    return values[max(math.ceil(q / 100 * len(values)) - 1, 0)]
+
+
+def distribution(values):
+    values = [v for v in values if v is not None]
+    return {'count': len(values), 'p50': percentile(values, 50), 'p95': percentile(values, 95),
+            'max': max(values) if values else None}
+
+
+class Profiler:
+    CSV_FIELDS = ('key', 'transaction', 'index', 'tag', 'name', 'consumed', 'limit', 'memory', 'success')
+
+    def __init__(self, program_id):
+        self.program_id = str(program_id)
+        # (key, transaction, InstructionMeasurement)
+        self.rows = []
+        self.receipts = 0
+
+    def add(self, receipt, key, transaction=None):
+        """Measure a receipt; key is the contract and selector (step_tuner.profile_key), transaction identifies
+        the Neon transaction its steps belong to (by default every receipt is one transaction)."""
+        measurements = parse_receipt(receipt, self.program_id)
+        self.receipts += 1
+        if transaction is None:
+            transaction = "receipt{}".format(self.receipts)
+        self.rows.extend((key, transaction, measurement) for measurement in measurements)
+        return measurements
+
+    def transactions(self):
+        """{(key, transaction): (compute units of all steps, the largest heap, steps)}."""
+        result = {}
+        for (key, transaction, m) in self.rows:
+            (consumed, memory, steps) = result.get((key, transaction), (0, None, 0))
+            if m.memory is not None:
+                memory = max(memory or 0, m.memory)
+            result[(key, transaction)] = (consumed + (m.consumed or 0), memory, steps + 1)
+        return result
+
+    def summary(self):
+        """Per key: distributions of compute units per instruction and per transaction, heap and steps."""
+        keys = sorted({key for (key, _, _) in self.rows})
+        transactions = self.transactions()
+        summary = {}
+        for key in keys:
+            rows = [m for (k, _, m) in self.rows if k == key]
+            per_transaction = [value for ((k, _), value) in transactions.items() if k == key]
+            summary[key] = {
+                'instruction_units': distribution([m.consumed for m in rows]),
+                'transaction_units': distribution([consumed for (consumed, _, _) in per_transaction]),
+                'memory': distribution([m.memory for m in rows]),
+                'steps': distribution([steps for (_, _, steps) in per_transaction]),
+                'failed': sum(1 for m in rows if m.success is False),
+            }
+        return summary
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump({'program': self.program_id, 'summary': self.summary()}, f, indent=1, sort_keys=True)
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.CSV_FIELDS)
+            for (key, transaction, m) in self.rows:
+                writer.writerow((key, transaction, m.index, m.tag, m.name, m.consumed, m.limit, m.memory, m.success))
+
+    def report(self):
+        for (key, item) in self.summary().items():
+            units = item['transaction_units']
+            print("{}: {} transactions, units p50 {} p95 {} max {}, heap max {}".format(
+                key, units['count'], units['p50'], units['p95'], units['max'], item['memory']['max']))
@@ -0,0 +1,183 @@
+"""Emulation of Ethereum transactions through neon-cli for many transactions.
+
+neon_cli.emulate() starts a shell for every call and takes the last stdout line.
+EmulatorService runs `neon-cli emulate` without a shell on a pool of worker threads,
+takes the JSON result from whatever the process printed, and caches results by
+(caller, contract, data, value, recent slot). The recent slot is refreshed every
+`slot_interval` seconds, so within that window a repeated call costs nothing. Identical
+requests in flight share one process. This makes emulating every transaction of a
+benchmark affordable, e.g. to predict its writable accounts.
+"""
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple
+
+
+class EmulationResult(NamedTuple):
+    exit_status: str
+    result: str
+    # AccountJSON of cli/src/account_storage.rs
+    accounts: list
+    solana_accounts: list
+    steps_executed: int
+    raw: dict
+
+    @classmethod
+    def from_json(cls, js):
+        return cls(js["exit_status"], js.get("result", ""), js.get("accounts", []), js.get("solana_accounts", []),
+                   js.get("steps_executed", 0), js)
+
+    @property
+    def succeed(self):
+        return self.exit_status == "succeed"
+
+    @property
+    def writable_accounts(self):
+        """Solana accounts the transaction writes: ether accounts, their code accounts and the extra Solana accounts."""
+        result = []
+        for account in self.accounts:
+            if account.get("writable"):
+                result.append(account["account"])
+                if account.get("contract"):
+                    result.append(account["contract"])
+        result.extend(account["pubkey"] for account in self.solana_accounts if account.get("is_writable"))
+        return result
+
+    def code_size(self, address):
+        """code_size of the ether account `address` (hex, with or without 0x), None if it is not used."""
+        address = address.lower().replace("0x", "")
+        for account in self.accounts:
+            if account["address"].lower().replace("0x", "") == address:
+                return account.get("code_size")
+        return None
+
+
+def parse_emulate_output(output):
+    """The JSON result among the lines neon-cli printed; log lines may follow it."""
+    for line in reversed(output.splitlines()):
+        line = line.strip()
+        if not line.startswith("{"):
+            continue
+        try:
+            js = json.loads(line)
+        except ValueError:
+            continue
+        if "exit_status" in js:
+            return js
+    raise Exception("no emulation result in neon-cli output: {}".format(output[-500:]))
+
+
+class EmulatorService:
+    def __init__(self, program_id, url=None, rpc=None, workers=4, cache_size=10000, slot_interval=1.0,
+                 command="neon-cli", verbose_flags=(), timeout=60):
+        """rpc (rpc_client.RpcClient or solana Client) gives the recent slot; slot_interval=None leaves it out of the key."""
+        if rpc is None and slot_interval is not None:
+            raise Exception("EmulatorService: an rpc client is needed for the recent slot")
+        self.program_id = str(program_id)
+        self.url = url or os.environ.get("SOLANA_URL", "http://localhost:8899")
+        self.rpc = rpc
+        self.cache_size = cache_size
+        self.slot_interval = slot_interval
+        self.command = command
+        self.verbose_flags = list(verbose_flags)
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._slot = (None, 0)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="emulator")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def recent_slot(self):
+        if self.slot_interval is None:
+            return None
+        with self._lock:
+            (slot, updated) = self._slot
+            if slot is not None and time.monotonic() - updated < self.slot_interval:
+                return slot
+        slot = self.rpc.get_slot()["result"]
+        with self._lock:
+            self._slot = (slot, time.monotonic())
+        return slot
+
+    def args(self, caller, contract, data, value):
+        args = [self.command] + self.verbose_flags + ["--commitment=recent", "--evm_loader", self.program_id,
+                                                      "--url", self.url, "emulate", caller, contract]
+        if data or value:
+            args.append(data or "None")
+        if value:
+            args.append(str(value))
+        return args
+
+    def run(self, caller, contract, data="", value=""):
+        """One emulation, no cache."""
+        proc = subprocess.run(self.args(caller, contract, data, value), stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, universal_newlines=True, timeout=self.timeout)
+        if proc.returncode != 0:
+            raise Exception("neon-cli emulate failed with {}: {}".format(proc.returncode, proc.stderr[-500:]))
+        return EmulationResult.from_json(parse_emulate_output(proc.stdout))
+
+    @staticmethod
+    def _hex(value):
+        return value.hex() if isinstance(value, (bytes, bytearray)) else str(value)
+
+    def submit(self, caller, contract, data="", value=""):
+        """Future of the EmulationResult; caller, contract and data are hex strings or bytes."""
+        (caller, contract, data) = (self._hex(caller), self._hex(contract), self._hex(data))
+        value = "" if value is None else str(value)
+        key = (caller.lower(), contract.lower(), data.lower(), value, self.recent_slot())
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                future = Future()
+                future.set_result(self._cache[key])
+                return future
+            if key in self._pending:
+                self.hits += 1
+                return self._pending[key]
+            self.misses += 1
+            future = self._executor.submit(self.run, caller, contract, data, value)
+            self._pending[key] = future
+        future.add_done_callback(lambda f: self._done(key, f))
+        return future
+
+    def _done(self, key, future):
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.exception() is not None:
+                self.errors += 1
+                return
+            if self.cache_size > 0:
+                self._cache[key] = future.result()
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+    def emulate(self, caller, contract, data="", value=""):
+        return self.submit(caller, contract, data, value).result()
+
+    def emulate_many(self, requests):
+        """EmulationResults (or exceptions) of (caller, contract, data, value) requests, emulated concurrently."""
+        futures = [self.submit(*request) for request in requests]
+        return [future.exception() or future.result() for future in futures]
+
+    def report(self):
+        total = self.hits + self.misses
+        print("emulator: {} requests, {} cached ({:.1%}), {} runs failed".format(
+            total, self.hits, self.hits / total if total else 0, self.errors))
@@ -1,4 +1,5 @@
 from sha3 import keccak_256
+import functools
 import json
 from web3.auto import w3
 from eth_keys import keys
@@ -39,42 +40,158 @@ def unpack(data):
         return (lst, data[1 + lLen + l:])
 
 
-def pack(data):
-    if data == None:
-        return (0x80).to_bytes(1, 'big')
-    if isinstance(data, str):
-        return pack(data.encode('utf8'))
-    elif isinstance(data, bytes):
-        if len(data) <= 55:
-            return (len(data) + 0x80).to_bytes(1, 'big') + data
+def _unpack_length(data, pos, l_len, end, strict):
+    if pos + l_len > end:
+        raise Exception("RLP length prefix out of bounds at {}".format(pos))
+    if strict and data[pos] == 0:
+        raise Exception("Non-canonical RLP length with leading zero at {}".format(pos))
+    l = int.from_bytes(data[pos:pos + l_len], 'big')
+    if strict and l <= 55:
+        raise Exception("Non-canonical RLP long form for length {} at {}".format(l, pos))
+    return l
+
+
+def _unpack_at(data, pos, end, strict):
+    # returns (item, next offset); strings are (offset, length) spans, lists are python lists
+    ch = data[pos]
+    if ch <= 0x7F:
+        return ((pos, 1), pos + 1)
+    elif ch <= 0xB7:
+        l = ch - 0x80
+        start = pos + 1
+        if strict and l == 1 and start < end and data[start] <= 0x7F:
+            raise Exception("Non-canonical RLP single byte at {}".format(pos))
+    elif ch <= 0xBF:
+        l_len = ch - 0xB7
+        l = _unpack_length(data, pos + 1, l_len, end, strict)
+        start = pos + 1 + l_len
+    else:
+        if ch <= 0xF7:
+            l = ch - 0xC0
+            start = pos + 1
         else:
-            l = len(data)
-            lLen = (l.bit_length() + 7) // 8
-            return (0xB7 + lLen).to_bytes(1, 'big') + l.to_bytes(lLen, 'big') + data
+            l_len = ch - 0xF7
+            l = _unpack_length(data, pos + 1, l_len, end, strict)
+            start = pos + 1 + l_len
+        stop = start + l
+        if stop > end:
+            raise Exception("RLP list out of bounds at {}".format(pos))
+        lst = []
+        append = lst.append
+        while start < stop:
+            ch = data[start]
+            # short strings are inlined, everything else recurses
+            if ch <= 0x7F:
+                append((start, 1))
+                start += 1
+            elif ch <= 0xB7 and not strict:
+                l = ch - 0x80
+                if start + 1 + l > stop:
+                    raise Exception("RLP string out of bounds at {}".format(start))
+                append((start + 1, l))
+                start += 1 + l
+            else:
+                (item, start) = _unpack_at(data, start, stop, strict)
+                append(item)
+        return (lst, stop)
+
+    if start + l > end:
+        raise Exception("RLP string out of bounds at {}".format(pos))
+    return ((start, l), start + l)
+
+
+def unpack_spans(data, strict=False):
+    """Decode one RLP item by walking `data` with integer offsets.
+
+    Strings come back as (offset, length) spans into `data` and lists as python lists,
+    so nothing is copied until span_bytes()/span_int() is called. In strict mode
+    non-canonical encodings and trailing bytes are rejected.
+    """
+    if len(data) == 0:
+        raise Exception("Empty RLP data")
+    (item, pos) = _unpack_at(data, 0, len(data), strict)
+    if strict and pos != len(data):
+        raise Exception("Trailing {} bytes after RLP item".format(len(data) - pos))
+    return item
+
+
+def span_bytes(data, span):
+    (offset, length) = span
+    return bytes(data[offset:offset + length])
+
+
+def span_int(data, span):
+    (offset, length) = span
+    return int.from_bytes(data[offset:offset + length], 'big')
+
+
+def materialize(data, item):
+    if isinstance(item, list):
+        return [materialize(data, i) for i in item]
+    return span_bytes(data, item)
+
+
+_BYTES = [bytes((i,)) for i in range(256)]
+
+
+def _pack_header(l, short_base, long_base):
+    if l <= 55:
+        return _BYTES[short_base + l]
+    l_len = (l.bit_length() + 7) // 8
+    return _BYTES[long_base + l_len] + l.to_bytes(l_len, 'big')
+
+
+def _pack_parts(data, parts):
+    # appends encoded chunks of data to parts and returns their total size;
+    # a list header is patched into its reserved slot once the payload size is known
+    if data is None:
+        parts.append(b'\x80')
+        return 1
+    if isinstance(data, str):
+        data = data.encode('utf8')
+    if isinstance(data, (bytes, bytearray)):
+        l = len(data)
+        if l == 1 and data[0] < 0x80:
+            parts.append(data)
+            return 1
+        header = _pack_header(l, 0x80, 0xB7)
+        parts.append(header)
+        parts.append(data)
+        return len(header) + l
     elif isinstance(data, int):
+        if data < 0:
+            raise Exception("Negative integer {} can't be RLP encoded".format(data))
         if data < 0x80:
-            return data.to_bytes(1, 'big')
-        else:
-            l = (data.bit_length() + 7) // 8
-            return (l + 0x80).to_bytes(1, 'big') + data.to_bytes(l, 'big')
-        pass
-    elif isinstance(data, list) or isinstance(data, tuple):
-        if len(data) == 0:
-            return (0xC0).to_bytes(1, 'big')
-        else:
-            res = bytearray()
-            for d in data:
-                res += pack(d)
-            l = len(res)
-            if l <= 55:
-                return (l + 0xC0).to_bytes(1, 'big') + res
-            else:
-                lLen = (l.bit_length() + 7) // 8
-                return (lLen + 0xF7).to_bytes(1, 'big') + l.to_bytes(lLen, 'big') + res
+            parts.append(_BYTES[data] if data else b'\x80')
+            return 1
+        l = (data.bit_length() + 7) // 8
+        parts.append(_BYTES[0x80 + l] + data.to_bytes(l, 'big'))
+        return 1 + l
+    elif isinstance(data, (list, tuple)):
+        index = len(parts)
+        parts.append(None)
+        l = 0
+        for d in data:
+            l += _pack_parts(d, parts)
+        header = _pack_header(l, 0xC0, 0xF7)
+        parts[index] = header
+        return len(header) + l
     else:
         raise Exception("Unknown type {} of data".format(str(type(data))))
 
 
+def pack(data):
+    """Canonical RLP encoding of data (None, str, bytes, int or nested lists/tuples).
+
+    Headers are computed while the chunks are collected and the result is built by a
+    single join into a buffer of the exact size, so nested lists are not re-copied
+    at every level.
+    """
+    parts = []
+    _pack_parts(data, parts)
+    return b''.join(parts)
+
+
 def getInt(a):
     if isinstance(a, int): return a
     if isinstance(a, bytes): return int.from_bytes(a, 'big')
@@ -82,8 +199,16 @@ def getInt(a):
     raise Exception("Invalid convertion from {} to int".format(a))
 
 
+def getSpanInt(data, span):
+    # empty string decodes to None, as unpack() does for 0x80
+    return span_int(data, span) if span[1] else None
+
+
 class Trx:
+    FIELDS = frozenset(('nonce', 'gasPrice', 'gasLimit', 'toAddress', 'value', 'callData', 'v', 'r', 's'))
+
     def __init__(self):
+        self._cache = {}
         self.nonce = None
         self.gasPrice = None
         self.gasLimit = None
@@ -94,20 +219,26 @@ class Trx:
         self.r = None
         self.s = None
 
+    def __setattr__(self, name, value):
+        # encoded message and hash are memoized until one of the fields is reassigned
+        if name in Trx.FIELDS:
+            self.__dict__['_cache'] = {}
+        object.__setattr__(self, name, value)
+
     @classmethod
-    def fromString(cls, s):
+    def fromString(cls, s, strict=False):
         t = Trx()
-        (unpacked, data) = unpack(memoryview(s))
-        (nonce, gasPrice, gasLimit, toAddress, value, callData, v, r, s) = unpacked
-        t.nonce = getInt(nonce)
-        t.gasPrice = getInt(gasPrice)
-        t.gasLimit = getInt(gasLimit)
-        t.toAddress = toAddress
-        t.value = getInt(value)
-        t.callData = callData
-        t.v = getInt(v)
-        t.r = getInt(r)
-        t.s = getInt(s)
+        data = s
+        (nonce, gasPrice, gasLimit, toAddress, value, callData, v, r, s) = unpack_spans(data, strict)
+        t.nonce = getSpanInt(data, nonce)
+        t.gasPrice = getSpanInt(data, gasPrice)
+        t.gasLimit = getSpanInt(data, gasLimit)
+        t.toAddress = span_bytes(data, toAddress) or None
+        t.value = getSpanInt(data, value)
+        t.callData = span_bytes(data, callData) or None
+        t.v = getSpanInt(data, v)
+        t.r = getSpanInt(data, r)
+        t.s = getSpanInt(data, s)
         return t
 
     def chainId(self):
@@ -116,38 +247,46 @@ class Trx:
         return (self.v - 1) // 2 - 17
 
     def __str__(self):
-        return pack((
-            self.nonce,
-            self.gasPrice,
-            self.gasLimit,
-            self.toAddress,
-            self.value,
-            self.callData,
-            self.v,
-            self.r.to_bytes(32, 'big') if self.r else None,
-            self.s.to_bytes(32, 'big') if self.s else None)
-        ).hex()
+        signed = self._cache.get('signed')
+        if signed is None:
+            signed = pack((
+                self.nonce,
+                self.gasPrice,
+                self.gasLimit,
+                self.toAddress,
+                self.value,
+                self.callData,
+                self.v,
+                self.r.to_bytes(32, 'big') if self.r else None,
+                self.s.to_bytes(32, 'big') if self.s else None)
+            ).hex()
+            self._cache['signed'] = signed
+        return signed
 
     def get_msg(self, chainId=None):
-        return pack((
-            self.nonce,
-            self.gasPrice,
-            self.gasLimit,
-            self.toAddress,
-            self.value,
-            self.callData,
-            chainId or self.chainId(), None, None))
+        chainId = chainId or self.chainId()
+        key = ('msg', chainId)
+        msg = self._cache.get(key)
+        if msg is None:
+            msg = pack((
+                self.nonce,
+                self.gasPrice,
+                self.gasLimit,
+                self.toAddress,
+                self.value,
+                self.callData,
+                chainId, None, None))
+            self._cache[key] = msg
+        return msg
 
     def hash(self, chainId=None):
-        trx = pack((
-            self.nonce,
-            self.gasPrice,
-            self.gasLimit,
-            self.toAddress,
-            self.value,
-            self.callData,
-            chainId or self.chainId(), None, None))
-        return keccak_256(trx).digest()
+        chainId = chainId or self.chainId()
+        key = ('hash', chainId)
+        msg_hash = self._cache.get(key)
+        if msg_hash is None:
+            msg_hash = keccak_256(self.get_msg(chainId)).digest()
+            self._cache[key] = msg_hash
+        return msg_hash
 
     def sender(self):
         msgHash = self.hash()
@@ -163,13 +302,72 @@ class JsonEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self.obj)
 
 
-def make_instruction_data_from_tx(instruction, private_key=None):
+FAST_TX_FIELDS = frozenset(('nonce', 'gasPrice', 'gas', 'to', 'value', 'data', 'chainId'))
+
+
+@functools.lru_cache(maxsize=4096)
+def _signer(private_key):
+    key = keys.PrivateKey(private_key)
+    return (key, key.public_key.to_canonical_address())
+
+
+def get_signer(private_key):
+    """Return cached (eth_keys.PrivateKey, canonical address) for a 32-byte key, hex string or PrivateKey."""
+    if isinstance(private_key, keys.PrivateKey):
+        return (private_key, private_key.public_key.to_canonical_address())
+    if isinstance(private_key, str):
+        private_key = bytes.fromhex(private_key[2:] if private_key[:2] == "0x" else private_key)
+    return _signer(bytes(private_key))
+
+
+def _hex_or_bytes(value):
+    if value is None:
+        return b''
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value[:2] == "0x" else value)
+    return bytes(value)
+
+
+def make_msg_from_tx(instruction):
+    """Unsigned RLP message (EIP-155) for a dict with nonce, gasPrice, gas, to, value, data and chainId."""
+    return pack((
+        instruction['nonce'],
+        instruction['gasPrice'],
+        instruction['gas'],
+        _hex_or_bytes(instruction.get('to')) or None,
+        instruction.get('value', 0),
+        _hex_or_bytes(instruction.get('data')) or None,
+        instruction['chainId'], None, None))
+
+
+def sign_tx(instruction, private_key, verify=False):
+    """Sign the RLP message of a tx dict directly with a cached eth_keys key.
+
+    Returns (from, sig, msg) like make_instruction_data_from_tx() without going through
+    web3 and without public key recovery; verify=True additionally recovers the sender
+    from the signature and checks it.
+    """
+    (key, address) = get_signer(private_key)
+    msg = make_msg_from_tx(instruction)
+    msg_hash = keccak_256(msg).digest()
+    sig = key.sign_msg_hash(msg_hash)
+    if verify and sig.recover_public_key_from_msg_hash(msg_hash).to_canonical_address() != address:
+        raise Exception("Signature verification failed for {}".format(address.hex()))
+    return (address, sig.to_bytes(), msg)
+
+
+def make_instruction_data_from_tx(instruction, private_key=None, verify=False):
     if isinstance(instruction, dict):
         if instruction['chainId'] == None:
             raise Exception("chainId value is needed in input dict")
         if private_key == None:
             raise Exception("Needed private key for transaction creation from fields")
 
+        if FAST_TX_FIELDS.issuperset(instruction) and 'nonce' in instruction and 'gasPrice' in instruction \
+                and 'gas' in instruction:
+            return sign_tx(instruction, private_key, verify)
+
+        # web3 fills in missing fields (e.g. gasPrice) from the node
         signed_tx = w3.eth.account.sign_transaction(instruction, private_key)
         # print(signed_tx.rawTransaction.hex())
         _trx = Trx.fromString(signed_tx.rawTransaction)
@@ -0,0 +1,241 @@
+"""Decoding of the OnReturn and OnEvent instructions of the evm_loader, and an index of them.
+
+The evm_loader reports the result of an Ethereum call by invoking itself with
+`OnEvent` (tag 7: address[20], topics count u64 LE, topics[32 * count], data) for every
+log and `OnReturn` (tag 6: status u8, used gas u64 LE, return data) at the end; see
+program/src/instruction.rs. decode_transaction() walks the inner instructions of a
+confirmed transaction once and returns typed records whose fields are memoryview slices
+of the decoded instruction data, so nothing is copied per field. EventIndex keeps
+decoded transactions in SQLite keyed by signature, address and topic0, so verification
+and analytics can query the logs of a benchmark run without fetching the receipts again.
+"""
+import json
+import sqlite3
+import threading
+from typing import List, NamedTuple, Optional
+
+from base58 import b58decode
+
+ON_RETURN = 6
+ON_EVENT = 7
+
+# status of OnReturn, ExitReason of program/src/entrypoint.rs
+STOPPED = 0x11
+RETURNED = 0x12
+SUICIDED = 0x13
+REVERTED = 0xd0
+
+WORD = 32
+
+
+class OnReturn(NamedTuple):
+    status: int
+    used_gas: int
+    data: memoryview
+
+    @property
+    def succeed(self):
+        return self.status in (STOPPED, RETURNED, SUICIDED)
+
+
+class OnEvent(NamedTuple):
+    address: memoryview
+    topics: List[memoryview]
+    data: memoryview
+
+    @property
+    def topic0(self):
+        return self.topics[0] if self.topics else None
+
+
+class DecodedTransaction(NamedTuple):
+    signature: Optional[str]
+    slot: Optional[int]
+    # meta.err of the receipt
+    error: Optional[dict]
+    events: List[OnEvent]
+    on_return: Optional[OnReturn]
+
+    @property
+    def reverted(self):
+        return self.on_return is not None and self.on_return.status == REVERTED
+
+    def find(self, address=None, topic0=None):
+        """Events of the contract `address` (bytes or hex) and/or with the first topic `topic0`."""
+        address = to_bytes(address)
+        return [event for event in self.events
+                if (address is None or event.address == address) and (topic0 is None or event.topic0 == topic0)]
+
+
+def to_bytes(value):
+    if value is None or isinstance(value, (bytes, bytearray, memoryview)):
+        return value
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+
+def address_topic(address):
+    """An address as an indexed event argument: left-padded to a word."""
+    return bytes(12) + to_bytes(address)
+
+
+def uint_word(value):
+    return value.to_bytes(WORD, "big")
+
+
+def decode_instruction(data):
+    """OnReturn, OnEvent or None of the data (bytes or base58) of an instruction."""
+    if isinstance(data, str):
+        data = b58decode(data)
+    view = memoryview(data)
+    if not view:
+        return None
+    if view[0] == ON_RETURN:
+        return OnReturn(view[1] if len(view) > 1 else None, int.from_bytes(view[2:10], "little"), view[10:])
+    if view[0] == ON_EVENT:
+        count = int.from_bytes(view[21:29], "little")
+        end = 29 + WORD * count
+        if len(view) < end:
+            raise Exception("OnEvent: {} topics do not fit into {} bytes".format(count, len(view)))
+        return OnEvent(view[1:21], [view[offset:offset + WORD] for offset in range(29, end, WORD)], view[end:])
+    return None
+
+
+def decode_transaction(response):
+    """DecodedTransaction of a getConfirmedTransaction response (or its result), None if there is no receipt.
+
+    Only the instructions a program invokes on itself are decoded, so SPL token instructions
+    that happen to start with 6 or 7 are left out. A DecodedTransaction is returned as is.
+    """
+    if isinstance(response, DecodedTransaction):
+        return response
+    result = response.get("result", response) if response else None
+    if not result or "meta" not in result:
+        return None
+    meta = result["meta"] or {}
+    transaction = result.get("transaction") or {}
+    instructions = (transaction.get("message") or {}).get("instructions")
+    signatures = transaction.get("signatures")
+    events = []
+    on_return = None
+    for group in meta.get("innerInstructions") or []:
+        program = instructions[group["index"]]["programIdIndex"] if instructions else None
+        for instruction in group["instructions"]:
+            if program is not None and instruction.get("programIdIndex", program) != program:
+                continue
+            record = decode_instruction(instruction["data"])
+            if isinstance(record, OnEvent):
+                events.append(record)
+            elif record is not None:
+                on_return = record
+    return DecodedTransaction(signatures[0] if signatures else None, result.get("slot"), meta.get("err"), events,
+                              on_return)
+
+
+class EventIndex:
+    """SQLite index of DecodedTransactions.
+
+    One row per transaction (its error and OnReturn) and one per event, with indexes on
+    (address, topic0) and topic0. Writes are committed every `commit_every` transactions
+    and on `flush()`.
+    """
+
+    def __init__(self, path, commit_every=1000):
+        self.commit_every = commit_every
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE IF NOT EXISTS transactions ("
+                         "signature TEXT PRIMARY KEY, slot INTEGER, error TEXT, "
+                         "status INTEGER, used_gas INTEGER, data BLOB) WITHOUT ROWID")
+        self._db.execute("CREATE TABLE IF NOT EXISTS events ("
+                         "signature TEXT NOT NULL, position INTEGER NOT NULL, slot INTEGER, address BLOB NOT NULL, "
+                         "topic0 BLOB, topics BLOB NOT NULL, data BLOB NOT NULL, "
+                         "PRIMARY KEY (signature, position)) WITHOUT ROWID")
+        self._db.execute("CREATE INDEX IF NOT EXISTS events_address ON events (address, topic0)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS events_topic0 ON events (topic0)")
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, decoded, signature=None):
+        """Store a DecodedTransaction; signature is needed if the receipt had none."""
+        signature = signature or decoded.signature
+        if signature is None:
+            raise Exception("EventIndex: a transaction without signature")
+        on_return = decoded.on_return
+        row = (signature, decoded.slot, json.dumps(decoded.error) if decoded.error is not None else None,
+               on_return.status if on_return else None, on_return.used_gas if on_return else None,
+               on_return.data if on_return else None)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?)", row)
+            self._db.execute("DELETE FROM events WHERE signature=?", (signature,))
+            self._db.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?)", (
+                (signature, position, decoded.slot, event.address, event.topic0, b"".join(event.topics), event.data)
+                for (position, event) in enumerate(decoded.events)))
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._db.commit()
+                self._pending = 0
+
+    def __contains__(self, signature):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM transactions WHERE signature=?", (signature,)).fetchone() is not None
+
+    def get(self, signature):
+        """The stored DecodedTransaction, None if the signature is not indexed."""
+        with self._lock:
+            row = self._db.execute("SELECT slot, error, status, used_gas, data FROM transactions WHERE signature=?",
+                                   (signature,)).fetchone()
+            if row is None:
+                return None
+            events = [self._event(*event) for event in self._db.execute(
+                "SELECT address, topics, data FROM events WHERE signature=? ORDER BY position", (signature,))]
+        (slot, error, status, used_gas, data) = row
+        on_return = OnReturn(status, used_gas, memoryview(data)) if status is not None else None
+        return DecodedTransaction(signature, slot, json.loads(error) if error else None, events, on_return)
+
+    @staticmethod
+    def _event(address, topics, data):
+        topics = memoryview(topics)
+        return OnEvent(memoryview(address), [topics[i:i + WORD] for i in range(0, len(topics), WORD)],
+                       memoryview(data))
+
+    @staticmethod
+    def _where(address, topic0, signature):
+        conditions = [(column, value) for (column, value) in
+                      (("address", to_bytes(address)), ("topic0", topic0), ("signature", signature)) if value is not None]
+        where = " AND ".join("{}=?".format(column) for (column, _) in conditions)
+        return (" WHERE " + where if where else "", [value for (_, value) in conditions])
+
+    def events(self, address=None, topic0=None, signature=None):
+        """(signature, slot, OnEvent) of the matching events in slot order."""
+        (where, params) = self._where(address, topic0, signature)
+        with self._lock:
+            rows = self._db.execute("SELECT signature, slot, address, topics, data FROM events" + where +
+                                    " ORDER BY slot, signature, position", params).fetchall()
+        return [(signature, slot, self._event(address, topics, data))
+                for (signature, slot, address, topics, data) in rows]
+
+    def count(self, address=None, topic0=None):
+        (where, params) = self._where(address, topic0, None)
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM events" + where, params).fetchone()[0]
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._db.commit()
+                self._pending = 0
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
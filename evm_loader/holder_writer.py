@@ -0,0 +1,98 @@
+"""Upload of a signed Ethereum transaction into a holder account.
+
+The holder is filled by WriteHolder (0x12) instructions, one per Solana transaction.
+HolderWriter makes every chunk as large as the 1232-byte packet allows for the actual
+instruction header and account keys, instead of the fixed HOLDER_MSG_SIZE. All chunks
+are signed against one recent blockhash through a MessageTemplate, submitted
+concurrently and confirmed in one batch. The holder data is then checked with a single
+getAccountInfo and only the ranges that did not land are written again.
+"""
+import base64
+import struct
+
+from solana.publickey import PublicKey
+from solana.transaction import AccountMeta, TransactionInstruction
+from solana.utils.shortvec_encoding import encode_length
+
+from confirmation import confirm_transactions
+from message_template import FEE_PAYER, PACKET_DATA_SIZE, MessageTemplate
+
+WRITE_HOLDER_HEADER = struct.Struct('<BQIQ')  # tag, holder id, offset, length
+# the holder data starts after the AccountData::Empty tag
+HOLDER_DATA_OFFSET = 1
+
+
+def write_holder_layout(holder_id, offset, data):
+    return WRITE_HOLDER_HEADER.pack(0x12, holder_id, offset, len(data)) + data
+
+
+def holder_message(signature, unsigned_msg):
+    """What the evm_loader reads from a holder: signature, length of the message, the message."""
+    return signature + len(unsigned_msg).to_bytes(8, byteorder="little") + unsigned_msg
+
+
+class HolderWriter:
+    def __init__(self, rpc, blockhash_provider, program_id, signer, holder, holder_id=0, layout=None, retries=3):
+        """rpc is an rpc_client.RpcClient; layout(offset, data) builds the instruction data, WriteHolder by default."""
+        self.rpc = rpc
+        self.blockhash_provider = blockhash_provider
+        self.signer = signer
+        self.holder = PublicKey(holder)
+        self.layout = layout or (lambda offset, data: write_holder_layout(holder_id, offset, data))
+        self.retries = retries
+        self.template = MessageTemplate([TransactionInstruction(program_id=program_id, data=b'', keys=[
+            AccountMeta(pubkey=self.holder, is_signer=False, is_writable=True),
+            AccountMeta(pubkey=FEE_PAYER, is_signer=True, is_writable=False),
+        ])])
+        self.chunk_size = self.max_chunk_size()
+
+    def max_chunk_size(self):
+        header = len(self.layout(0, b''))
+        # one signature and the message with an empty chunk, any fee payer and blockhash
+        empty = 1 + 64 + len(self.template.message(bytes(32), "1" * 32, {}, [self.layout(0, b'')]))
+        # the wire size without the instruction data and its compact length
+        fixed = empty - header - len(encode_length(header))
+        size = PACKET_DATA_SIZE - fixed
+        while size + len(encode_length(size)) > PACKET_DATA_SIZE - fixed:
+            size -= 1
+        return size - header
+
+    def chunks(self, message):
+        return [(offset, message[offset:offset + self.chunk_size]) for offset in range(0, len(message), self.chunk_size)]
+
+    def send(self, chunks):
+        """Sign all chunks against one blockhash, submit them concurrently and confirm them in one batch."""
+        blockhash = self.blockhash_provider.get()
+        wires = [self.template.build(self.signer, blockhash, {}, [self.layout(offset, part)]) for (offset, part) in chunks]
+        responses = self.rpc.gather([self.rpc.rpc.send_raw_transaction(wire) for wire in wires])
+        signatures = [resp["result"] for resp in responses if resp.get("result")]
+        for resp in responses:
+            if not resp.get("result"):
+                print("write to holder {} failed: {}".format(self.holder, resp.get("error")))
+        for (signature, status) in confirm_transactions(self.rpc, signatures).items():
+            if isinstance(status, Exception):
+                print("write to holder {} not confirmed: {} {}".format(self.holder, signature, status))
+        return signatures
+
+    def missing(self, message):
+        """Chunks of the message that are not in the holder account."""
+        resp = self.rpc.get_account_info(self.holder)
+        value = (resp.get("result") or {}).get("value")
+        if value is None:
+            raise Exception("holder account {} not found".format(self.holder))
+        data = base64.b64decode(value["data"][0])[HOLDER_DATA_OFFSET:]
+        return [(offset, part) for (offset, part) in self.chunks(message) if data[offset:offset + len(part)] != part]
+
+    def write(self, message):
+        """Write the message and check it landed; returns the number of Solana transactions sent."""
+        chunks = self.chunks(message)
+        sent = 0
+        for _ in range(self.retries + 1):
+            sent += len(chunks)
+            self.send(chunks)
+            chunks = self.missing(message)
+            if not chunks:
+                return sent
+            print("holder {}: {} chunks missing, resend".format(self.holder, len(chunks)))
+        raise Exception("failed to write {} bytes to holder {}".format(len(message), self.holder))
+
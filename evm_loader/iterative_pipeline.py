@@ -0,0 +1,155 @@
+"""Iterative execution with several continue transactions in flight.
+
+Sending a continue, waiting for its confirmation and fetching the transaction before
+sending the next one makes every step cost a full confirmation latency.
+IterativePipeline keeps `in_flight` continues outstanding per storage account: the node
+executes them one after another (they all write the storage account) while the client
+waits for all of them at once. The first receipt with OnReturn finishes the call. Waiting
+for the other continues is cancelled, and those that still land fail on the finished
+storage account; they are reported as surplus. Signatures are confirmed by one
+ConfirmationTracker that polls all of them together. With a CollateralPoolScheduler
+every call holds one collateral pool from the begin to its last continue.
+"""
+import asyncio
+import statistics
+import time
+from typing import NamedTuple
+
+from solana.rpc.types import TxOpts
+
+from confirmation import ConfirmationTracker
+from step_tuner import StepTuner, budget_exceeded, call_returned, transaction_error
+
+
+class IterativeResult(NamedTuple):
+    receipt: dict
+    latency: float
+    # Solana transactions sent for the EVM transaction, begin included
+    transactions: int
+    # continues sent after the call had already returned, or rejected because of that
+    surplus: int
+    # continues that ran out of compute units
+    retries: int
+
+
+class IterativePipeline:
+    def __init__(self, rpc, signer, blockhash_provider, program_id, in_flight=3, tuner=None, max_transactions=1000,
+                 tracker=None, collateral_pools=None):
+        """rpc is an rpc_client.RpcClient, the pipeline runs on its event loop.
+
+        tracker confirms the signatures on a background thread, by default one polling
+        at least every slot. With collateral_pools (collateral_pool.CollateralPoolScheduler)
+        begin and continue_ take the CollateralPool of the call as a second argument.
+        """
+        self.rpc = rpc
+        self.tracker = tracker or ConfirmationTracker(rpc, max_sleep=0.4)
+        self.signer = signer
+        self.blockhash_provider = blockhash_provider
+        self.program_id = program_id
+        self.in_flight = in_flight
+        self.tuner = tuner or StepTuner()
+        self.max_transactions = max_transactions
+        self.collateral_pools = collateral_pools
+        self.opts = TxOpts(skip_confirmation=True, preflight_commitment="confirmed")
+
+    def execute(self, begin, continue_, begin_steps=0):
+        """Blocking execute_async(); begin(steps) and continue_(steps) build the Transactions."""
+        self.blockhash_provider.recent()
+        self.tracker.start()
+        if self.collateral_pools is None:
+            return self.rpc.run(self.execute_async(begin, continue_, begin_steps))
+        # all transactions of the call write the pool, it goes back once the call returned
+        with self.collateral_pools.use() as pool:
+            return self.rpc.run(self.execute_async(lambda steps: begin(steps, pool),
+                                                   lambda steps: continue_(steps, pool), begin_steps))
+
+    async def _send(self, trx):
+        trx = self.blockhash_provider.sign(trx, self.signer)
+        resp = await self.rpc.rpc.send_raw_transaction(trx.serialize(), opts=self.opts)
+        if resp.get('error'):
+            return resp
+        # shielded: a cancelled continue must not cancel the future the tracker resolves
+        await asyncio.shield(asyncio.wrap_future(self.tracker.add(resp['result'])))
+        return await self.rpc.rpc.get_confirmed_transaction(resp['result'])
+
+    def _next_steps(self, used):
+        # continues with the same step count and blockhash would be the same transaction
+        steps = self.tuner.next_steps()
+        blockhash = self.blockhash_provider.get()
+        while (blockhash, steps) in used and steps > 1:
+            steps -= 1
+        used.add((blockhash, steps))
+        return steps
+
+    async def execute_async(self, begin, continue_, begin_steps=0):
+        start = time.monotonic()
+        receipt = await self._send(begin(begin_steps))
+        error = transaction_error(receipt)
+        if error:
+            raise Exception("iterative call failed to begin: {}".format(error))
+        self.tuner.observe_receipt(begin_steps, receipt, self.program_id)
+        transactions = 1
+        if call_returned(receipt):
+            return IterativeResult(receipt, time.monotonic() - start, transactions, 0, 0)
+
+        pending = {}
+        used = set()
+        (result, last_error, surplus, retries) = (None, None, 0, 0)
+        try:
+            while result is None and (pending or last_error is None):
+                # after an error other than the compute budget the call has most likely
+                # returned already: stop sending and wait for the continues in flight
+                while last_error is None and len(pending) < self.in_flight:
+                    if transactions >= self.max_transactions:
+                        raise Exception("iterative call did not return after {} transactions".format(transactions))
+                    steps = self._next_steps(used)
+                    pending[asyncio.ensure_future(self._send(continue_(steps)))] = steps
+                    transactions += 1
+
+                (done, _) = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    steps = pending.pop(task)
+                    receipt = task.result()
+                    error = transaction_error(receipt)
+                    if error and budget_exceeded(receipt):
+                        self.tuner.exceeded(steps)
+                        retries += 1
+                    elif error:
+                        last_error = error
+                        surplus += 1
+                    else:
+                        self.tuner.observe_receipt(steps, receipt, self.program_id)
+                        if result is None and call_returned(receipt):
+                            result = receipt
+        finally:
+            for task in pending:
+                task.cancel()
+            surplus += len(pending)
+
+        self.tuner.save()
+        if result is None:
+            raise Exception("iterative call failed: {}".format(last_error))
+        return IterativeResult(result, time.monotonic() - start, transactions, surplus, retries)
+
+
+class IterativeStats:
+    """Latency and transaction counts of many iterative calls."""
+
+    def __init__(self):
+        self.results = []
+
+    def add(self, result):
+        self.results.append(result)
+        return result
+
+    def report(self):
+        if not self.results:
+            return
+        latencies = sorted(result.latency for result in self.results)
+        print("evm transactions:                 ", len(self.results))
+        print("solana transactions per evm trx:  ", statistics.mean(result.transactions for result in self.results))
+        print("surplus continues:                ", sum(result.surplus for result in self.results))
+        print("compute budget retries:           ", sum(result.retries for result in self.results))
+        print("avg latency:                      ", statistics.mean(latencies), "sec")
+        print("p50 latency:                      ", latencies[len(latencies) // 2], "sec")
+        print("max latency:                      ", latencies[-1], "sec")
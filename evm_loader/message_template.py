@@ -0,0 +1,116 @@
+"""Pre-compiled Solana messages for transactions that always have the same shape.
+
+Transaction.serialize() in solana-py recompiles the message for every transaction:
+it collects and sorts the account metas, dedups keys, base58-encodes the instruction
+data and encodes every compact array. A MessageTemplate does all of that once. The
+account-key table and the header live in a preallocated buffer; per transaction only
+the fee payer, the variable ("slot") keys, the blockhash and the instruction data are
+patched in before the message is Ed25519-signed.
+"""
+import functools
+from typing import NamedTuple
+
+import base58
+from nacl.signing import SigningKey
+from solana.publickey import PublicKey
+from solana.utils.shortvec_encoding import encode_length
+
+PACKET_DATA_SIZE = 1232
+
+
+class Slot(NamedTuple):
+    """Placeholder for an account key that is only known per transaction."""
+    name: str
+
+
+FEE_PAYER = Slot("fee_payer")
+
+
+@functools.lru_cache(maxsize=1024)
+def _signing_key(secret_key):
+    key = SigningKey(secret_key[:32])
+    return key, bytes(key.verify_key)
+
+
+def get_signing_key(signer):
+    """(nacl SigningKey, public key bytes) of a solana Account, cached across transactions."""
+    return _signing_key(signer.secret_key())
+
+
+def _key_bytes(key):
+    if isinstance(key, Slot):
+        return key
+    if isinstance(key, (bytes, bytearray)) and len(key) == 32:
+        return bytes(key)
+    return bytes(PublicKey(key))
+
+
+@functools.lru_cache(maxsize=16)
+def _blockhash_bytes(blockhash):
+    return base58.b58decode(blockhash)
+
+
+class MessageTemplate:
+    def __init__(self, instructions):
+        """Compile TransactionInstructions whose account keys may be Slots; the data is given per transaction.
+
+        The fee payer is the only signer, it is always FEE_PAYER at index 0. The buffer is
+        patched in place, so a template must not be shared between sending threads.
+        """
+        metas = {FEE_PAYER: [True, True]}
+        for instr in instructions:
+            for meta in instr.keys:
+                key = _key_bytes(meta.pubkey)
+                (is_signer, is_writable) = metas.get(key, (False, False))
+                metas[key] = [is_signer or meta.is_signer, is_writable or meta.is_writable]
+        for instr in instructions:
+            metas.setdefault(_key_bytes(instr.program_id), [False, False])
+        if any(is_signer for (key, (is_signer, _)) in metas.items() if key != FEE_PAYER):
+            raise Exception("MessageTemplate supports the fee payer as the only signer")
+
+        # the same order Transaction.compile_message() uses: signers, then writable accounts
+        keys = sorted(metas, key=lambda key: (not metas[key][0], not metas[key][1]))
+        index = {key: i for (i, key) in enumerate(keys)}
+        num_readonly_unsigned = sum(1 for key in keys if not metas[key][1])
+
+        header = bytes((1, 0, num_readonly_unsigned)) + encode_length(len(keys))
+        self.keys = keys
+        self.keys_offset = len(header)
+        self.blockhash_offset = self.keys_offset + 32 * len(keys)
+        self.prefix = bytearray(header + bytes(32 * len(keys) + 32))
+        self.slot_offsets = []
+        for (i, key) in enumerate(keys):
+            offset = self.keys_offset + 32 * i
+            if isinstance(key, Slot):
+                if key != FEE_PAYER:
+                    self.slot_offsets.append((key.name, offset))
+            else:
+                self.prefix[offset:offset + 32] = key
+        self.instructions = [bytes((index[_key_bytes(instr.program_id)],)) +
+                             encode_length(len(instr.keys)) +
+                             bytes(index[_key_bytes(meta.pubkey)] for meta in instr.keys)
+                             for instr in instructions]
+        self.instruction_count = encode_length(len(instructions))
+
+    def message(self, fee_payer, recent_blockhash, slots, data):
+        """Serialized message: `slots` maps slot names to keys, `data` holds one bytes per instruction."""
+        prefix = self.prefix
+        prefix[self.keys_offset:self.keys_offset + 32] = fee_payer
+        for (name, offset) in self.slot_offsets:
+            prefix[offset:offset + 32] = _key_bytes(slots[name])
+        prefix[self.blockhash_offset:self.blockhash_offset + 32] = _blockhash_bytes(recent_blockhash)
+        parts = [prefix, self.instruction_count]
+        for (instr, instr_data) in zip(self.instructions, data):
+            parts.append(instr)
+            parts.append(encode_length(len(instr_data)))
+            parts.append(instr_data)
+        return b''.join(parts)
+
+    def build(self, signer, recent_blockhash, slots, data):
+        """Signed wire transaction, ready for send_raw_transaction()."""
+        (signing_key, public_key) = get_signing_key(signer)
+        msg = self.message(public_key, recent_blockhash, slots, data)
+        wire = b'\x01' + signing_key.sign(msg).signature + msg
+        if len(wire) > PACKET_DATA_SIZE:
+            raise RuntimeError("transaction too large: {} > {}".format(len(wire), PACKET_DATA_SIZE))
+        return wire
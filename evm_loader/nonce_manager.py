@@ -0,0 +1,122 @@
+"""Nonces of Ethereum callers for transactions built ahead of sending.
+
+tools.get_nonce used to keep a plain dict and increment it forever: a transaction that
+was never sent or got dropped left a hole and every later nonce of the caller was
+rejected by the evm_loader with InvalidArgument. NonceManager reserves nonces per caller,
+takes released ones back (the highest reservation is simply undone, a lower one is handed
+out again before a new nonce) and rereads the on-chain trx_count of a caller whose
+receipt shows InvalidArgument. Callers commit (or observe) every nonce they sent and
+release the ones they did not, so only the transactions in flight stay reserved. The
+counts of many callers are read with getMultipleAccounts through the
+ACCOUNT_INFO_LAYOUT decoder. All methods are thread safe; none of them awaits, so
+asyncio tasks can share one manager as well.
+"""
+import bisect
+import threading
+
+from solana_utils import get_transaction_counts
+
+
+def invalid_nonce(receipt):
+    """Whether a getConfirmedTransaction response (or its result) failed with InvalidArgument."""
+    result = receipt.get('result', receipt) if receipt else None
+    err = (result or {}).get('meta', {}).get('err')
+    if not isinstance(err, dict):
+        return False
+    return "InvalidArgument" in (err.get('InstructionError') or [])
+
+
+class CallerNonces:
+    def __init__(self):
+        self.next = None
+        self.reserved = set()
+        # released nonces below `next`, sorted
+        self.gaps = []
+        self.lock = threading.Lock()
+
+
+class NonceManager:
+    def __init__(self, read_counts=None):
+        """read_counts(callers) returns the on-chain trx_count of each caller, get_transaction_counts by default."""
+        self.read_counts = read_counts or get_transaction_counts
+        self.resyncs = 0
+        self._callers = {}
+        self._lock = threading.Lock()
+
+    def _state(self, caller):
+        key = str(caller)
+        with self._lock:
+            state = self._callers.get(key)
+            if state is None:
+                state = self._callers[key] = CallerNonces()
+            return state
+
+    @staticmethod
+    def _reset(state, count):
+        state.next = count
+        state.reserved.clear()
+        state.gaps = []
+
+    def prefetch(self, callers):
+        """Read the counts of all callers not known yet in bulk."""
+        unknown = [caller for caller in dict.fromkeys(str(caller) for caller in callers)
+                   if self._state(caller).next is None]
+        if not unknown:
+            return
+        for (caller, count) in zip(unknown, self.read_counts(unknown)):
+            state = self._state(caller)
+            with state.lock:
+                if state.next is None:
+                    self._reset(state, count)
+
+    def reserve(self, caller):
+        state = self._state(caller)
+        with state.lock:
+            if state.next is None:
+                (count,) = self.read_counts([str(caller)])
+                self._reset(state, count)
+            if state.gaps:
+                nonce = state.gaps.pop(0)
+            else:
+                nonce = state.next
+                state.next += 1
+            state.reserved.add(nonce)
+            return nonce
+
+    def commit(self, caller, nonce):
+        """The transaction with the nonce was executed, or handed over to a transaction store for send_trx."""
+        state = self._state(caller)
+        with state.lock:
+            state.reserved.discard(nonce)
+
+    def release(self, caller, nonce):
+        """The transaction with the nonce will not be executed, hand the nonce out again."""
+        state = self._state(caller)
+        with state.lock:
+            if nonce not in state.reserved:
+                # reserved before a resync
+                return
+            state.reserved.discard(nonce)
+            bisect.insort(state.gaps, nonce)
+            while state.gaps and state.gaps[-1] == state.next - 1:
+                state.gaps.pop()
+                state.next -= 1
+
+    def resync(self, caller):
+        """Forget the reservations of the caller and continue from its on-chain trx_count."""
+        (count,) = self.read_counts([str(caller)])
+        state = self._state(caller)
+        with state.lock:
+            self._reset(state, count)
+        with self._lock:
+            self.resyncs += 1
+        print("nonce of {} resynced: {}".format(caller, count))
+        return count
+
+    def observe(self, caller, nonce, receipt):
+        """Commit the nonce, or resync the caller if the receipt shows a wrong nonce; returns whether it was right."""
+        if invalid_nonce(receipt):
+            self.resync(caller)
+            return False
+        self.commit(caller, nonce)
+        return True
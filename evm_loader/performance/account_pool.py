@@ -0,0 +1 @@
+../account_pool.py
\ No newline at end of file
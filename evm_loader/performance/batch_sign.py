@@ -0,0 +1 @@
+../batch_sign.py
\ No newline at end of file
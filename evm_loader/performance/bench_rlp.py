@@ -0,0 +1,67 @@
+# Benchmark of the RLP decoders: unpack() and unpack_spans() from eth_tx_utils and the rlp package
+#
+# usage:
+#   python3 bench_rlp.py [--repeat 5]
+
+import argparse
+import os
+import timeit
+
+from eth_tx_utils import materialize, pack, unpack, unpack_spans
+
+try:
+    import rlp
+except ImportError:
+    rlp = None
+
+PAYLOAD_SIZES = (10 * 1024, 100 * 1024, 1024 * 1024)
+
+
+def make_payload(size):
+    # a list of transaction-shaped items plus one large callData, similar to what
+    # Trx.fromString and holder-account messages see
+    items = [os.urandom(size // 4)]
+    total = len(items[0])
+    nonce = 0
+    while total < size:
+        call_data = os.urandom(68 + nonce % 200)
+        items.append([nonce, 10 ** 9, 9999999999, os.urandom(20), 0, call_data, 245022940 * 2 + 35,
+                      os.urandom(32), os.urandom(32)])
+        total += len(call_data) + 100
+        nonce += 1
+    return bytes(pack(items))
+
+
+def walk(item):
+    # touch every node of the lazily decoded tree without copying the strings
+    if isinstance(item, list):
+        for i in item:
+            walk(i)
+
+
+def run(repeat):
+    cases = [
+        ("unpack", lambda data: unpack(memoryview(data))),
+        ("unpack_spans", lambda data: walk(unpack_spans(data))),
+        ("unpack_spans+materialize", lambda data: materialize(data, unpack_spans(data))),
+        ("unpack_spans strict", lambda data: walk(unpack_spans(data, strict=True))),
+    ]
+    if rlp is not None:
+        cases.append(("rlp.decode", lambda data: rlp.decode(data, strict=False)))
+    else:
+        print("rlp package is not installed, skip it")
+
+    print("{:>10} {:>24} {:>12} {:>12}".format("size", "decoder", "ms/decode", "MB/s"))
+    for size in PAYLOAD_SIZES:
+        data = make_payload(size)
+        for (name, func) in cases:
+            number = max(1, 2 * 1024 * 1024 // len(data))
+            best = min(timeit.repeat(lambda: func(data), number=number, repeat=repeat)) / number
+            print("{:>10} {:>24} {:>12.3f} {:>12.1f}".format(len(data), name, best * 1000, len(data) / best / 2 ** 20))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='RLP decoder benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.repeat)
@@ -0,0 +1,59 @@
+# Per-transaction cost of building (from, sign, msg) for a Neon transaction
+#
+#   web3+recover - sign_transaction() through web3, parse the raw transaction and recover the sender
+#   sign_tx      - sign the RLP message directly with a cached eth_keys key (make_instruction_data_from_tx)
+#   sign_tx+verify - the same plus public key recovery as a check
+#
+# usage:
+#   python3 bench_sign.py [--count 1000]
+
+import argparse
+import os
+import time
+
+from web3 import Web3
+from web3.auto import w3
+
+from eth_tx_utils import make_instruction_data_from_tx, sign_tx
+
+chain_id = 245022940
+
+
+def make_txs(count):
+    contract = Web3.toChecksumAddress(os.urandom(20).hex())
+    receiver = os.urandom(20).hex()
+    data = bytes.fromhex('a9059cbb' + "%024x" % 0 + receiver + "%064x" % 1)
+    return [{'to': contract, 'value': 0, 'gas': 9999999999, 'gasPrice': 10 ** 9, 'nonce': nonce, 'data': data,
+             'chainId': chain_id} for nonce in range(count)]
+
+
+def web3_recover(tx, pr_key):
+    signed = w3.eth.account.sign_transaction(tx, pr_key)
+    return make_instruction_data_from_tx(signed.rawTransaction.hex())
+
+
+def run(count):
+    pr_key = os.urandom(32)
+    txs = make_txs(count)
+    cases = [
+        ("web3+recover", lambda tx: web3_recover(tx, pr_key)),
+        ("sign_tx", lambda tx: sign_tx(tx, pr_key)),
+        ("sign_tx+verify", lambda tx: sign_tx(tx, pr_key, verify=True)),
+    ]
+    reference = [web3_recover(tx, pr_key) for tx in txs[:10]]
+    assert reference == [sign_tx(tx, pr_key) for tx in txs[:10]]
+
+    print("{:>16} {:>12} {:>12}".format("path", "us/tx", "tx/s"))
+    for (name, func) in cases:
+        start = time.perf_counter()
+        for tx in txs:
+            func(tx)
+        elapsed = (time.perf_counter() - start) / count
+        print("{:>16} {:>12.1f} {:>12.0f}".format(name, elapsed * 10 ** 6, 1 / elapsed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='transaction signing benchmark')
+    parser.add_argument('--count', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.count)
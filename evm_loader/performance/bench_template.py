@@ -0,0 +1,80 @@
+# Serialization throughput of the sol_instr_keccak + sol_instr_05 transaction used by erc20.send_transactions
+#
+#   Transaction    - Transaction().add(...), sign() and serialize() through solana-py
+#   MessageTemplate - the pre-compiled message from tools.sol_instr_05_template()
+#
+# Associated token accounts are resolved up front, so only building and signing is measured.
+#
+# usage:
+#   python3 bench_template.py [--count 1000]
+
+import argparse
+import os
+import time
+
+from tools import *
+
+
+def make_records(count):
+    records = []
+    for _ in range(count):
+        (contract, caller) = (PublicKey(os.urandom(32)), PublicKey(os.urandom(32)))
+        records.append({
+            'contract': contract,
+            'contract_token': associated_token_address(contract),
+            'contract_code': PublicKey(os.urandom(32)),
+            'caller': caller,
+            'caller_token': associated_token_address(caller),
+            'data': os.urandom(20 + 65 + 180),
+        })
+    return records
+
+
+def with_transaction(rec, signer, blockhash):
+    trx = Transaction()
+    trx.add(sol_instr_keccak(make_keccak_instruction_data(1, len(rec['data']) - 85, 1)))
+    trx.add(TransactionInstruction(program_id=evm_loader_id, data=b'\x05' + rec['data'], keys=[
+        AccountMeta(pubkey=rec['contract'], is_signer=False, is_writable=True),
+        AccountMeta(pubkey=rec['contract_token'], is_signer=False, is_writable=True),
+        AccountMeta(pubkey=rec['contract_code'], is_signer=False, is_writable=True),
+        AccountMeta(pubkey=rec['caller'], is_signer=False, is_writable=True),
+        AccountMeta(pubkey=rec['caller_token'], is_signer=False, is_writable=True),
+        AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
+        AccountMeta(pubkey=evm_loader_id, is_signer=False, is_writable=False),
+        AccountMeta(pubkey=ETH_TOKEN_MINT_ID, is_signer=False, is_writable=False),
+        AccountMeta(pubkey=PublicKey(sysvarclock), is_signer=False, is_writable=False),
+    ]))
+    trx.recent_blockhash = blockhash
+    trx.sign(signer)
+    return trx.serialize()
+
+
+def with_template(template, rec, signer, blockhash):
+    return template.build(signer, blockhash, rec,
+                          [make_keccak_instruction_data(1, len(rec['data']) - 85, 1), b'\x05' + rec['data']])
+
+
+def run(count):
+    signers = [Account() for _ in range(10)]
+    blockhash = str(PublicKey(os.urandom(32)))
+    records = make_records(count)
+    template = sol_instr_05_template(True)
+    cases = [
+        ("Transaction", lambda i, rec: with_transaction(rec, signers[i % 10], blockhash)),
+        ("MessageTemplate", lambda i, rec: with_template(template, rec, signers[i % 10], blockhash)),
+    ]
+
+    print("{:>16} {:>12} {:>12}".format("path", "us/tx", "tx/s"))
+    for (name, func) in cases:
+        start = time.perf_counter()
+        for (i, rec) in enumerate(records):
+            func(i, rec)
+        elapsed = (time.perf_counter() - start) / count
+        print("{:>16} {:>12.1f} {:>12.0f}".format(name, elapsed * 10 ** 6, 1 / elapsed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='transaction serialization benchmark')
+    parser.add_argument('--count', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.count)
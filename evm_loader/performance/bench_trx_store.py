@@ -0,0 +1,66 @@
+# Size and read time of the pre-signed transactions of erc20.create_transactions
+#
+#   json - transaction.json lines, parsed with json and bytes.fromhex
+#   bin  - trx_store, read through the memory-mapped TrxReader
+#
+# Records are random ERC20 transfers over --contracts contracts and --payers payers.
+#
+# usage:
+#   python3 bench_trx_store.py [--count 100000] [--contracts 10] [--payers 1000]
+
+import argparse
+import os
+import tempfile
+import time
+
+from solana.publickey import PublicKey
+
+from trx_store import JsonTrxWriter, TrxReader, TrxRecord, TrxWriter, read_json_records
+
+
+def make_records(count, contracts, payers):
+    contract_keys = [(str(PublicKey(os.urandom(32))), os.urandom(20), str(PublicKey(os.urandom(32))))
+                     for _ in range(contracts)]
+    payer_keys = [(str(PublicKey(os.urandom(32))), os.urandom(20)) for _ in range(payers)]
+    for i in range(count):
+        (erc20_sol, erc20_eth, erc20_code) = contract_keys[i % contracts]
+        (payer_sol, payer_eth) = payer_keys[i % payers]
+        yield TrxRecord(payer_eth, os.urandom(65), os.urandom(110), erc20_sol, erc20_eth, erc20_code, payer_sol,
+                        payer_eth, payer_keys[(i + 1) % payers][1])
+
+
+def read_all(records):
+    # what send_transactions touches per record
+    total = 0
+    for rec in records:
+        total += len(b'\x05' + rec.from_addr + rec.sign + rec.msg) + len(rec.erc20_sol) + len(rec.payer_sol)
+    return total
+
+
+def run(count, contracts, payers):
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = [
+            ("json", JsonTrxWriter, read_json_records, os.path.join(tmp, "transaction.json")),
+            ("bin", TrxWriter, TrxReader, os.path.join(tmp, "transaction.bin")),
+        ]
+        print("{:>6} {:>12} {:>12} {:>12}".format("format", "bytes/tx", "write us/tx", "read us/tx"))
+        for (name, writer_class, reader, path) in cases:
+            start = time.perf_counter()
+            with writer_class(path) as writer:
+                for record in make_records(count, contracts, payers):
+                    writer.write(record)
+            write = (time.perf_counter() - start) / count
+            start = time.perf_counter()
+            read_all(reader(path))
+            read = (time.perf_counter() - start) / count
+            print("{:>6} {:>12.1f} {:>12.1f} {:>12.1f}".format(name, os.path.getsize(path) / count, write * 10 ** 6,
+                                                               read * 10 ** 6))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='transaction store benchmark')
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--contracts', type=int, default=10)
+    parser.add_argument('--payers', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.count, args.contracts, args.payers)
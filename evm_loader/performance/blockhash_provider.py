@@ -0,0 +1 @@
+../blockhash_provider.py
\ No newline at end of file
@@ -1,2 +1,4 @@
 #!/bin/bash
 rm -rf *.json* *.yml* 
+# transaction store, event index and verify results
+rm -rf transaction.bin* events.sqlite* verify_results.txt* verify_checkpoint.json*
@@ -0,0 +1 @@
+../collateral_pool.py
\ No newline at end of file
@@ -0,0 +1 @@
+../confirmation.py
\ No newline at end of file
@@ -0,0 +1 @@
+../cu_profiler.py
\ No newline at end of file
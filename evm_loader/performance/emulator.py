@@ -0,0 +1 @@
+../emulator.py
\ No newline at end of file
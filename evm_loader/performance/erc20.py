@@ -9,18 +9,11 @@ erc20_factory_path = "contracts/Factory.binary"
 
 def check_address_event(result, factory_eth, erc20_eth):
     assert (result['meta']['err'] == None)
-    assert (len(result['meta']['innerInstructions']) == 2)
-    assert (len(result['meta']['innerInstructions'][1]['instructions']) == 2)
-    data = b58decode(result['meta']['innerInstructions'][1]['instructions'][1]['data'])
-    assert (data[:1] == b'\x06')  # OnReturn
-    assert (data[1] == 0x11)  # 11 - Machine encountered an explict stop
-
-    data = b58decode(result['meta']['innerInstructions'][1]['instructions'][0]['data'])
-    assert (data[:1] == b'\x07')  # 7 means OnEvent
-    assert (data[1:21] == factory_eth)
-    assert (data[21:29] == bytes().fromhex('%016x' % 1)[::-1])  # topics len
-    assert (data[29:61] == abi.event_signature_to_log_topic('Address(address)'))  # topics
-    assert (data[61:93] == bytes().fromhex("%024x" % 0) + erc20_eth)  # sum
+    decoded = decode_transaction(result)
+    assert (decoded.on_return.status == 0x11)  # 11 - Machine encountered an explict stop
+    (event,) = decoded.find(factory_eth, abi.event_signature_to_log_topic('Address(address)'))
+    assert (len(event.topics) == 1)
+    assert (event.data[:32] == address_topic(erc20_eth))
 
 
 def get_filehash(factory, factory_code, factory_eth, acc):
@@ -31,14 +24,14 @@ def get_filehash(factory, factory_code, factory_eth, acc):
             data=bytearray.fromhex("03") + abi.function_signature_to_4byte_selector('get_hash()'),
             keys=[
                 AccountMeta(pubkey=factory, is_signer=False, is_writable=True),
-                AccountMeta(pubkey=get_associated_token_address(PublicKey(factory), ETH_TOKEN_MINT_ID), is_signer=False,
+                AccountMeta(pubkey=associated_token_address(factory), is_signer=False,
                             is_writable=True),
                 AccountMeta(pubkey=factory_code, is_signer=False, is_writable=True),
                 AccountMeta(pubkey=acc.public_key(), is_signer=True, is_writable=False),
-                AccountMeta(pubkey=evm_loader_id, is_signer=False, is_writable=False),
-                AccountMeta(pubkey=ETH_TOKEN_MINT_ID, is_signer=False, is_writable=False),
-                AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-                AccountMeta(pubkey=PublicKey(sysvarclock), is_signer=False, is_writable=False),
+                account_meta(evm_loader_id),
+                account_meta(ETH_TOKEN_MINT_ID),
+                account_meta(TOKEN_PROGRAM_ID),
+                account_meta(sysvarclock),
             ]))
     result = send_transaction(client, trx, acc)['result']
     print(result)
@@ -52,18 +45,7 @@ def get_filehash(factory, factory_code, factory_eth, acc):
         exit(1)
 
     assert (result['meta']['err'] == None)
-    assert (len(result['meta']['innerInstructions']) == 1)
-    assert (len(result['meta']['innerInstructions'][0]['instructions']) == 2)
-    data = b58decode(result['meta']['innerInstructions'][0]['instructions'][1]['data'])
-    assert (data[:1] == b'\x06')  # OnReturn
-    assert (data[1] == 0x11)  # 11 - Machine encountered an explict stop
-
-    data = b58decode(result['meta']['innerInstructions'][0]['instructions'][0]['data'])
-    assert (data[:1] == b'\x07')  # 7 means OnEvent
-    assert (data[1:21] == factory_eth)
-    assert (data[21:29] == bytes().fromhex('%016x' % 1)[::-1])  # topics len
-    hash = data[61:93]
-    return hash
+    return returned_word(result, factory_eth)
 
 
 
@@ -127,28 +109,31 @@ def deploy_erc20(args):
                 data=trx_data,
                 keys=[
                     AccountMeta(pubkey=factory, is_signer=False, is_writable=True),
-                    AccountMeta(pubkey=get_associated_token_address(PublicKey(factory), ETH_TOKEN_MINT_ID),
+                    AccountMeta(pubkey=associated_token_address(factory),
                                 is_signer=False, is_writable=True),
                     AccountMeta(pubkey=factory_code, is_signer=False, is_writable=True),
                     AccountMeta(pubkey=instance.acc.public_key(), is_signer=True, is_writable=False),
                     AccountMeta(pubkey=erc20_id, is_signer=False, is_writable=True),
-                    AccountMeta(pubkey=get_associated_token_address(PublicKey(erc20_id), ETH_TOKEN_MINT_ID),
+                    AccountMeta(pubkey=associated_token_address(erc20_id),
                                 is_signer=False, is_writable=True),
                     AccountMeta(pubkey=erc20_code, is_signer=False, is_writable=True),
-                    AccountMeta(pubkey=evm_loader_id, is_signer=False, is_writable=False),
-                    AccountMeta(pubkey=ETH_TOKEN_MINT_ID, is_signer=False, is_writable=False),
-                    AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-                    AccountMeta(pubkey=PublicKey(sysvarclock), is_signer=False, is_writable=False),
+                    account_meta(evm_loader_id),
+                    account_meta(ETH_TOKEN_MINT_ID),
+                    account_meta(TOKEN_PROGRAM_ID),
+                    account_meta(sysvarclock),
                 ]))
-        res = client.send_transaction(trx, instance.acc,
-                                      opts=TxOpts(skip_confirmation=True, preflight_commitment="confirmed"))
+        res = blockhash_provider.send_transaction(trx, instance.acc,
+                                                  opts=TxOpts(skip_confirmation=True, preflight_commitment="confirmed"))
 
         receipt_list.append((str(erc20_id), erc20_ether, str(erc20_code), res["result"]))
 
         if i % 50 == 0 or i == args_count - 1:
+            confirmed_receipts = confirm_receipts([receipt for (_, _, _, receipt) in receipt_list])
             for (erc20_id, erc20_ether, erc20_code, receipt) in receipt_list:
                 total = total + 1
-                confirm_transaction(client, receipt)
+                if receipt not in confirmed_receipts:
+                    receipt_error = receipt_error + 1
+                    continue
                 res = client.get_confirmed_transaction(receipt)
                 if res['result'] == None:
                     receipt_error = receipt_error + 1
@@ -239,16 +224,18 @@ def create_accounts(args):
         trx = Transaction()
         (transaction, acc_sol) = instance.loader.createEtherAccountTrx(acc_eth)
         trx.add(transaction)
-        res = client.send_transaction(trx, instance.acc,
-                                      opts=TxOpts(skip_confirmation=True, skip_preflight=True, preflight_commitment="confirmed"))
+        res = blockhash_provider.send_transaction(trx, instance.acc,
+                                                  opts=TxOpts(skip_confirmation=True, skip_preflight=True, preflight_commitment="confirmed"))
         receipt_list.append((acc_eth.hex(), acc_sol, res['result']))
         pr_key_list[acc_eth.hex()] = (acc_sol, pr_key.privateKey.hex()[2:])
 
         total = total + 1
         if total % 50 == 0 :
+            confirmed_receipts = confirm_receipts([receipt for (_, _, receipt) in receipt_list])
             for (acc_eth_hex, acc_sol, receipt) in receipt_list:
+                if receipt not in confirmed_receipts:
+                    continue
                 try:
-                    confirm_transaction_(client, receipt)
                     res = client.get_confirmed_transaction(receipt)
                     if res['result'] == None:
                         print("createEtherAccount, get_confirmed_transaction() error")
@@ -318,8 +305,6 @@ def create_transactions(args):
         contracts = json.loads(f.read())
     with open(accounts_file + args.postfix, mode='r') as f:
         accounts = json.loads(f.read())
-    transactions = open(transactions_file + args.postfix, mode='w')
-    transactions = open(transactions_file + args.postfix, mode='a')
 
     func_name = abi.function_signature_to_4byte_selector('transfer(address,uint256)')
     total = 0
@@ -335,111 +320,120 @@ def create_transactions(args):
         print("contracts not found")
         exit(1)
 
-    ia = iter(accounts)
-    ic = iter(contracts)
-
-    while total < args.count:
-        try:
-            (erc20_sol, erc20_eth_hex, erc20_code) = next(ic)
-        except StopIteration as err:
-            ic = iter(contracts)
-            continue
-        try:
-            (payer_eth, payer_prkey, payer_sol) = next(ia)
-        except StopIteration as err:
-            ia = iter(accounts)
-            (payer_eth, payer_prkey, payer_sol) = next(ia)
-
-        (receiver_eth, _, _) = accounts[random.randint(0, len(accounts) - 1)]
-        if payer_eth == receiver_eth:
-            continue
+    # the nonces of all payers in a few getMultipleAccounts requests
+    nonces.prefetch([payer_sol for (_, _, payer_sol) in accounts])
+
+    def unsigned_transactions():
+        total = 0
+        ia = iter(accounts)
+        ic = iter(contracts)
+
+        while total < args.count:
+            try:
+                (erc20_sol, erc20_eth_hex, erc20_code) = next(ic)
+            except StopIteration as err:
+                ic = iter(contracts)
+                continue
+            try:
+                (payer_eth, payer_prkey, payer_sol) = next(ia)
+            except StopIteration as err:
+                ia = iter(accounts)
+                (payer_eth, payer_prkey, payer_sol) = next(ia)
+
+            (receiver_eth, _, _) = accounts[random.randint(0, len(accounts) - 1)]
+            if payer_eth == receiver_eth:
+                continue
 
-        total = total + 1
-        trx_data = func_name + \
-                   bytes().fromhex("%024x" % 0 + receiver_eth) + \
-                   bytes().fromhex("%064x" % transfer_sum)
-        (from_addr, sign, msg) = get_trx(
-            bytes().fromhex(erc20_eth_hex),
-            payer_sol,
-            bytes().fromhex(payer_eth),
-            trx_data,
-            bytes.fromhex(payer_prkey),
-            0
-        )
-        trx = {}
-        trx['from_addr'] = from_addr.hex()
-        trx['sign'] = sign.hex()
-        trx['msg'] = msg.hex()
-        trx['erc20_sol'] = erc20_sol
-        trx['erc20_eth'] = erc20_eth_hex
-        trx['erc20_code'] = erc20_code
-        trx['payer_sol'] = payer_sol
-        trx['payer_eth'] = payer_eth
-        trx['receiver_eth'] = receiver_eth
-
-        transactions.write(json.dumps(trx) + "\n")
+            total = total + 1
+            trx_data = func_name + \
+                       bytes().fromhex("%024x" % 0 + receiver_eth) + \
+                       bytes().fromhex("%064x" % transfer_sum)
+            tx = make_tx(bytes().fromhex(erc20_eth_hex), payer_sol, trx_data, 0)
+            yield (tx, bytes.fromhex(payer_prkey),
+                   (erc20_sol, erc20_eth_hex, erc20_code, payer_sol, payer_eth, receiver_eth, tx['nonce']))
+
+    with transactions_writer(args) as transactions:
+        for ((erc20_sol, erc20_eth_hex, erc20_code, payer_sol, payer_eth, receiver_eth, nonce), (from_addr, sign, msg)) \
+                in sign_trx_batch(args, unsigned_transactions()):
+            assert (from_addr.hex() == payer_eth)
+            total = total + 1
+            transactions.write(TrxRecord(from_addr, sign, msg, erc20_sol, bytes.fromhex(erc20_eth_hex), erc20_code,
+                                         payer_sol, bytes.fromhex(payer_eth), bytes.fromhex(receiver_eth)))
+            # send_trx sends it from the store
+            nonces.commit(payer_sol, nonce)
 
     print("\ntotal:", total)
 
 
-def get_block_hash():
-    try:
-        blockhash_resp = client.get_recent_blockhash()
-        if not blockhash_resp["result"]:
-            raise RuntimeError("failed to get recent blockhash")
-        return (Blockhash(blockhash_resp["result"]["value"]["blockhash"]), time.time())
-    except Exception as err:
-        raise RuntimeError("failed to get recent blockhash") from err
-
-
 def send_transactions(args):
     instance = init_wallet()
     senders = init_senders(args)
+    signers = SignerPool(senders.accounts, get_bulk_rpc(), min_balance=args.min_balance,
+                         funder=instance.acc if args.top_up else None, top_up=args.top_up,
+                         blockhash_provider=blockhash_provider)
 
     count_err = 0
 
-    eth_trx = open(transactions_file + args.postfix, mode='r')
+    eth_trx = transaction_records(args)
 
     verify = open(verify_file + args.postfix, mode='w')
     verify = open(verify_file + args.postfix, mode='a')
 
-    (recent_blockhash, blockhash_time) = get_block_hash()
+    blockhash_provider.start()
+    templates = {}
+
+    def build_wire(rec, signer):
+        # the same shape as sol_instr_keccak + sol_instr_05, without recompiling the message every time
+        with_code = rec.erc20_code != ""
+        template = templates.get(with_code) or templates.setdefault(with_code, sol_instr_05_template(with_code))
+        slots = {
+            'contract': rec.erc20_sol,
+            'contract_token': associated_token_address(rec.erc20_sol),
+            'contract_code': rec.erc20_code,
+            'caller': rec.payer_sol,
+            'caller_token': associated_token_address(rec.payer_sol),
+        }
+        return template.build(signer, blockhash_provider.get(), slots,
+                              [make_keccak_instruction_data(1, len(rec.msg), 1),
+                               b'\x05' + rec.from_addr + rec.sign + rec.msg])
+
+    if args.waves:
+        records = (rec for (_, rec) in zip(range(args.count), eth_trx))
+        send_transactions_in_waves(args, records, build_wire, signers, verify)
+        return
+
+    # frees the in-flight slot of a signer once its transaction is confirmed
+    tracker = ConfirmationTracker(get_bulk_rpc()).start()
     start = time.time()
     total = 0
     trx_times = []
     cycle_times = []
-    for line in eth_trx:
-        rec = json.loads(line)
-
+    for rec in eth_trx:
         cycle_start = time.time()
         total = total + 1
         if args.count != None:
             if total > args.count:
                 break
-        if time.time() - blockhash_time > 5:
-            (recent_blockhash, blockhash_time) = get_block_hash()
 
-        from_addr = bytes.fromhex(rec['from_addr'])
-        sign = bytes.fromhex(rec['sign'])
-        msg = bytes.fromhex(rec['msg'])
-        trx = Transaction()
-        trx.add(sol_instr_keccak(make_keccak_instruction_data(1, len(msg))))
-        trx.add(sol_instr_05((from_addr + sign + msg), rec['erc20_sol'], rec['erc20_code'], rec['payer_sol']))
-        trx.recent_blockhash = recent_blockhash
-        trx.sign(senders.next_acc())
+        signer = signers.next_acc()
+        wire_trx = build_wire(rec, signer)
 
         try:
             print("send trx", total)
             trx_start = time.time()
-            res = client.send_raw_transaction(trx.serialize(),
+            res = client.send_raw_transaction(wire_trx,
                                               opts=TxOpts(skip_confirmation=True, preflight_commitment="confirmed",
                                                           skip_preflight=True))
             trx_end = time.time()
         except Exception as err:
             print(err)
+            if rate_limited_error(err):
+                signers.rate_limited(signer)
             count_err = count_err + 1
             continue
-        verify.write(json.dumps((rec['erc20_eth'], rec['payer_eth'], rec['receiver_eth'], res["result"])) + "\n")
+        signers.sent(signer, res["result"])
+        tracker.add(res["result"], callback=lambda future, signature=res["result"]: signers.done(signature))
+        verify.write(json.dumps((rec.erc20_eth.hex(), rec.payer_eth.hex(), rec.receiver_eth.hex(), res["result"])) + "\n")
         cycle_end = time.time()
         trx_times.append(trx_end - trx_start)
         cycle_times.append(cycle_end - cycle_start)
@@ -450,59 +444,64 @@ def send_transactions(args):
     print("time:", end - start, "sec")
     print("avg send_raw_transaction time:  ", statistics.mean(trx_times), "sec")
     print("avg cycle time:                 ", statistics.mean(cycle_times), "sec")
+    tracker.stop()
+    signers.stop()
+    signers.report()
+
+
+def transfer_accounts(rec):
+    """Accounts an ERC20 or SPL transfer TrxRecord writes; the receiver is in the contract storage."""
+    writable = {rec.erc20_sol, rec.payer_sol}
+    if rec.erc20_code:
+        writable.add(rec.erc20_code)
+    return WaveItem(rec, frozenset(writable))
+
+
+def send_transactions_in_waves(args, records, build_wire, signers, verify):
+    """send_transactions with the transactions of a wave in flight together and no two of them on one account."""
+    rpc = get_bulk_rpc()
+    opts = TxOpts(skip_confirmation=True, preflight_commitment="confirmed", skip_preflight=True)
+
+    def dispatch(wave):
+        wave_signers = [signers.next_acc() for _ in wave]
+        wires = [build_wire(rec, signer) for (rec, signer) in zip(wave, wave_signers)]
+        responses = rpc.gather([rpc.rpc.send_raw_transaction(wire, opts=opts) for wire in wires])
+        for (signer, res) in zip(wave_signers, responses):
+            if res.get('result'):
+                signers.sent(signer, res['result'])
+            elif rate_limited_error(res):
+                signers.rate_limited(signer)
+        statuses = confirm_transactions(rpc, [res['result'] for res in responses if res.get('result')])
+        for signature in statuses:
+            signers.done(signature)
+        return responses
+
+    scheduler = WaveScheduler(dispatch, max_width=args.waves)
+    (total, count_err) = (0, 0)
+    start = time.time()
+    for (item, res) in scheduler.run(transfer_accounts(rec) for rec in records):
+        total = total + 1
+        rec = item.tx
+        if not res.get('result'):
+            print(res.get('error'))
+            count_err = count_err + 1
+            continue
+        verify.write(json.dumps((rec.erc20_eth.hex(), rec.payer_eth.hex(), rec.receiver_eth.hex(), res["result"])) + "\n")
 
+    print("total:", total)
+    print("errors:", count_err)
+    print("time:", time.time() - start, "sec")
+    scheduler.stats.report()
+    signers.stop()
+    signers.report()
 
-def verify_trx(args):
-    verify = open(verify_file + args.postfix, 'r')
-    total = 0
-    event_error = 0
-    receipt_error = 0
-    nonce_error = 0
-    unknown_error = 0
-    revert_error = 0
 
-    for line in verify:
-        total = total + 1
-        if args.count != None:
-            if total > args.count:
-                break
-        success = False
-        (erc20_eth, payer_eth, receiver_eth, receipt) = json.loads(line)
-        # confirm_transaction(client, receipt)
-        res = client.get_confirmed_transaction(receipt)
-        if res['result'] == None:
-            receipt_error = receipt_error + 1
-            print(success)
-        else:
-            if res['result']['meta']['err'] == None:
-                if found_revert(res['result']):
-                    revert_error = revert_error + 1
-                    success = True
-                else:
-                    if check_transfer_event(res['result'], erc20_eth, payer_eth, receiver_eth, transfer_sum, b'\x12'):
-                        success = True
-                    else:
-                        print(res['result'])
-                        event_error = event_error + 1
-            else:
-                print(res["result"])
-                found = False
-                for err in res['result']['meta']['err']['InstructionError']:
-                    if err == "InvalidArgument":
-                        found = True
-                        break
-                if found:
-                    nonce_error = nonce_error + 1
-                else:
-                    unknown_error = unknown_error + 1
-            print(success, res['result']['slot'])
+def verify_trx(args):
+    def check(record, decoded):
+        (erc20_eth, payer_eth, receiver_eth, _) = record
+        return check_transfer_event(decoded, erc20_eth, payer_eth, receiver_eth, transfer_sum, b'\x12')
 
-    print("\ntotal:", total)
-    print("event_error:", event_error)
-    print("nonce_error:", nonce_error)
-    print("unknown_error:", unknown_error)
-    print("receipt_error:", receipt_error)
-    print("revert_error:", revert_error)
+    verify_transactions(args, check)
 
 
 def create_senders(args):
@@ -518,22 +517,20 @@ def create_senders(args):
             tx = Transaction()
             tx.add(transfer(param))
             tx.add(create_associated_token_account(instance.acc.public_key(), acc.public_key(), ETH_TOKEN_MINT_ID))
-            res = client.send_transaction(tx, instance.acc,
-                                          opts=TxOpts(skip_confirmation=True, skip_preflight=True, preflight_commitment="confirmed"))
+            res = blockhash_provider.send_transaction(tx, instance.acc,
+                                                      opts=TxOpts(skip_confirmation=True, skip_preflight=True, preflight_commitment="confirmed"))
 
             receipt_list.append((res['result'], acc))
 
             total = total + 1
             if total % 50 == 0:
+                confirmed_receipts = confirm_receipts([receipt for (receipt, _) in receipt_list])
                 for (receipt, acc) in receipt_list:
-                    try:
-                        confirm_transaction_(client, receipt)
+                    if receipt in confirmed_receipts:
                         confirmed = confirmed + 1
                         keypair = acc.secret_key().hex() + bytes(acc.public_key()).hex()
                         f.write(keypair + "\n")
-                        print(f"confirmed {confirmed} ", acc.public_key(), get_associated_token_address(acc.public_key(), ETH_TOKEN_MINT_ID))
-                    except:
-                        print(f"transaction is lost {receipt}")
+                        print(f"confirmed {confirmed} ", acc.public_key(), associated_token_address(acc.public_key()))
                 receipt_list = []
 
     print("\nconfirmed: ", confirmed)
@@ -551,6 +548,7 @@ def create_collateral_pool(args):
     confirmed = 0
     receipt_list = []
     minimum_balance = client.get_minimum_balance_for_rent_exemption(0, commitment=Confirmed)["result"]
+    balances = {}
 
     with open(collateral_file + args.postfix, mode="a") as f:
         while True:
@@ -558,14 +556,21 @@ def create_collateral_pool(args):
             seed = "collateral_seed_" + str(total)
             acc =  accountWithSeed(PublicKey(collateral_pool_base), seed, PublicKey(evm_loader_id))
 
-            if getBalance(acc) == 0:
+            if total not in balances:
+                # read the balances of the next 100 pool accounts at once
+                indexes = range(total, total + 100)
+                accounts = [accountWithSeed(PublicKey(collateral_pool_base), "collateral_seed_" + str(i),
+                                            PublicKey(evm_loader_id)) for i in indexes]
+                balances = dict(zip(indexes, get_balances(accounts)))
+
+            if balances[total] == 0:
                 print("Creating...", total)
                 trx = Transaction()
                 trx.add(
                     createAccountWithSeed(wallet.public_key(), PublicKey(collateral_pool_base), seed, minimum_balance,
                                           0, PublicKey(evm_loader_id)))
-                res = client.send_transaction(trx, wallet,
-                                              opts=TxOpts(skip_confirmation=True, skip_preflight=True, preflight_commitment="confirmed"))
+                res = blockhash_provider.send_transaction(trx, wallet,
+                                                          opts=TxOpts(skip_confirmation=True, skip_preflight=True, preflight_commitment="confirmed"))
                 receipt_list.append((res['result'], acc, total))
             else:
                 to_file.append((acc, total))
@@ -573,13 +578,11 @@ def create_collateral_pool(args):
 
             total = total + 1
             if total % 50 == 0:
+                confirmed_receipts = confirm_receipts([receipt for (receipt, _, _) in receipt_list])
                 for (receipt, acc, index) in receipt_list:
-                    try:
-                        confirm_transaction_(client, receipt)
+                    if receipt in confirmed_receipts:
                         confirmed = confirmed + 1
                         to_file.append((acc, index))
-                    except:
-                        print(f"transaction is lost {receipt}")
 
                 receipt_list = []
 
@@ -0,0 +1 @@
+../evm_events.py
\ No newline at end of file
@@ -0,0 +1 @@
+../holder_writer.py
\ No newline at end of file
@@ -0,0 +1 @@
+../iterative_pipeline.py
\ No newline at end of file
@@ -0,0 +1 @@
+../message_template.py
\ No newline at end of file
@@ -0,0 +1 @@
+../nonce_manager.py
\ No newline at end of file
@@ -0,0 +1 @@
+../program_address.py
\ No newline at end of file
@@ -0,0 +1 @@
+../rpc_client.py
\ No newline at end of file
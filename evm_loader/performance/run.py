@@ -12,6 +12,16 @@ parser.add_argument('--step', metavar="step of the test", type=str,
 parser.add_argument('--postfix', metavar="filename postfix", type=str,  help='0,1,2..', default='')
 parser.add_argument('--type', metavar="transfer type", type=str,  help='erc20, spl, swap', default='erc20')
 parser.add_argument('--key', metavar="keypair", type=str,  help='/home/solana/collateral-pool-keypair.json', default='')
+parser.add_argument('--sign_processes', metavar="signing processes", type=int,  help='processes used to sign transactions, 0 - all cores', default=0)
+parser.add_argument('--in_flight', metavar="continues in flight", type=int,  help='continue transactions in flight per iterative call', default=3)
+parser.add_argument('--min_balance', metavar="lamports", type=int,  help='senders below the balance are parked', default=100000)
+parser.add_argument('--waves', metavar="wave width", type=int,  help='send_trx in waves of transactions without common accounts, at most N per wave, 0 - in file order', default=0)
+parser.add_argument('--verify_concurrency', metavar="receipts in flight", type=int,  help='verify_trx: receipts fetched concurrently', default=64)
+parser.add_argument('--resume', action='store_true',  help='verify_trx: continue from the checkpoint of the previous run')
+parser.add_argument('--trx_format', metavar="format", type=str,  help='create_trx/send_trx: json - transaction.json (also read by the Rust sender), bin - transaction.bin', default='json')
+parser.add_argument('--top_up', metavar="lamports", type=int,  help='top up parked senders from the operator wallet, 0 - off', default=0)
+parser.add_argument('--pool_size', metavar="accounts", type=int,  help='holder and storage accounts leased to iterative calls (swap)', default=4)
+parser.add_argument('--cancel_abandoned', action='store_true',  help='cancel calls left in busy storage accounts with CancelWithNonce')
 
 args = parser.parse_args()
 
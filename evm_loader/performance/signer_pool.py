@@ -0,0 +1 @@
+../signer_pool.py
\ No newline at end of file
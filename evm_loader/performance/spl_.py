@@ -7,7 +7,7 @@ def mint_spl(accounts, instance):
     receipt_error = 0
     account_minted = []
     for (acc_eth_hex, acc_sol) in accounts:
-        dest = get_associated_token_address(PublicKey(acc_sol), ETH_TOKEN_MINT_ID)
+        dest = associated_token_address(acc_sol)
         print("mint: ", dest)
 
         param = spl_token.TransferParams(
@@ -20,15 +20,18 @@ def mint_spl(accounts, instance):
         trx = Transaction()
         trx.add(spl_token.transfer(param))
 
-        res = client.send_transaction(trx, instance.acc,
-                                      opts=TxOpts(skip_confirmation=True, skip_preflight=True,
-                                                  preflight_commitment="confirmed"))
+        res = blockhash_provider.send_transaction(trx, instance.acc,
+                                                  opts=TxOpts(skip_confirmation=True, skip_preflight=True,
+                                                              preflight_commitment="confirmed"))
         receipt_list.append((acc_eth_hex, res["result"]))
 
         total = total + 1
         if total % 50 == 0 or total == len(accounts):
+            confirmed_receipts = confirm_receipts([receipt for (_, receipt) in receipt_list])
             for (acc_eth_hex, receipt) in receipt_list:
-                confirm_transaction(client, receipt)
+                if receipt not in confirmed_receipts:
+                    receipt_error = receipt_error + 1
+                    continue
                 res = client.get_confirmed_transaction(receipt)
                 if res['result'] == None:
                     receipt_error = receipt_error + 1
@@ -47,48 +50,7 @@ def mint_spl(accounts, instance):
 
 
 def verify_trx_spl(args):
-    verify = open(verify_file+args.postfix, 'r')
-    total = 0
-    receipt_error = 0
-    nonce_error = 0
-    unknown_error = 0
-    revert_error = 0
-
-    for line in verify:
-        total = total + 1
-        if args.count != None:
-            if total > args.count:
-                break
-        success = False
-        (erc20_eth, payer_eth, receiver_eth, receipt) = json.loads(line)
-        res = client.get_confirmed_transaction(receipt)
-        if res['result'] == None:
-            receipt_error = receipt_error + 1
-            print(success)
-        else:
-            if res['result']['meta']['err'] == None:
-                if found_revert(res['result']):
-                    revert_error = revert_error + 1
-                success = True
-            else:
-                print(res["result"])
-                found = False
-                for err in res['result']['meta']['err']['InstructionError']:
-                    if err == "InvalidArgument":
-                        found = True
-                        break
-                if found:
-                    nonce_error = nonce_error + 1
-                else:
-                    unknown_error = unknown_error + 1
-            print(success, res['result']['slot'])
-
-
-    print("\ntotal:", total)
-    print("nonce_error:", nonce_error)
-    print("unknown_error:", unknown_error)
-    print("receipt_error:", receipt_error)
-    print("revert_error:", revert_error)
+    verify_transactions(args)
 
 
 
@@ -100,8 +62,7 @@ def create_transactions_spl(args):
         for line in f:
             accounts.append(line)
 
-    with open(transactions_file + args.postfix, mode='w') as f:
-
+    def unsigned_transactions():
         total = 0
         ia = iter(accounts)
 
@@ -110,26 +71,18 @@ def create_transactions_spl(args):
             (receiver_eth, _, receiver_sol) = get_acc(accounts, ia)
 
             total = total + 1
-            (from_addr, sign,  msg) = get_trx(
-                bytes().fromhex(receiver_eth),
-                payer_sol,
-                bytes().fromhex(payer_eth),
-                "",
-                bytes.fromhex(payer_prkey),
-                transfer_sum*10**9
-            )
-            trx = {}
-            trx['from_addr'] = from_addr.hex()
-            trx['sign'] = sign.hex()
-            trx['msg']  = msg.hex()
-            trx['erc20_sol'] = receiver_sol
-            trx['erc20_eth'] = receiver_eth
-            trx['erc20_code'] = ""
-            trx['payer_sol'] = payer_sol
-            trx['payer_eth'] = payer_eth
-            trx['receiver_eth'] = receiver_eth
+            tx = make_tx(bytes().fromhex(receiver_eth), payer_sol, "", transfer_sum*10**9)
+            yield (tx, bytes.fromhex(payer_prkey), (payer_eth, payer_sol, receiver_eth, receiver_sol, tx['nonce']))
 
-            f.write(json.dumps(trx)+"\n")
+    with transactions_writer(args) as f:
+        for ((payer_eth, payer_sol, receiver_eth, receiver_sol, nonce), (from_addr, sign,  msg)) in \
+                sign_trx_batch(args, unsigned_transactions()):
+            assert (from_addr.hex() == payer_eth)
+            # the receiver is the "contract" of an SPL transfer
+            f.write(TrxRecord(from_addr, sign, msg, receiver_sol, bytes.fromhex(receiver_eth), "", payer_sol,
+                              bytes.fromhex(payer_eth), bytes.fromhex(receiver_eth)))
+            # send_trx sends it from the store
+            nonces.commit(payer_sol, nonce)
 
 
 def create_account_spl(args):
@@ -151,21 +104,23 @@ def create_account_spl(args):
             param = spl_token.TransferParams(
                 program_id = TOKEN_PROGRAM_ID,
                 source = instance.wallet_token,
-                dest = get_associated_token_address(PublicKey(acc_sol), ETH_TOKEN_MINT_ID),
+                dest = associated_token_address(acc_sol),
                 owner = instance.acc.public_key(),
                 amount=10**9
             )
             trx.add(spl_token.transfer(param))
 
-            res = client.send_transaction(trx, instance.acc,
-                                          opts=TxOpts(skip_confirmation=True, skip_preflight=True, preflight_commitment="confirmed"))
+            res = blockhash_provider.send_transaction(trx, instance.acc,
+                                                      opts=TxOpts(skip_confirmation=True, skip_preflight=True, preflight_commitment="confirmed"))
             receipt_list.append((res['result'], pr_key.address[2:], pr_key.privateKey.hex()[2:], acc_sol))
 
             total = total + 1
             if total % 50 == 0 :
+                confirmed_receipts = confirm_receipts([receipt for (receipt, _, _, _) in receipt_list])
                 for (receipt, address, pr_key,  acc_sol) in receipt_list:
+                    if receipt not in confirmed_receipts:
+                        break # cancel all bucket
                     try:
-                        confirm_transaction_(client, receipt)
                         res = client.get_confirmed_transaction(receipt)
                         if res['result'] == None:
                             print("receipt is empty", receipt)
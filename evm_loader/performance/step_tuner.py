@@ -0,0 +1 @@
+../step_tuner.py
\ No newline at end of file
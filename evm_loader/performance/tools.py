@@ -5,6 +5,19 @@ from time import sleep
 import spl.token.client
 from solana_utils import *
 from eth_tx_utils import make_keccak_instruction_data, make_instruction_data_from_tx
+from batch_sign import BatchSigner
+from confirmation import confirm_transactions
+from message_template import MessageTemplate, Slot
+from step_tuner import StepProfiles, StepTuner, profile_key
+from iterative_pipeline import IterativePipeline, IterativeStats
+from holder_writer import HolderWriter, holder_message
+from account_pool import AccountPool
+from signer_pool import SignerPool, rate_limited_error
+from nonce_manager import NonceManager
+from wave_scheduler import WaveItem, WaveScheduler
+from evm_events import EventIndex, OnEvent, address_topic, decode_transaction, uint_word
+from verifier import Verifier
+from trx_store import JsonTrxWriter, TrxReader, TrxRecord, TrxWriter, read_json_records
 from web3.auto import w3
 from web3 import Web3
 import argparse
@@ -14,7 +27,7 @@ import random
 from solana.blockhash import *
 import statistics
 from spl.token.constants import TOKEN_PROGRAM_ID, ASSOCIATED_TOKEN_PROGRAM_ID
-from spl.token.instructions import get_associated_token_address, create_associated_token_account
+from spl.token.instructions import create_associated_token_account
 from spl.token.client import *
 from spl.token._layouts import INSTRUCTIONS_LAYOUT, InstructionType  # type: ignore
 
@@ -33,12 +46,19 @@ contracts_file = "contract.json"
 accounts_file = "account.json"
 liquidity_file = "liquidity.json"
 transactions_file = "transaction.json"
+transactions_store_file = "transaction.bin"
 senders_file = "sender.json"
 verify_file = "verify.json"
 collateral_file = "collateral.json"
+step_profiles_file = "step_profiles.json"
+account_pool_file = "account_pool.json"
+event_index_file = "events.sqlite"
+verify_results_file = "verify_results.txt"
+verify_checkpoint_file = "verify_checkpoint.json"
 ETH_TOKEN_MINT_ID: PublicKey = PublicKey(os.environ.get("ETH_TOKEN_MINT"))
 
-trx_count = {}
+nonces = NonceManager()
+step_profiles = StepProfiles(step_profiles_file)
 
 class transfer_type(Enum):
     erc20 = 0,
@@ -79,7 +99,7 @@ class init_wallet():
         regular_wallet = WalletAccount(wallet_path())
         cls.regular_acc = regular_wallet.get_acc()
         # cls.wallet_token = cls.token.create_token_account(ETH_TOKEN_MINT_ID, owner=wallet.get_path())
-        cls.wallet_token = get_associated_token_address(PublicKey(wallet.get_acc().public_key()), ETH_TOKEN_MINT_ID)
+        cls.wallet_token = associated_token_address(wallet.get_acc().public_key())
         # cls.token.mint(ETH_TOKEN_MINT_ID, cls.wallet_token, 10000)
 
 
@@ -105,182 +125,93 @@ class init_wallet():
 
 
 
-def check_approve_event(result, erc20_eth, acc_from, acc_to, sum, return_code):
-    # assert(result['meta']['err'] == None)
-
-    if (len(result['meta']['innerInstructions']) != 1):
-        print("check event Approval")
-        print("len(result['meta']['innerInstructions']) != 1", len(result['meta']['innerInstructions']))
-        return False
-
-    if (len(result['meta']['innerInstructions'][0]['instructions']) != 2):
-        print("check event Approval")
-        print("len(result['meta']['innerInstructions'][0]['instructions']) != 2",
-              len(result['meta']['innerInstructions'][0]['instructions']))
-        return False
-
-    data = b58decode(result['meta']['innerInstructions'][0]['instructions'][1]['data'])
-    if (data[:1] != b'\x06'):  #  OnReturn
-        print("check event Approval")
-        print("data[:1] != x06", data[:1].hex())
-        return False
-
-    if(data[1:2] != return_code):    # 11 - Machine encountered an explict stop,  # 12 - Machine encountered an explict return
-        print("check event Approval")
-        print("data[1:2] != return_code", data[1:2].hex(), return_code.hex())
+def check_erc20_event(result, event, erc20_eth, acc_from, acc_to, sum, return_code):
+    """The receipt has OnReturn with return_code and the only event is `event`(acc_from, acc_to, sum) of erc20_eth."""
+    decoded = decode_transaction(result)
+    if decoded.on_return is None or decoded.on_return.status != return_code[0]:
+        # 11 - Machine encountered an explict stop,  # 12 - Machine encountered an explict return
+        print("check event", event)
+        print("OnReturn status != return_code", decoded.on_return, return_code.hex())
         return False
 
-    data = b58decode(result['meta']['innerInstructions'][0]['instructions'][0]['data'])
-    if(data[:1] != b'\x07'):  # 7 means OnEvent
-        print("check event Approval")
-        print("data[:1] != x07", data[:1].hex())
-        return  False
-
-
-    if (data[1:21] != bytes.fromhex(erc20_eth)):
-        print("check event Approval")
-        print("data[1:21] != bytes.fromhex(erc20_eth)", data[1:21].hex(), erc20_eth)
-        return False
-
-    if(data[21:29] != bytes().fromhex('%016x' % 3)[::-1]):  # topics len
-        print("check event Approval")
-        print("data[21:29] != bytes().fromhex('%016x' % 3)[::-1]", data[21:29].hex())
+    if len(decoded.events) != 1:
+        print("check event", event)
+        print("len(events) != 1", len(decoded.events))
         return False
 
-    if(data[29:61] != abi.event_signature_to_log_topic('Approval(address,address,uint256)')):  # topics
-        print("check event Approval")
-        print("data[29:61] != abi.event_signature_to_log_topic('Approval(address,address,uint256)')",
-              data[29:61].hex(),
-              abi.event_signature_to_log_topic('Approval(address,address,uint256)').hex())
-        return False
-
-    if (data[61:93] != bytes().fromhex("%024x" % 0) + bytes.fromhex(acc_from)):
-        print(result)
-        print("check event Approval")
-        print("data[61:93] != bytes().fromhex('%024x' % 0) + bytes.fromhex(acc_from)",
-              data[61:93].hex(),
-              (bytes().fromhex('%024x' % 0) + bytes.fromhex(acc_from)).hex())
-        return False
-
-    if(data[93:125] != bytes().fromhex("%024x" % 0) + bytes.fromhex(acc_to)):  # from
-        print("check event Approval")
-        print("data[93:125] != bytes().fromhex('%024x' % 0) + bytes.fromhex(acc_to)",
-              data[93:125].hex(),
-              (bytes().fromhex('%024x' % 0) + bytes.fromhex(acc_to)).hex()
-              )
-        return False
-
-    if (data[125:157] != bytes().fromhex("%064x" % sum)):  # value
-        print("check event Approval")
-        print("data[125:157] != bytes().fromhex('%064x' % sum)",
-              data[125:157].hex(),
-              '%064x' % sum)
-        return False
+    expected = OnEvent(bytes.fromhex(erc20_eth),
+                       [abi.event_signature_to_log_topic(event + '(address,address,uint256)'),
+                        address_topic(acc_from), address_topic(acc_to)],
+                       uint_word(sum))
+    for (field, value, expected_value) in zip(OnEvent._fields, decoded.events[0], expected):
+        if value != expected_value:
+            print("check event", event)
+            print("{} != expected".format(field), _hex(value), _hex(expected_value))
+            return False
 
     return True
 
 
-def check_transfer_event(result, erc20_eth, acc_from, acc_to, sum, return_code):
-    # assert(result['meta']['err'] == None)
-
-    if (len(result['meta']['innerInstructions']) != 1):
-        print("check event Transfer")
-        print("len(result['meta']['innerInstructions']) != 1", len(result['meta']['innerInstructions']))
-        return False
-
-    if (len(result['meta']['innerInstructions'][0]['instructions']) != 2):
-        print("check event Transfer")
-        print(result)
-        print("len(result['meta']['innerInstructions'][0]['instructions']) != 2",
-              len(result['meta']['innerInstructions'][0]['instructions']))
-        return False
+def _hex(value):
+    if isinstance(value, list):
+        return [_hex(item) for item in value]
+    return bytes(value).hex()
 
-    data = b58decode(result['meta']['innerInstructions'][0]['instructions'][1]['data'])
-    if (data[:1] != b'\x06'):  #  OnReturn
-        print("check event Transfer")
-        print("data[:1] != x06", data[:1].hex())
-        return False
-
-    if(data[1:2] != return_code):    # 11 - Machine encountered an explict stop,  # 12 - Machine encountered an explict return
-        print("check event Transfer")
-        print("data[1:2] != return_code", data[1:2].hex(), return_code.hex())
-        return False
-
-    data = b58decode(result['meta']['innerInstructions'][0]['instructions'][0]['data'])
-    if(data[:1] != b'\x07'):  # 7 means OnEvent
-        print("check event Transfer")
-        print("data[:1] != x07", data[:1].hex())
-        return  False
-
-
-    if (data[1:21] != bytes.fromhex(erc20_eth)):
-        print("check event Transfer")
-        print("data[1:21] != bytes.fromhex(erc20_eth)", data[1:21].hex(), erc20_eth)
-        return False
 
-    if(data[21:29] != bytes().fromhex('%016x' % 3)[::-1]):  # topics len
-        print("check event Transfer")
-        print("data[21:29] != bytes().fromhex('%016x' % 3)[::-1]", data[21:29].hex())
-        return False
-
-    if(data[29:61] != abi.event_signature_to_log_topic('Transfer(address,address,uint256)')):  # topics
-        print("check event Transfer")
-        print("data[29:61] != abi.event_signature_to_log_topic('Transfer(address,address,uint256)')",
-              data[29:61].hex(),
-              abi.event_signature_to_log_topic('Transfer(address,address,uint256)').hex())
-        return False
-
-    if (data[61:93] != bytes().fromhex("%024x" % 0) + bytes.fromhex(acc_from)):
-        print("check event Transfer")
-        print("data[61:93] != bytes().fromhex('%024x' % 0) + bytes.fromhex(acc_from)",
-              data[61:93].hex(),
-              (bytes().fromhex('%024x' % 0) + bytes.fromhex(acc_from)).hex())
-        return False
+def check_approve_event(result, erc20_eth, acc_from, acc_to, sum, return_code):
+    return check_erc20_event(result, 'Approval', erc20_eth, acc_from, acc_to, sum, return_code)
 
-    if(data[93:125] != bytes().fromhex("%024x" % 0) + bytes.fromhex(acc_to)):  # from
-        print("check event Transfer")
-        print("data[93:125] != bytes().fromhex('%024x' % 0) + bytes.fromhex(acc_to)",
-              data[93:125].hex(),
-              (bytes().fromhex('%024x' % 0) + bytes.fromhex(acc_to)).hex()
-              )
-        return False
 
-    if (data[125:157] != bytes().fromhex("%064x" % sum)):  # value
-        print("check event Transfer")
-        print("data[125:157] != bytes().fromhex('%064x' % sum)",
-              data[125:157].hex(),
-              '%064x' % sum)
-        return False
-
-    return True
+def check_transfer_event(result, erc20_eth, acc_from, acc_to, sum, return_code):
+    return check_erc20_event(result, 'Transfer', erc20_eth, acc_from, acc_to, sum, return_code)
 
 
 def sol_instr_keccak(keccak_instruction):
     return TransactionInstruction(
         program_id=keccakprog,
         data=keccak_instruction,
-        keys=[AccountMeta(pubkey=PublicKey(keccakprog), is_signer=False, is_writable=False)]
+        keys=[account_meta(keccakprog)]
     )
 
 
 def sol_instr_05(evm_instruction, contract, contract_code, caller):
-    account_meta = [
+    keys = [
         AccountMeta(pubkey=contract, is_signer=False, is_writable=True),
-        AccountMeta(pubkey=get_associated_token_address(PublicKey(contract), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
+        AccountMeta(pubkey=associated_token_address(contract), is_signer=False, is_writable=True),
         AccountMeta(pubkey=caller, is_signer=False, is_writable=True),
-        AccountMeta(pubkey=get_associated_token_address(PublicKey(caller), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-        AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
-        AccountMeta(pubkey=evm_loader_id, is_signer=False, is_writable=False),
-        AccountMeta(pubkey=ETH_TOKEN_MINT_ID, is_signer=False, is_writable=False),
+        AccountMeta(pubkey=associated_token_address(caller), is_signer=False, is_writable=True),
+        account_meta(sysinstruct),
+        account_meta(evm_loader_id),
+        account_meta(ETH_TOKEN_MINT_ID),
         # AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-        AccountMeta(pubkey=PublicKey(sysvarclock), is_signer=False, is_writable=False),
+        account_meta(sysvarclock),
     ]
     if contract_code != "":
-        account_meta.insert(2, AccountMeta(pubkey=contract_code, is_signer=False, is_writable=True))
+        keys.insert(2, AccountMeta(pubkey=contract_code, is_signer=False, is_writable=True))
 
     return TransactionInstruction(program_id=evm_loader_id,
                                   data=bytearray.fromhex("05") + evm_instruction,
-                                  keys=account_meta)
+                                  keys=keys)
+
+
+def sol_instr_05_template(with_code):
+    """MessageTemplate of sol_instr_keccak + sol_instr_05; per transaction it takes the slots
+    contract, contract_token, [contract_code,] caller, caller_token and the data of both instructions."""
+    keys = [
+        AccountMeta(pubkey=Slot("contract"), is_signer=False, is_writable=True),
+        AccountMeta(pubkey=Slot("contract_token"), is_signer=False, is_writable=True),
+        AccountMeta(pubkey=Slot("caller"), is_signer=False, is_writable=True),
+        AccountMeta(pubkey=Slot("caller_token"), is_signer=False, is_writable=True),
+        account_meta(sysinstruct),
+        account_meta(evm_loader_id),
+        account_meta(ETH_TOKEN_MINT_ID),
+        account_meta(sysvarclock),
+    ]
+    if with_code:
+        keys.insert(2, AccountMeta(pubkey=Slot("contract_code"), is_signer=False, is_writable=True))
+
+    return MessageTemplate([sol_instr_keccak(b''),
+                            TransactionInstruction(program_id=evm_loader_id, data=b'', keys=keys)])
 
 
 def mint_erc20_send(erc20_sol, erc20_code, account_eth, account_sol, acc, sum):
@@ -296,25 +227,26 @@ def mint_erc20_send(erc20_sol, erc20_code, account_eth, account_sol, acc, sum):
             data=trx_data,
             keys=[
                 AccountMeta(pubkey=erc20_sol, is_signer=False, is_writable=True),
-                AccountMeta(pubkey=get_associated_token_address(PublicKey(erc20_sol), ETH_TOKEN_MINT_ID),
+                AccountMeta(pubkey=associated_token_address(erc20_sol),
                             is_signer=False, is_writable=True),
                 AccountMeta(pubkey=erc20_code, is_signer=False, is_writable=True),
                 AccountMeta(pubkey=acc.public_key(), is_signer=True, is_writable=False),
                 AccountMeta(pubkey=account_sol, is_signer=False, is_writable=True),
-                AccountMeta(pubkey=get_associated_token_address(PublicKey(account_sol), ETH_TOKEN_MINT_ID),
+                AccountMeta(pubkey=associated_token_address(account_sol),
                             is_signer=False, is_writable=True),
-                AccountMeta(pubkey=evm_loader_id, is_signer=False, is_writable=False),
-                AccountMeta(pubkey=ETH_TOKEN_MINT_ID, is_signer=False, is_writable=False),
-                AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-                AccountMeta(pubkey=PublicKey(sysvarclock), is_signer=False, is_writable=False)
+                account_meta(evm_loader_id),
+                account_meta(ETH_TOKEN_MINT_ID),
+                account_meta(TOKEN_PROGRAM_ID),
+                account_meta(sysvarclock)
             ]))
-    res = client.send_transaction(trx, acc,
-                                  opts=TxOpts(skip_confirmation=True, skip_preflight=True,
-                                              preflight_commitment="confirmed"))
+    res = blockhash_provider.send_transaction(trx, acc,
+                                              opts=TxOpts(skip_confirmation=True, skip_preflight=True,
+                                                          preflight_commitment="confirmed"))
     return  res["result"]
 
 
-def mint_or_approve_confirm(receipt_list, sum, event):
+def mint_or_approve_confirm(receipt_list, sum, event, callers=None):
+    """callers {receipt: (caller, nonce)} of the Ethereum transactions: their nonces are observed on the receipt."""
     event_error = 0
     receipt_error = 0
     nonce_error = 0
@@ -322,9 +254,18 @@ def mint_or_approve_confirm(receipt_list, sum, event):
     unknown_error = 0
     account_confirmed =[]
 
+    confirmed_receipts = confirm_receipts([receipt for (_, _, _, receipt) in receipt_list])
     for (erc20_eth_hex, acc_from, acc_to, receipt) in receipt_list:
-        confirm_transaction(client, receipt)
+        caller = (callers or {}).get(receipt)
+        if receipt not in confirmed_receipts:
+            receipt_error = receipt_error + 1
+            if caller is not None:
+                # the transaction was dropped, its nonce goes to the next one of the caller
+                nonces.release(*caller)
+            continue
         res = client.get_confirmed_transaction(receipt)
+        if caller is not None and res['result'] is not None:
+            nonces.observe(*caller, res)
 
         if res['result'] == None:
             receipt_error = receipt_error + 1
@@ -365,13 +306,42 @@ def mint_or_approve_confirm(receipt_list, sum, event):
     return (account_confirmed, event_error, receipt_error, nonce_error, unknown_error, too_small_error)
 
 
+def returned_word(result, contract_eth):
+    """The first word of the only event of contract_eth, the way helper contracts return a value."""
+    decoded = decode_transaction(result)
+    assert (decoded.on_return.status == 0x11)  # 11 - Machine encountered an explict stop
+    (event,) = decoded.find(contract_eth)
+    assert (len(event.topics) == 1)
+    return bytes(event.data[:32])
+
+
+def transactions_writer(args):
+    """Writer of the create_trx step: the binary store, or transaction.json for the Rust sender."""
+    if args.trx_format == "json":
+        return JsonTrxWriter(transactions_file + args.postfix)
+    return TrxWriter(transactions_store_file + args.postfix)
+
+
+def transaction_records(args):
+    """TrxRecords of the create_trx step."""
+    if args.trx_format == "json":
+        return read_json_records(transactions_file + args.postfix)
+    return TrxReader(transactions_store_file + args.postfix)
+
+
+def verify_transactions(args, check=None):
+    """Verify the receipts of verify_file; check(record, decoded) validates the events of a transaction."""
+    with EventIndex(event_index_file + args.postfix) as event_index:
+        verifier = Verifier(get_bulk_rpc(), check, concurrency=args.verify_concurrency, index=event_index)
+        verifier.run(verify_file + args.postfix, verify_results_file + args.postfix,
+                     checkpoint_path=verify_checkpoint_file + args.postfix, count=args.count, resume=args.resume)
+    verifier.write_summary(verify_results_file + args.postfix + ".summary.json")
+    verifier.report()
+
+
 def found_revert(res):
-    if len(res['meta']['innerInstructions']) == 1:
-        if len(res['meta']['innerInstructions'][0]['instructions']) == 1:
-            ret_val = b58decode(res['meta']['innerInstructions'][0]['instructions'][0]['data'])
-            if ret_val[:2].hex() == "06d0":
-                return True
-    return False
+    decoded = decode_transaction(res)
+    return decoded.reverted and not decoded.events
 
 
 def get_acc(accounts, ia):
@@ -385,36 +355,43 @@ def get_acc(accounts, ia):
     return (info["address"], info["pr_key"], info["account"])
 
 
+def get_nonce(caller, use_local_nonce_counter=True):
+    if not use_local_nonce_counter:
+        nonces.resync(caller)
+    return nonces.reserve(caller)
+
+
+def make_tx(contract_eth, caller, input, value, use_local_nonce_counter=True):
+    # the nonce is taken here, in the parent process, so batch signing keeps it deterministic per caller
+    return {'to': contract_eth, 'value': value, 'gas': 9999999999, 'gasPrice': 10**9,
+    # return {'to': contract_eth, 'value': value, 'gas': 9999999999, 'gasPrice': 0,
+        'nonce': get_nonce(caller, use_local_nonce_counter), 'data': input, 'chainId': chain_id}
+
+
 def get_trx(contract_eth, caller, caller_eth, input, pr_key, value, use_local_nonce_counter=True):
-    if trx_count.get(caller) != None and use_local_nonce_counter:
-        trx_count[caller] = trx_count[caller] + 1
-    else:
-        trx_count[caller] = getTransactionCount(client, caller)
-
-    tx = {'to': contract_eth, 'value': value, 'gas': 9999999999, 'gasPrice': 10**9,
-    # tx = {'to': contract_eth, 'value': value, 'gas': 9999999999, 'gasPrice': 0,
-        'nonce': trx_count[caller], 'data': input, 'chainId': chain_id}
+    tx = make_tx(contract_eth, caller, input, value, use_local_nonce_counter)
     (from_addr, sign, msg) = make_instruction_data_from_tx(tx, pr_key)
 
     assert (from_addr == caller_eth)
     return (from_addr, sign, msg)
 
 
+def sign_trx_batch(args, items):
+    """Sign (tx, pr_key, context) items on a process pool, yield (context, (from_addr, sign, msg)) in order."""
+    with BatchSigner(args.sign_processes) as signer:
+        yield from signer.sign(items)
+
+
 
 def confirm_transaction_(http_client, tx_sig, confirmations=0):
     """Confirm a transaction."""
-    TIMEOUT = 30  # 30 seconds pylint: disable=invalid-name
-    elapsed_time = 0
-    while elapsed_time < TIMEOUT:
-        # print('confirm_transaction for %s', tx_sig)
-        resp = http_client.get_signature_statuses([tx_sig])
-        # print('confirm_transaction: %s', resp)
-        if resp["result"]:
-            status = resp['result']['value'][0]
-            if status and (status['confirmationStatus'] == 'finalized' or status['confirmationStatus'] == 'confirmed'
-                           and status['confirmations'] >= confirmations):
-                return
-        sleep_time = 0.1
-        time.sleep(sleep_time)
-        elapsed_time += sleep_time
-    raise RuntimeError("could not confirm transaction: ", tx_sig)
+    confirm_transaction(http_client, tx_sig, confirmations)
+
+
+def confirm_receipts(receipts, confirmations=0):
+    """Confirm a bucket of signatures with batched getSignatureStatuses; returns the set of confirmed ones."""
+    statuses = confirm_transactions(client, receipts, confirmations)
+    for (receipt, status) in statuses.items():
+        if isinstance(status, Exception):
+            print(f"transaction is lost {receipt}")
+    return {receipt for (receipt, status) in statuses.items() if not isinstance(status, Exception)}
@@ -0,0 +1 @@
+../trx_store.py
\ No newline at end of file
@@ -51,25 +51,31 @@ def approve_send(erc20_sol, erc20_eth, erc20_code, msg_sender_sol, msg_sender_et
     func_name = abi.function_signature_to_4byte_selector('approve(address,uint256)')
     input = func_name +  bytes().fromhex("%024x" % 0 + router_eth) + bytes().fromhex("%064x" % sum)
 
-    (from_addr, sign, msg) = get_trx(
-        bytes().fromhex(erc20_eth),
-        msg_sender_sol,
-        bytes().fromhex(msg_sender_eth),
-        input,
-        bytes.fromhex(msg_sender_prkey),
-        0
-    )
+    tx = make_tx(bytes().fromhex(erc20_eth), msg_sender_sol, input, 0)
+    (from_addr, sign, msg) = make_instruction_data_from_tx(tx, bytes.fromhex(msg_sender_prkey))
+    assert (from_addr == bytes().fromhex(msg_sender_eth))
     trx = Transaction()
     trx.add(sol_instr_keccak(make_keccak_instruction_data(1, len(msg))))
     trx.add(sol_instr_05((from_addr + sign + msg), erc20_sol, erc20_code, msg_sender_sol))
 
-    res = client.send_transaction(trx, acc,
-                                  opts=TxOpts(skip_confirmation=True, skip_preflight=True,
-                                              preflight_commitment="confirmed"))
-    return res["result"]
+    try:
+        res = blockhash_provider.send_transaction(trx, acc,
+                                                  opts=TxOpts(skip_confirmation=True, skip_preflight=True,
+                                                              preflight_commitment="confirmed"))
+        return (res["result"], tx['nonce'])
+    except Exception:
+        # not sent: the nonce goes to the next transaction of the sender
+        nonces.release(msg_sender_sol, tx['nonce'])
+        raise
 
 
 
+def sol_instr_11_begin(meta, step_count):
+    return TransactionInstruction(program_id=evm_loader_id,
+                                  data=bytearray.fromhex("0B") + step_count.to_bytes(8, byteorder='little'),
+                                  keys=meta)
+
+
 def sol_instr_10_continue(meta, step_count):
     return TransactionInstruction(program_id=evm_loader_id,
                                   data=bytearray.fromhex("0A") + step_count.to_bytes(8, byteorder='little'),
@@ -79,21 +85,7 @@ def sol_instr_10_continue(meta, step_count):
 
 def sol_instr_keccak(keccak_instruction):
     return TransactionInstruction(program_id=keccakprog, data=keccak_instruction, keys=[
-        AccountMeta(pubkey=PublicKey(keccakprog), is_signer=False, is_writable=False), ])
-
-
-def create_storage_account(seed, acc):
-    storage = PublicKey(
-        sha256(bytes(acc.public_key()) + bytes(seed, 'utf8') + bytes(PublicKey(evm_loader_id))).digest())
-    print("Storage", storage)
-
-    if getBalance(storage) == 0:
-        trx = Transaction()
-        trx.add(createAccountWithSeed(acc.public_key(), acc.public_key(), seed, 10 ** 9, 128 * 1024,
-                                      PublicKey(evm_loader_id)))
-        send_transaction(client, trx, acc)
-
-    return storage
+        account_meta(keccakprog), ])
 
 
 def mint_and_approve_swap(args, accounts, sum, pr_key_list):
@@ -115,6 +107,8 @@ def mint_and_approve_swap(args, accounts, sum, pr_key_list):
     senders = init_senders(args)
 
     receipt_list = []
+    # (caller, nonce) of the approve receipts
+    callers = {}
     ia = iter(accounts)
     ic = iter(contracts)
 
@@ -150,19 +144,21 @@ def mint_and_approve_swap(args, accounts, sum, pr_key_list):
         receipt = mint_erc20_send(token_b_sol, token_b_code, account_eth, account_sol, acc, sum)
         one_acc_receipts.append((token_b_eth, bytes(20).hex(), account_eth, receipt))
 
-        receipt = approve_send(token_a_sol, token_a_eth, token_a_code, account_sol, account_eth, account_prkey, router_eth, acc, sum)
+        (receipt, nonce) = approve_send(token_a_sol, token_a_eth, token_a_code, account_sol, account_eth, account_prkey, router_eth, acc, sum)
         one_acc_receipts.append((token_a_eth, account_eth, router_eth, receipt))
+        callers[receipt] = (account_sol, nonce)
 
-        receipt = approve_send(token_b_sol, token_b_eth, token_b_code, account_sol, account_eth, account_prkey, router_eth, acc, sum)
+        (receipt, nonce) = approve_send(token_b_sol, token_b_eth, token_b_code, account_sol, account_eth, account_prkey, router_eth, acc, sum)
         one_acc_receipts.append((token_b_eth, account_eth, router_eth, receipt))
+        callers[receipt] = (account_sol, nonce)
 
         receipt_list.append(
-            (one_acc_receipts, token_a_sol, token_a_eth, token_a_code, token_b_sol, token_b_eth, token_b_code)
+            (one_acc_receipts, account_sol, token_a_sol, token_a_eth, token_a_code, token_b_sol, token_b_eth, token_b_code)
         )
 
         total = total + 1
         if total % 100 == 0 or total == args.count:
-            for (one_acc_receipts, token_a_sol, token_a_eth, token_a_code, token_b_sol, token_b_eth, token_b_code) in receipt_list:
+            for (one_acc_receipts, account_sol, token_a_sol, token_a_eth, token_a_code, token_b_sol, token_b_eth, token_b_code) in receipt_list:
                 cnt = 0
                 confirmed = []
                 for (erc20_eth_hex, msg_sender, to, receipt) in one_acc_receipts:
@@ -170,8 +166,10 @@ def mint_and_approve_swap(args, accounts, sum, pr_key_list):
                         (confirmed_, event_error_, receipt_error_, nonce_error_, unknown_error_, too_small_error_) = \
                             mint_or_approve_confirm([(erc20_eth_hex, msg_sender, to, receipt)], sum, "Transfer")
                     else:
+                        # a wrong nonce resyncs the account, the next approves would have it too
                         (confirmed_, event_error_, receipt_error_, nonce_error_, unknown_error_, too_small_error_) =  \
-                            mint_or_approve_confirm([(erc20_eth_hex, msg_sender, to, receipt)], sum, "Approval")
+                            mint_or_approve_confirm([(erc20_eth_hex, msg_sender, to, receipt)], sum, "Approval",
+                                                    callers)
                     cnt = cnt + 1
                     confirmed = confirmed + confirmed_
                     event_error = event_error + event_error_
@@ -184,6 +182,7 @@ def mint_and_approve_swap(args, accounts, sum, pr_key_list):
                     item = (confirmed[0], token_a_sol, token_a_eth, token_a_code, token_b_sol, token_b_eth, token_b_code)
                     acc_and_tokens.append(item)
             receipt_list = []
+            callers = {}
 
 
     return (acc_and_tokens, total, event_error, receipt_error, nonce_error, unknown_error, too_small_error)
@@ -202,14 +201,14 @@ def get_salt(tool_sol, tool_code, tool_eth, token_a, token_b, acc):
             data=input,
             keys=[
                 AccountMeta(pubkey=tool_sol, is_signer=False, is_writable=True),
-                AccountMeta(pubkey=get_associated_token_address(PublicKey(tool_sol), ETH_TOKEN_MINT_ID), is_signer=False,
+                AccountMeta(pubkey=associated_token_address(tool_sol), is_signer=False,
                             is_writable=True),
                 AccountMeta(pubkey=tool_code, is_signer=False, is_writable=True),
                 AccountMeta(pubkey=acc.public_key(), is_signer=True, is_writable=False),
-                AccountMeta(pubkey=evm_loader_id, is_signer=False, is_writable=False),
-                AccountMeta(pubkey=ETH_TOKEN_MINT_ID, is_signer=False, is_writable=False),
-                AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-                AccountMeta(pubkey=PublicKey(sysvarclock), is_signer=False, is_writable=False),
+                account_meta(evm_loader_id),
+                account_meta(ETH_TOKEN_MINT_ID),
+                account_meta(TOKEN_PROGRAM_ID),
+                account_meta(sysvarclock),
             ]))
     result = send_transaction(client, trx, acc)['result']
     # print(result)
@@ -223,29 +222,12 @@ def get_salt(tool_sol, tool_code, tool_eth, token_a, token_b, acc):
         exit(1)
 
     assert (result['meta']['err'] == None)
-    assert (len(result['meta']['innerInstructions']) == 1)
-    assert (len(result['meta']['innerInstructions'][0]['instructions']) == 2)
-    data = b58decode(result['meta']['innerInstructions'][0]['instructions'][1]['data'])
-    assert (data[:1] == b'\x06')  # OnReturn
-    assert (data[1] == 0x11)  # 11 - Machine encountered an explict stop
-
-    data = b58decode(result['meta']['innerInstructions'][0]['instructions'][0]['data'])
-    assert (data[:1] == b'\x07')  # 7 means OnEvent
-    assert (data[1:21] == tool_eth)
-    assert (data[21:29] == bytes().fromhex('%016x' % 1)[::-1])  # topics len
-    hash = data[61:93]
-    return hash
-
-
-def create_account_with_seed (acc, seed, storage_size):
-    account = accountWithSeed(acc.public_key(), seed, PublicKey(evm_loader_id))
-    print("HOLDER ACCOUNT:", account)
-    if getBalance(account) == 0:
-        trx = Transaction()
-        trx.add(createAccountWithSeed(acc.public_key(), acc.public_key(), seed, 10 ** 9, storage_size,
-                                      PublicKey(evm_loader_id)))
-        send_transaction(client, trx, acc)
-    return account
+    return returned_word(result, tool_eth)
+
+
+def account_pool(acc, kind):
+    return AccountPool(get_bulk_rpc(), blockhash_provider, acc, evm_loader_id, kind, args.pool_size,
+                       path=account_pool_file + args.postfix).prepare(cancel=args.cancel_abandoned)
 
 
 def write_layout(offset, data):
@@ -256,29 +238,8 @@ def write_layout(offset, data):
 
 
 def write_trx_to_holder_account(acc, holder, sign, unsigned_msg):
-    msg = sign + len(unsigned_msg).to_bytes(8, byteorder="little") + unsigned_msg
-
-    # Write transaction to transaction holder account
-    offset = 0
-    receipts = []
-    rest = msg
-    while len(rest):
-        (part, rest) = (rest[:1000], rest[1000:])
-        trx = Transaction()
-        # logger.debug("sender_sol %s %s %s", sender_sol, holder, acc.public_key())
-        trx.add(TransactionInstruction(program_id=evm_loader_id,
-                                       data=write_layout(offset, part),
-                                       keys=[
-                                           AccountMeta(pubkey=holder, is_signer=False, is_writable=True),
-                                           AccountMeta(pubkey=acc.public_key(), is_signer=True, is_writable=False),
-                                       ]))
-        receipts.append(client.send_transaction(trx, acc, opts=TxOpts(skip_confirmation=True, preflight_commitment=Confirmed))["result"])
-        offset += len(part)
-    print("receipts %s", receipts)
-    for rcpt in receipts:
-        confirm_transaction(client, rcpt)
-        print("confirmed: %s", rcpt)
-
+    writer = HolderWriter(get_bulk_rpc(), blockhash_provider, evm_loader_id, acc, holder, layout=write_layout)
+    print("write to holder", holder, writer.write(holder_message(sign, unsigned_msg)), "transactions")
     return holder
 
 
@@ -290,12 +251,12 @@ def create_pair(tools_sol, tools_code, tools_eth, token_a_eth, token_b_eth, inst
     pair_eth = bytes(Web3.keccak(b'\xff' + bytes.fromhex(factory_eth) + salt + hash)[-20:])
     (pair_sol, _) = instance.loader.ether2program(pair_eth)
 
-    if getBalance(pair_sol) == 0:
-        seed = b58encode(bytes.fromhex(pair_eth.hex()))
+    seed = b58encode(bytes.fromhex(pair_eth.hex()))
+    (pair_info,) = get_account_infos([pair_sol])
+    if pair_info is None:
         pair_code = accountWithSeed(instance.acc.public_key(), str(seed, 'utf8'), PublicKey(evm_loader_id))
     else:
-        data = getAccountData(client, pair_sol, ACCOUNT_INFO_LAYOUT.sizeof())
-        pair_code = PublicKey(ACCOUNT_INFO_LAYOUT.parse(data).code_acc)
+        pair_code = pair_info.code_account
     print("\npair_info.code_acc",pair_code, "\n")
 
 
@@ -307,8 +268,9 @@ def create_pair(tools_sol, tools_code, tools_eth, token_a_eth, token_b_eth, inst
     print("pair_code", pair_code)
     print("")
 
+    (pair_code_balance, pair_sol_balance) = get_balances([pair_code, pair_sol])
     trx = Transaction()
-    if getBalance(pair_code) == 0:
+    if pair_code_balance == 0:
         trx.add(
             createAccountWithSeed(
                 instance.acc.public_key(),
@@ -318,7 +280,7 @@ def create_pair(tools_sol, tools_code, tools_eth, token_a_eth, token_b_eth, inst
                 20000,
                 PublicKey(evm_loader_id))
         )
-    if getBalance(pair_sol) == 0:
+    if pair_sol_balance == 0:
         trx.add(instance.loader.createEtherAccountTrx(pair_eth, code_acc=pair_code)[0])
 
     if len(trx.instructions):
@@ -349,7 +311,8 @@ def add_liquidity(args):
 
     (tools_sol, tools_eth, tools_code) = (res['programId'], bytes.fromhex(res['ethereum'][2:]), res['codeId'])
 
-    holder = create_account_with_seed(instance.acc, os.urandom(5).hex(), 128 * 1024)
+    holders = account_pool(instance.acc, 'holder')
+    storages = account_pool(instance.acc, 'storage')
 
     with open(accounts_file+args.postfix, mode='r') as f:
         accounts = json.loads(f.read())
@@ -357,11 +320,14 @@ def add_liquidity(args):
     total = 0
     ok  = 0
     func_name = abi.function_signature_to_4byte_selector('addLiquidity(address,address,uint256,uint256,uint256,uint256,address,uint256)')
+    tuner = StepTuner(step_profiles, profile_key(router_eth, func_name))
+    pipeline = IterativePipeline(get_bulk_rpc(), instance.acc, blockhash_provider, evm_loader_id,
+                                 in_flight=args.in_flight, tuner=tuner)
+    stats = IterativeStats()
 
     sum = 10**18
     to_file = []
 
-    storage = create_storage_account(os.urandom(10).hex(), instance.acc)
     for (msg_sender_eth, msg_sender_prkey, msg_sender_sol, token_a_sol, token_a_eth, token_a_code, token_b_sol, token_b_eth, token_b_code) in accounts:
         if total >= args.count:
             break
@@ -382,85 +348,74 @@ def add_liquidity(args):
                    bytes().fromhex("%024x" % 0 + msg_sender_eth) + \
                    bytes().fromhex("%064x" % 10**18)
 
-        (from_addr, sign, msg) = get_trx(
-            bytes().fromhex(router_eth),
-            msg_sender_sol,
-            bytes().fromhex(msg_sender_eth),
-            input,
-            bytes.fromhex(msg_sender_prkey),
-            0)
+        tx = make_tx(bytes().fromhex(router_eth), msg_sender_sol, input, 0)
+        (from_addr, sign, msg) = make_instruction_data_from_tx(tx, bytes.fromhex(msg_sender_prkey))
+        assert (from_addr == bytes().fromhex(msg_sender_eth))
 
         acc = senders.next_acc()
 
-        print("WRITE TO HOLDER ACCOUNT")
-        write_trx_to_holder_account(instance.acc, holder, sign, msg)
-
-        (pair_sol, pair_eth, pair_code) = create_pair(
-            tools_sol, tools_code, tools_eth, token_a_eth, token_b_eth, instance)
-
-        meta = [
-            AccountMeta(pubkey=holder, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=storage, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=router_sol, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(router_sol), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            AccountMeta(pubkey=router_code, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=msg_sender_sol, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(msg_sender_sol), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=token_a_sol, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(token_a_sol), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            AccountMeta(pubkey=token_a_code, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=token_b_sol, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(token_b_sol), ETH_TOKEN_MINT_ID), is_signer=False,is_writable=True),
-            AccountMeta(pubkey=token_b_code, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=factory_sol, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(factory_sol), ETH_TOKEN_MINT_ID), is_signer=False,is_writable=True),
-            AccountMeta(pubkey=factory_code, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=pair_sol, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(pair_sol), ETH_TOKEN_MINT_ID), is_signer=False,is_writable=True),
-            AccountMeta(pubkey=pair_code, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
-            AccountMeta(pubkey=evm_loader_id, is_signer=False, is_writable=False),
-            AccountMeta(pubkey=PublicKey(sysvarclock), is_signer=False, is_writable=False),
-        ]
-
-        print("Begin", total)
-        step = 0
-        trx = Transaction()
-        trx.add(TransactionInstruction(program_id=evm_loader_id, data=bytearray.fromhex("0B") + step.to_bytes(8, byteorder="little"), keys=meta))
-        print("ExecuteTrxFromAccountDataIterative:")
-        res = send_transaction(client, trx, instance.acc)
-
-        while (True):
-            print("Continue")
-            trx = Transaction()
-            trx.add(sol_instr_10_continue(meta[1:], 2000))
-            trx.add(sol_instr_10_continue(meta[1:], 2000))
-            # trx.add(sol_instr_10_continue(meta[1:], 2000))
-            # trx.add(sol_instr_10_continue(meta[1:], 1000))
-            res = send_transaction(client, trx, instance.acc)
-            result = res["result"]
-
-            print(result)
-            if (result['meta']['innerInstructions'] and result['meta']['innerInstructions'][0]['instructions']):
-                data = b58decode(result['meta']['innerInstructions'][0]['instructions'][-1]['data'])
-                if (data[0] == 6):
-                    print("ok")
-                    ok = ok + 1
-                    to_file.append((msg_sender_eth, msg_sender_prkey, msg_sender_sol,
-                                    token_a_sol, token_a_eth, token_a_code,
-                                    token_b_sol, token_b_eth, token_b_code,
-                                    str(pair_sol), pair_eth.hex(), str(pair_code)))
-                    break;
+        # the holder and the storage account go back to the pool after the call
+        with holders.leased(timeout=0) as holder_account, storages.leased(timeout=0) as storage_account:
+            (holder, storage) = (holder_account.pubkey, storage_account.pubkey)
+            print("WRITE TO HOLDER ACCOUNT")
+            write_trx_to_holder_account(instance.acc, holder, sign, msg)
+
+            (pair_sol, pair_eth, pair_code) = create_pair(
+                tools_sol, tools_code, tools_eth, token_a_eth, token_b_eth, instance)
+
+            meta = [
+                AccountMeta(pubkey=holder, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=storage, is_signer=False, is_writable=True),
+
+                AccountMeta(pubkey=router_sol, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(router_sol), is_signer=False, is_writable=True),
+                AccountMeta(pubkey=router_code, is_signer=False, is_writable=True),
+
+                AccountMeta(pubkey=msg_sender_sol, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(msg_sender_sol), is_signer=False, is_writable=True),
+
+                AccountMeta(pubkey=token_a_sol, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(token_a_sol), is_signer=False, is_writable=True),
+                AccountMeta(pubkey=token_a_code, is_signer=False, is_writable=True),
+
+                AccountMeta(pubkey=token_b_sol, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(token_b_sol), is_signer=False,is_writable=True),
+                AccountMeta(pubkey=token_b_code, is_signer=False, is_writable=True),
+
+                AccountMeta(pubkey=factory_sol, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(factory_sol), is_signer=False,is_writable=True),
+                AccountMeta(pubkey=factory_code, is_signer=False, is_writable=True),
+
+                AccountMeta(pubkey=pair_sol, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(pair_sol), is_signer=False,is_writable=True),
+                AccountMeta(pubkey=pair_code, is_signer=False, is_writable=True),
+
+                account_meta(sysinstruct),
+                account_meta(evm_loader_id),
+                account_meta(sysvarclock),
+            ]
+
+            print("Begin", total)
+            print("ExecuteTrxFromAccountDataIterative:")
+            try:
+                res = stats.add(pipeline.execute(lambda steps: Transaction().add(sol_instr_11_begin(meta, steps)),
+                                                 lambda steps: Transaction().add(sol_instr_10_continue(meta[1:], steps))
+                                                                           .add(sol_instr_10_continue(meta[1:], steps))))
+            except Exception:
+                nonces.release(msg_sender_sol, tx['nonce'])
+                raise
+            nonces.observe(msg_sender_sol, tx['nonce'], res.receipt)
+        print(res.receipt["result"])
+        print("ok", res.latency, "sec,", res.transactions, "transactions")
+        ok = ok + 1
+        to_file.append((msg_sender_eth, msg_sender_prkey, msg_sender_sol,
+                        token_a_sol, token_a_eth, token_a_code,
+                        token_b_sol, token_b_eth, token_b_code,
+                        str(pair_sol), pair_eth.hex(), str(pair_code)))
 
     print("total", total)
     print("success", ok)
+    stats.report()
     with open(liquidity_file + args.postfix, mode='w') as f:
         f.write(json.dumps(to_file))
 
@@ -487,43 +442,50 @@ def create_transactions_swap(args):
     total = 0
     func_name = abi.function_signature_to_4byte_selector('swapExactTokensForTokens(uint256,uint256,address[],address,uint256)')
 
-    storage = create_storage_account(os.urandom(5).hex(), instance.acc)
+    # a holder and a storage account are leased per swap
+    holders = account_pool(instance.acc, 'holder')
+    storages = account_pool(instance.acc, 'storage')
+    # all swaps call the same router function
+    tuner = StepTuner(step_profiles, profile_key(router_eth, func_name))
+    pipeline = IterativePipeline(get_bulk_rpc(), instance.acc, blockhash_provider, evm_loader_id,
+                                 in_flight=args.in_flight, tuner=tuner)
+    stats = IterativeStats()
 
     sum = 10**18
     transactions = []
-    for (msg_sender_eth, msg_sender_prkey, msg_sender_sol, token_a_sol, token_a_eth, token_a_code, token_b_sol, token_b_eth, token_b_code,
-         pair_sol, pair_eth, pair_code) in accounts:
-        if total >= args.count:
-            break
+
+    def unsigned_transactions():
+        total = 0
+        for item in accounts:
+            (msg_sender_eth, msg_sender_prkey, msg_sender_sol, token_a_sol, token_a_eth, token_a_code, token_b_sol,
+             token_b_eth, token_b_code, pair_sol, pair_eth, pair_code) = item
+            if total >= args.count:
+                break
+            total = total + 1
+            input = func_name + \
+                    bytes().fromhex("%064x" % sum) +\
+                    bytes().fromhex("%064x" % 0) +\
+                    bytes().fromhex("%064x" % 0xa0) +\
+                    bytes().fromhex("%024x" % 0 + msg_sender_eth) + \
+                    bytes().fromhex("%064x" % 10**18) + \
+                    bytes().fromhex("%064x" % 2) + \
+                    bytes().fromhex("%024x" % 0 + token_a_eth) + \
+                    bytes().fromhex("%024x" % 0 + token_b_eth)
+            print("")
+            print("input:", input.hex())
+            print("")
+
+            tx = make_tx(bytes().fromhex(router_eth), msg_sender_sol, input, 0)
+            yield (tx, bytes.fromhex(msg_sender_prkey), (tx['nonce'], item))
+
+    for ((nonce, item), (from_addr, sign, msg)) in sign_trx_batch(args, unsigned_transactions()):
+        (msg_sender_eth, msg_sender_prkey, msg_sender_sol, token_a_sol, token_a_eth, token_a_code, token_b_sol,
+         token_b_eth, token_b_code, pair_sol, pair_eth, pair_code) = item
+        assert (from_addr.hex() == msg_sender_eth)
         total = total + 1
-        input = func_name + \
-                bytes().fromhex("%064x" % sum) +\
-                bytes().fromhex("%064x" % 0) +\
-                bytes().fromhex("%064x" % 0xa0) +\
-                bytes().fromhex("%024x" % 0 + msg_sender_eth) + \
-                bytes().fromhex("%064x" % 10**18) + \
-                bytes().fromhex("%064x" % 2) + \
-                bytes().fromhex("%024x" % 0 + token_a_eth) + \
-                bytes().fromhex("%024x" % 0 + token_b_eth)
-        print("")
-        print("input:", input.hex())
-        print("")
-
-        (from_addr, sign, msg) = get_trx(
-            bytes().fromhex(router_eth),
-            msg_sender_sol,
-            bytes().fromhex(msg_sender_eth),
-            input,
-            bytes.fromhex(msg_sender_prkey),
-            0)
 
         acc = senders.next_acc()
-        print("CREATE TO HOLDER ACCOUNT")
-        holder = create_account_with_seed(instance.acc, os.urandom(5).hex(), 128 * 1024)
-        print("WRITE TO HOLDER ACCOUNT")
-
-        write_trx_to_holder_account(instance.acc, holder, sign, msg)
-        transactions.append((holder, msg_sender_eth, msg_sender_prkey, msg_sender_sol, token_a_sol, token_a_eth, token_a_code, token_b_sol, token_b_eth, token_b_code,
+        transactions.append((nonce, sign, msg, msg_sender_eth, msg_sender_prkey, msg_sender_sol, token_a_sol, token_a_eth, token_a_code, token_b_sol, token_b_eth, token_b_code,
          pair_sol, pair_eth, pair_code))
 
 
@@ -534,68 +496,65 @@ def create_transactions_swap(args):
     cycle_times = []
 
 
-    for (holder, msg_sender_eth, msg_sender_prkey, msg_sender_sol, token_a_sol, token_a_eth, token_a_code, token_b_sol, token_b_eth, token_b_code,
+    for (nonce, sign, msg, msg_sender_eth, msg_sender_prkey, msg_sender_sol, token_a_sol, token_a_eth, token_a_code, token_b_sol, token_b_eth, token_b_code,
          pair_sol, pair_eth, pair_code) in transactions:
-        cycle_start = time.time()
-
-        meta = [
-            AccountMeta(pubkey=holder, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=storage, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=router_sol, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(router_sol), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            AccountMeta(pubkey=router_code, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=msg_sender_sol, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(msg_sender_sol), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=token_a_sol, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(token_a_sol), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            AccountMeta(pubkey=token_a_code, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=token_b_sol, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(token_b_sol), ETH_TOKEN_MINT_ID), is_signer=False,is_writable=True),
-            AccountMeta(pubkey=token_b_code, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=factory_sol, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(factory_sol), ETH_TOKEN_MINT_ID), is_signer=False,is_writable=True),
-            AccountMeta(pubkey=factory_code, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=pair_sol, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(pair_sol), ETH_TOKEN_MINT_ID), is_signer=False,is_writable=True),
-            AccountMeta(pubkey=pair_code, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
-            AccountMeta(pubkey=evm_loader_id, is_signer=False, is_writable=False),
-            AccountMeta(pubkey=PublicKey(sysvarclock), is_signer=False, is_writable=False),
-        ]
-
-        instruction = from_addr + sign + msg
-        print("Begin", total)
-        step = 0
-        trx = Transaction()
-        trx.add(TransactionInstruction(program_id=evm_loader_id, data=bytearray.fromhex("0B") + step.to_bytes(8, byteorder="little"), keys=meta))
-        print("ExecuteTrxFromAccountDataIterative:")
-        # res = send_transaction(client, trx, instance.acc, 0)
-
-        while (True):
-            print("Continue")
-            # trx = Transaction()
-            trx.add(sol_instr_10_continue(meta[1:], 1000))
-            trx.add(sol_instr_10_continue(meta[1:], 1000))
-            trx.add(sol_instr_10_continue(meta[1:], 1000))
-            trx.add(sol_instr_10_continue(meta[1:], 1000))
-            trx.add(sol_instr_10_continue(meta[1:], 1000))
-            res = send_transaction(client, trx, instance.acc, 0)
-            result = res["result"]
-
-            print(result)
-            if (result['meta']['innerInstructions'] and result['meta']['innerInstructions'][0]['instructions']):
-                data = b58decode(result['meta']['innerInstructions'][0]['instructions'][-1]['data'])
-                if (data[0] == 6):
-                    print("ok")
-                    ok = ok + 1
-                    break;
+        with holders.leased(timeout=0) as holder_account, storages.leased(timeout=0) as storage_account:
+            (holder, storage) = (holder_account.pubkey, storage_account.pubkey)
+            print("WRITE TO HOLDER ACCOUNT")
+            write_trx_to_holder_account(instance.acc, holder, sign, msg)
+            cycle_start = time.time()
+
+            meta = [
+                AccountMeta(pubkey=holder, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=storage, is_signer=False, is_writable=True),
+
+                AccountMeta(pubkey=router_sol, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(router_sol), is_signer=False, is_writable=True),
+                AccountMeta(pubkey=router_code, is_signer=False, is_writable=True),
+
+                AccountMeta(pubkey=msg_sender_sol, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(msg_sender_sol), is_signer=False, is_writable=True),
+
+                AccountMeta(pubkey=token_a_sol, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(token_a_sol), is_signer=False, is_writable=True),
+                AccountMeta(pubkey=token_a_code, is_signer=False, is_writable=True),
+
+                AccountMeta(pubkey=token_b_sol, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(token_b_sol), is_signer=False,is_writable=True),
+                AccountMeta(pubkey=token_b_code, is_signer=False, is_writable=True),
+
+                AccountMeta(pubkey=factory_sol, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(factory_sol), is_signer=False,is_writable=True),
+                AccountMeta(pubkey=factory_code, is_signer=False, is_writable=True),
+
+                AccountMeta(pubkey=pair_sol, is_signer=False, is_writable=True),
+                AccountMeta(pubkey=associated_token_address(pair_sol), is_signer=False,is_writable=True),
+                AccountMeta(pubkey=pair_code, is_signer=False, is_writable=True),
+
+                account_meta(sysinstruct),
+                account_meta(evm_loader_id),
+                account_meta(sysvarclock),
+            ]
+
+            print("Begin", total)
+            print("ExecuteTrxFromAccountDataIterative:")
+
+            def continue_swap(steps):
+                trx = Transaction()
+                for _ in range(5):
+                    trx.add(sol_instr_10_continue(meta[1:], steps))
+                return trx
+
+            try:
+                res = stats.add(pipeline.execute(lambda steps: Transaction().add(sol_instr_11_begin(meta, steps)),
+                                                 continue_swap))
+            except Exception:
+                nonces.release(msg_sender_sol, nonce)
+                raise
+            nonces.observe(msg_sender_sol, nonce, res.receipt)
+            print(res.receipt["result"])
+            print("ok", res.latency, "sec,", res.transactions, "transactions")
+        ok = ok + 1
         cycle_end = time.time()
         cycle_times.append(cycle_end - cycle_start)
 
@@ -605,6 +564,7 @@ def create_transactions_swap(args):
     end = time.time()
     print("time:", end - start, "sec")
     print("avg cycle time:                 ", statistics.mean(cycle_times), "sec")
+    stats.report()
 
 
 
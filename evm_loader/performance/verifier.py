@@ -0,0 +1 @@
+../verifier.py
\ No newline at end of file
@@ -0,0 +1 @@
+../wave_scheduler.py
\ No newline at end of file
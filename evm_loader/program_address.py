@@ -0,0 +1,224 @@
+"""In-process derivation of Neon EVM account addresses.
+
+Mirrors `neon-cli create-program-address`, i.e. solana_program's
+`Pubkey::find_program_address(&[&[ACCOUNT_SEED_VERSION], ether], evm_loader)`,
+without spawning a process per address. Associated token accounts are derived and
+cached the same way.
+"""
+import abc
+import atexit
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from hashlib import sha256
+
+import base58
+
+ACCOUNT_SEED_VERSION = b'\1'
+PDA_MARKER = b"ProgramDerivedAddress"
+MAX_SEED_LEN = 32
+MAX_SEEDS = 16
+TOKEN_PROGRAM_ID = base58.b58decode("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
+ASSOCIATED_TOKEN_PROGRAM_ID = base58.b58decode("ATokenGPvbdGVxr1b2hvZbsiqW5xWH25efTNsLJA8knL")
+
+# ed25519: -x^2 + y^2 = 1 + d*x^2*y^2 over GF(2^255 - 19)
+_P = 2 ** 255 - 19
+_D = -121665 * pow(121666, _P - 2, _P) % _P
+_Y_MASK = (1 << 255) - 1
+
+
+def _jacobi(a, n):
+    """Jacobi symbol (a/n) for odd n; several times faster than Euler's criterion in pure Python."""
+    t = 1
+    while a:
+        z = (a & -a).bit_length() - 1
+        a >>= z
+        if z & 1 and n & 7 in (3, 5):
+            t = -t
+        if a & 3 == 3 and n & 3 == 3:
+            t = -t
+        a, n = n % a, a
+    return t if n == 1 else 0
+
+
+def is_on_curve(key):
+    """Return True if 32 bytes decompress to an ed25519 point (curve25519-dalek semantics)."""
+    y = (int.from_bytes(key, 'little') & _Y_MASK) % _P
+    yy = y * y % _P
+    u = (yy - 1) % _P
+    v = (_D * yy + 1) % _P
+    # x^2 = u / v must be a square, which holds iff u * v is a square (v is never zero)
+    uv = u * v % _P
+    return uv == 0 or _jacobi(uv, _P) == 1
+
+
+def to_bytes32(key):
+    if isinstance(key, str):
+        key = base58.b58decode(key)
+    key = bytes(key)
+    if len(key) != 32:
+        raise Exception("Invalid public key length {}".format(len(key)))
+    return key
+
+
+def create_program_address(seeds, program_id):
+    if len(seeds) > MAX_SEEDS:
+        raise Exception("Too many seeds: {}".format(len(seeds)))
+    for seed in seeds:
+        if len(seed) > MAX_SEED_LEN:
+            raise Exception("Seed is too long: {}".format(len(seed)))
+    digest = sha256(b''.join(seeds) + to_bytes32(program_id) + PDA_MARKER).digest()
+    if is_on_curve(digest):
+        raise ValueError("Invalid seeds, address must fall off the curve")
+    return digest
+
+
+def find_program_address(seeds, program_id):
+    """Return (address bytes, bump seed), searching bumps from 255 down like the Rust SDK."""
+    program_id = to_bytes32(program_id)
+    prefix = b''.join(seeds)
+    for bump in range(255, 0, -1):
+        digest = sha256(prefix + bytes((bump,)) + program_id + PDA_MARKER).digest()
+        if not is_on_curve(digest):
+            return digest, bump
+    raise Exception("Unable to find a viable program address nonce")
+
+
+def normalize_ether(ether):
+    if isinstance(ether, str):
+        if ether.startswith('0x'):
+            ether = ether[2:]
+        ether = bytes.fromhex(ether)
+    ether = bytes(ether)
+    if len(ether) != 20:
+        raise Exception("Invalid ether address length {}".format(len(ether)))
+    return ether
+
+
+def ether2program(ether, loader_id):
+    """Uncached equivalent of `neon-cli create-program-address`: returns (base58 address, nonce)."""
+    (address, nonce) = find_program_address([ACCOUNT_SEED_VERSION, normalize_ether(ether)], loader_id)
+    return base58.b58encode(address).decode('utf8'), nonce
+
+
+def find_associated_token_address(owner, mint):
+    """spl-associated-token-account address of (owner, mint): returns (address bytes, bump seed)."""
+    return find_program_address([to_bytes32(owner), TOKEN_PROGRAM_ID, to_bytes32(mint)], ASSOCIATED_TOKEN_PROGRAM_ID)
+
+
+class AddressCache(abc.ABC):
+    """Bounded LRU of derived (address, nonce) pairs with an optional SQLite index on disk.
+
+    Entries are keyed by two 32-byte-or-shorter blobs, e.g. (loader_id, ether), so one file
+    can serve several deployments and several benchmark processes; every cache keeps its
+    own table. Writes are committed every `commit_every` inserts and on `flush()`.
+    """
+    table = None
+    columns = None
+
+    def __init__(self, max_size=65536, path=None, commit_every=1000):
+        self.max_size = max_size
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._pending = 0
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=OFF")
+            self._db.execute("CREATE TABLE IF NOT EXISTS {} ("
+                             "{} BLOB NOT NULL, {} BLOB NOT NULL, address TEXT NOT NULL, nonce INTEGER NOT NULL, "
+                             "PRIMARY KEY ({}, {})) WITHOUT ROWID".format(self.table, *self.columns, *self.columns))
+            self._db.commit()
+
+    @abc.abstractmethod
+    def derive(self, key):
+        """(address bytes, nonce) of a key."""
+
+    def _get(self, key):
+        with self._lock:
+            result = self._lru.get(key)
+            if result is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return result
+
+            self.misses += 1
+            result = self._load(key)
+            if result is None:
+                (address, nonce) = self.derive(key)
+                result = (base58.b58encode(address).decode('utf8'), nonce)
+                self._store(key, result)
+
+            self._lru[key] = result
+            if len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+            return result
+
+    def _load(self, key):
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT address, nonce FROM {} WHERE {}=? AND {}=?".format(self.table, *self.columns),
+                               key).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _store(self, key, result):
+        if self._db is None:
+            return
+        self._db.execute("INSERT OR IGNORE INTO {} VALUES (?, ?, ?, ?)".format(self.table), key + result)
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self._db.commit()
+            self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            if self._db is not None and self._pending:
+                self._db.commit()
+                self._pending = 0
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class ProgramAddressCache(AddressCache):
+    table = "program_address"
+    columns = ("loader", "ether")
+
+    def derive(self, key):
+        (loader, ether) = key
+        return find_program_address([ACCOUNT_SEED_VERSION, ether], loader)
+
+    def get(self, loader_id, ether):
+        return self._get((to_bytes32(loader_id), normalize_ether(ether)))
+
+
+class AssociatedTokenAddressCache(AddressCache):
+    table = "associated_token_address"
+    columns = ("owner", "mint")
+
+    def derive(self, key):
+        (owner, mint) = key
+        return find_associated_token_address(owner, mint)
+
+    def get(self, owner, mint):
+        return self._get((to_bytes32(owner), to_bytes32(mint)))
+
+
+program_address_cache = ProgramAddressCache(
+    max_size=int(os.environ.get("PROGRAM_ADDRESS_CACHE_SIZE", 65536)),
+    path=os.environ.get("PROGRAM_ADDRESS_CACHE"))
+atexit.register(program_address_cache.close)
+
+associated_token_address_cache = AssociatedTokenAddressCache(
+    max_size=int(os.environ.get("PROGRAM_ADDRESS_CACHE_SIZE", 65536)),
+    path=os.environ.get("PROGRAM_ADDRESS_CACHE"))
+atexit.register(associated_token_address_cache.close)
@@ -0,0 +1,266 @@
+"""Asyncio JSON-RPC client for the Solana node.
+
+AsyncRpcClient keeps a pool of keep-alive HTTP connections, bounds the number of
+requests in flight and applies a timeout per RPC method, so one benchmark process can
+keep hundreds of requests outstanding. RpcClient runs it on a background event loop
+and exposes the subset of solana.rpc.api.Client used by solana_utils and the
+performance scripts, so it can be passed wherever a `client` is expected.
+
+Responses are the raw JSON-RPC dicts, exactly as solana.rpc.api.Client returns them.
+send_transaction signs with the blockhash of a blockhash_provider.BlockhashProvider and
+confirm_transaction waits on one getSignatureStatuses poll shared by every signature
+being confirmed, so neither costs a request per transaction.
+"""
+import asyncio
+import base64
+import inspect
+import itertools
+import json
+import os
+import threading
+
+import aiohttp
+
+from blockhash_provider import BlockhashProvider
+from confirmation import MAX_SIGNATURES_PER_REQUEST, is_confirmed
+
+DEFAULT_TIMEOUT = 30
+# calls per JSON-RPC batch array and keys per getMultipleAccounts call
+MAX_BATCH_SIZE = 20
+MAX_MULTIPLE_ACCOUNTS = 100
+DEFAULT_TIMEOUTS = {
+    'getBalance': 10,
+    'getAccountInfo': 10,
+    'getRecentBlockhash': 10,
+    'getFees': 10,
+    'getSignatureStatuses': 10,
+    'getMultipleAccounts': 30,
+    'sendTransaction': 15,
+}
+# seconds between two getSignatureStatuses polls of confirm_transaction
+CONFIRM_INTERVAL = 0.1
+
+
+class AsyncRpcClient:
+    def __init__(self, url=None, max_connections=64, max_concurrency=256, timeout=DEFAULT_TIMEOUT, timeouts=None,
+                 blockhash_provider=None, confirm_interval=CONFIRM_INTERVAL):
+        self.url = url or os.environ.get("SOLANA_URL", "http://localhost:8899")
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self.blockhash_provider = blockhash_provider
+        self.confirm_interval = confirm_interval
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._session = None
+        self._semaphore = None
+        # signature -> futures of the confirm_transaction calls waiting for it
+        self._confirming = {}
+        self._poller = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        # the session and the semaphore must be created inside the running loop
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, json_serialize=json.dumps)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    def method_timeout(self, method):
+        return self.timeouts.get(method, self.timeout)
+
+    async def post(self, payload, timeout):
+        session = self._get_session()
+        async with self._semaphore:
+            self.requests += 1
+            async with session.post(self.url, json=payload, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                resp.raise_for_status()
+                return json.loads(await resp.read())
+
+    async def call(self, method, *params, timeout=None):
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": list(params)}
+        return await self.post(payload, timeout or self.method_timeout(method))
+
+    async def batch(self, calls, timeout=None):
+        """Send (method, params) calls as JSON-RPC batch arrays, return the responses in call order."""
+        calls = list(calls)
+        chunks = [calls[i:i + MAX_BATCH_SIZE] for i in range(0, len(calls), MAX_BATCH_SIZE)]
+        results = await asyncio.gather(*[self._batch(chunk, timeout) for chunk in chunks])
+        return [resp for chunk in results for resp in chunk]
+
+    async def _batch(self, calls, timeout):
+        payload = [{"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": list(params)}
+                   for (method, params) in calls]
+        timeout = timeout or max(self.method_timeout(method) for (method, _) in calls)
+        responses = await self.post(payload, timeout)
+        if not isinstance(responses, list):
+            # the node rejected the whole batch
+            raise Exception("JSON-RPC batch error {}".format(responses.get("error", responses)))
+        by_id = {resp.get("id"): resp for resp in responses}
+        return [by_id.get(request["id"], {"error": "no response", "id": request["id"]}) for request in payload]
+
+    async def get_multiple_accounts(self, pubkeys, commitment="confirmed", encoding="base64", data_slice=None):
+        """getMultipleAccounts for any number of keys: returns the `value` list, None for missing accounts."""
+        opts = {"encoding": encoding, "commitment": commitment}
+        if data_slice is not None:
+            opts["dataSlice"] = {"offset": data_slice[0], "length": data_slice[1]}
+        keys = [str(pubkey) for pubkey in pubkeys]
+        calls = [("getMultipleAccounts", [keys[i:i + MAX_MULTIPLE_ACCOUNTS], opts])
+                 for i in range(0, len(keys), MAX_MULTIPLE_ACCOUNTS)]
+        result = []
+        for resp in await self.batch(calls):
+            if not resp.get("result"):
+                raise Exception("getMultipleAccounts error {}".format(resp.get("error")))
+            result.extend(resp["result"]["value"])
+        return result
+
+    async def get_balance(self, pubkey, commitment="confirmed"):
+        return await self.call("getBalance", str(pubkey), {"commitment": commitment})
+
+    async def get_account_info(self, pubkey, commitment="confirmed", encoding="base64"):
+        return await self.call("getAccountInfo", str(pubkey), {"encoding": encoding, "commitment": commitment})
+
+    async def get_minimum_balance_for_rent_exemption(self, usize, commitment="confirmed"):
+        return await self.call("getMinimumBalanceForRentExemption", usize, {"commitment": commitment})
+
+    async def get_recent_blockhash(self, commitment="confirmed"):
+        return await self.call("getRecentBlockhash", {"commitment": commitment})
+
+    async def get_slot(self, commitment="confirmed"):
+        return await self.call("getSlot", {"commitment": commitment})
+
+    async def get_fees(self, commitment="confirmed"):
+        return await self.call("getFees", {"commitment": commitment})
+
+    async def get_signature_statuses(self, signatures, search_transaction_history=False):
+        return await self.call("getSignatureStatuses", list(signatures),
+                               {"searchTransactionHistory": search_transaction_history})
+
+    async def get_confirmed_transaction(self, tx_sig, encoding="json", commitment="confirmed"):
+        return await self.call("getConfirmedTransaction", tx_sig, {"commitment": commitment, "encoding": encoding})
+
+    async def request_airdrop(self, pubkey, lamports, commitment="confirmed"):
+        return await self.call("requestAirdrop", str(pubkey), lamports, {"commitment": commitment})
+
+    async def send_raw_transaction(self, txn, opts=None):
+        if isinstance(txn, (bytes, bytearray)):
+            txn = base64.b64encode(txn).decode("utf-8")
+        skip_preflight = opts.skip_preflight if opts else False
+        preflight_commitment = opts.preflight_commitment if opts else "confirmed"
+        resp = await self.call("sendTransaction", txn, {"skipPreflight": skip_preflight,
+                                                        "preflightCommitment": preflight_commitment,
+                                                        "encoding": "base64"})
+        if opts is not None and not opts.skip_confirmation and resp.get("result"):
+            await self.confirm_transaction(resp["result"])
+        return resp
+
+    async def send_transaction(self, txn, *signers, opts=None):
+        provider = self.blockhash_provider
+        if provider is None:
+            raise RuntimeError("send_transaction needs a blockhash_provider")
+        if not provider.started:
+            # the first refresh blocks, keep it off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, provider.start)
+        provider.sign(txn, *signers)
+        return await self.send_raw_transaction(txn.serialize(), opts=opts)
+
+    async def confirm_transaction(self, tx_sig, timeout=DEFAULT_TIMEOUT):
+        future = asyncio.get_running_loop().create_future()
+        self._confirming.setdefault(tx_sig, []).append(future)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.ensure_future(self._poll_statuses())
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError("could not confirm transaction: ", tx_sig)
+        finally:
+            futures = self._confirming.get(tx_sig)
+            if futures is not None and future in futures:
+                futures.remove(future)
+                if not futures:
+                    del self._confirming[tx_sig]
+
+    async def _poll_statuses(self):
+        while self._confirming:
+            signatures = list(self._confirming)
+            chunks = [signatures[i:i + MAX_SIGNATURES_PER_REQUEST]
+                      for i in range(0, len(signatures), MAX_SIGNATURES_PER_REQUEST)]
+            responses = await asyncio.gather(*[self.get_signature_statuses(chunk) for chunk in chunks],
+                                             return_exceptions=True)
+            for (chunk, resp) in zip(chunks, responses):
+                if isinstance(resp, Exception) or not resp.get("result"):
+                    continue
+                for (tx_sig, status) in zip(chunk, resp['result']['value']):
+                    if is_confirmed(status):
+                        for future in self._confirming.pop(tx_sig, []):
+                            if not future.done():
+                                future.set_result(status)
+            if self._confirming:
+                await asyncio.sleep(self.confirm_interval)
+
+
+class RpcClient:
+    """Synchronous facade: every AsyncRpcClient coroutine runs on one background event loop.
+
+    Plain method calls block like solana.rpc.api.Client; `submit()` returns a
+    concurrent.futures.Future and `gather()` waits for many coroutines at once.
+    """
+
+    def __init__(self, url=None, blockhash_provider=None, **kwargs):
+        """blockhash_provider signs send_transaction, one refreshed through this client by default."""
+        self.rpc = AsyncRpcClient(url, blockhash_provider=blockhash_provider or BlockhashProvider(self), **kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="RpcClient", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        if self.rpc.blockhash_provider.client is self:
+            self.rpc.blockhash_provider.stop()
+        self.run(self.rpc.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro):
+        return self.submit(coro).result()
+
+    def gather(self, coros, return_exceptions=False):
+        async def _gather():
+            return await asyncio.gather(*coros, return_exceptions=return_exceptions)
+        return self.run(_gather())
+
+    def call(self, method, *params, timeout=None):
+        return self.run(self.rpc.call(method, *params, timeout=timeout))
+
+    def __getattr__(self, name):
+        # get_balance, get_account_info, send_transaction, ... as blocking calls
+        if name.startswith('_') or name == 'rpc':
+            raise AttributeError(name)
+        method = getattr(self.rpc, name)
+        if not inspect.iscoroutinefunction(method):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.run(method(*args, **kwargs))
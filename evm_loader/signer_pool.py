@@ -0,0 +1,239 @@
+"""Operator signers for long sending runs.
+
+init_senders.next_acc() rotates over the sender keys whatever their state, so in a soak
+run the keys drain, the ones with a backlog of unconfirmed transactions keep getting
+more and a rate-limited key keeps getting picked. SignerPool picks the healthy signer
+with the fewest transactions in flight. Balances are read for all keys with one
+getMultipleAccounts, and in-flight signatures are checked with batched
+getSignatureStatuses. Keys whose balance falls below `min_balance` are parked until they
+are topped up, which the pool can do itself from a funding wallet with several transfers
+per transaction. Refreshes run on a background thread started by the first next_acc(),
+so the send loop never waits for them.
+"""
+import threading
+import time
+
+from solana.rpc.types import TxOpts
+from solana.system_program import TransferParams, transfer
+from solana.transaction import Transaction
+
+from confirmation import MAX_SIGNATURES_PER_REQUEST, confirm_transactions, is_confirmed
+from solana_utils import get_balances
+
+# lamports per signature
+FEE = 5000
+# transfers per top up transaction, well below the packet size
+TOP_UP_BATCH = 10
+RATE_LIMITED = 429
+# seconds between the refreshes asked for by a next_acc() without healthy signers
+MIN_REFRESH_INTERVAL = 0.5
+
+
+def rate_limited_error(err):
+    """Whether an exception of a send, or a JSON-RPC error response, is an HTTP 429 / JSON-RPC 429 rate limit."""
+    if isinstance(err, dict):
+        error = err.get('error', err)
+        return isinstance(error, dict) and error.get('code') == RATE_LIMITED
+    # requests.HTTPError of solana.rpc.api.Client, aiohttp.ClientResponseError of rpc_client
+    response = getattr(err, 'response', None)
+    return getattr(response, 'status_code', None) == RATE_LIMITED or getattr(err, 'status', None) == RATE_LIMITED
+
+
+class SignerState:
+    def __init__(self, signer):
+        self.signer = signer
+        self.pubkey = signer.public_key()
+        self.balance = None
+        # signature -> time it was sent
+        self.in_flight = {}
+        self.parked = False
+        self.limited_until = 0
+        self.last_used = 0
+        self.sent = 0
+
+
+class SignerPool:
+    def __init__(self, signers, rpc, min_balance=20 * FEE, max_in_flight=64, refresh_interval=5.0,
+                 in_flight_timeout=90, funder=None, top_up=10 ** 6, blockhash_provider=None):
+        """rpc is an rpc_client.RpcClient; funder (with blockhash_provider) tops up the parked keys by `top_up` lamports."""
+        if not signers:
+            raise RuntimeError("solana senders is absent")
+        self.states = [SignerState(signer) for signer in signers]
+        self._by_pubkey = {str(state.pubkey): state for state in self.states}
+        self.rpc = rpc
+        self.min_balance = min_balance
+        self.max_in_flight = max_in_flight
+        self.refresh_interval = refresh_interval
+        # a signature not seen for this long is dropped with its blockhash
+        self.in_flight_timeout = in_flight_timeout
+        self.funder = funder
+        self.top_up_lamports = top_up
+        self.blockhash_provider = blockhash_provider
+        self.refreshes = 0
+        self.top_ups = 0
+        self._clock = 0
+        self._refreshed_at = 0
+        self._lock = threading.RLock()
+        # notified when signers may have become healthy: refreshes, top ups, done()
+        self._refreshed = threading.Condition(self._lock)
+        self._thread = None
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+
+    @property
+    def accounts(self):
+        return [state.signer for state in self.states]
+
+    def _healthy(self, state, now):
+        return not state.parked and state.limited_until <= now and len(state.in_flight) < self.max_in_flight
+
+    def start(self):
+        """Refresh once and keep refreshing every `refresh_interval` seconds on a background thread."""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="SignerPool", daemon=True)
+        self.refresh()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._stopped.set()
+            self._wakeup.set()
+            thread.join()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.refresh_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.refresh()
+            except Exception as err:
+                print("SignerPool: refresh failed: {}".format(err))
+
+    def next_acc(self, timeout=30):
+        """The healthy signer with the fewest transactions in flight, the least recently used among them."""
+        if self._thread is None:
+            self.start()
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                healthy = [state for state in self.states if self._healthy(state, now)]
+                if healthy:
+                    state = min(healthy, key=lambda state: (len(state.in_flight), state.last_used))
+                    self._clock += 1
+                    state.last_used = self._clock
+                    return state.signer
+                if now >= deadline:
+                    raise Exception("no healthy signer: {}".format(self.counters()))
+                # refresh now instead of at the next interval, rate limits also end on their own
+                if now - self._refreshed_at >= MIN_REFRESH_INTERVAL:
+                    self._wakeup.set()
+                self._refreshed.wait(min(MIN_REFRESH_INTERVAL, deadline - now))
+
+    def sent(self, signer, signature, signatures=1):
+        """Count a transaction sent by `signer`; its fee is charged to the known balance right away."""
+        with self._lock:
+            state = self._by_pubkey[str(signer.public_key())]
+            state.in_flight[signature] = time.monotonic()
+            state.sent += 1
+            if state.balance is not None:
+                state.balance -= FEE * signatures
+                self._park(state)
+
+    def done(self, signature):
+        with self._lock:
+            for state in self.states:
+                if state.in_flight.pop(signature, None) is not None:
+                    self._refreshed.notify_all()
+                    return
+
+    def rate_limited(self, signer, seconds=1.0):
+        with self._lock:
+            state = self._by_pubkey[str(signer.public_key())]
+            state.limited_until = time.monotonic() + seconds
+
+    def _park(self, state):
+        parked = state.balance < self.min_balance
+        if parked and not state.parked:
+            print("signer {} parked, balance {}".format(state.pubkey, state.balance))
+        state.parked = parked
+
+    def refresh(self):
+        """Read all balances and drop the confirmed (or expired) signatures from in-flight; top up parked keys."""
+        self.refreshes += 1
+        self._refreshed_at = time.monotonic()
+        balances = get_balances([state.pubkey for state in self.states], rpc=self.rpc)
+        now = time.monotonic()
+        with self._lock:
+            pending = [(signature, state) for state in self.states for signature in state.in_flight]
+        resolved = set()
+        for i in range(0, len(pending), MAX_SIGNATURES_PER_REQUEST):
+            chunk = [signature for (signature, _) in pending[i:i + MAX_SIGNATURES_PER_REQUEST]]
+            resp = self.rpc.get_signature_statuses(chunk)
+            if not resp.get("result"):
+                continue
+            for (signature, status) in zip(chunk, resp['result']['value']):
+                if status is not None and (status.get('err') or is_confirmed(status)):
+                    resolved.add(signature)
+        with self._lock:
+            for (state, balance) in zip(self.states, balances):
+                for (signature, sent_at) in list(state.in_flight.items()):
+                    if signature in resolved or now - sent_at > self.in_flight_timeout:
+                        del state.in_flight[signature]
+                # the fees of the transactions still in flight are not charged yet
+                state.balance = balance - FEE * len(state.in_flight)
+                self._park(state)
+            parked = [state for state in self.states if state.parked]
+            self._refreshed.notify_all()
+        if parked and self.funder is not None:
+            self.top_up(parked)
+
+    def top_up(self, states):
+        """Transfer `top_up` lamports from the funder to each of the states, TOP_UP_BATCH transfers per transaction."""
+        signatures = []
+        for i in range(0, len(states), TOP_UP_BATCH):
+            trx = Transaction()
+            for state in states[i:i + TOP_UP_BATCH]:
+                trx.add(transfer(TransferParams(from_pubkey=self.funder.public_key(), to_pubkey=state.pubkey,
+                                                lamports=self.top_up_lamports)))
+            resp = self.blockhash_provider.send_transaction(trx, self.funder,
+                                                            opts=TxOpts(skip_confirmation=True,
+                                                                        preflight_commitment="confirmed"))
+            if not resp.get('result'):
+                print("top up failed:", resp.get('error'))
+                continue
+            signatures.append((resp['result'], states[i:i + TOP_UP_BATCH]))
+        statuses = confirm_transactions(self.rpc, [signature for (signature, _) in signatures])
+        with self._lock:
+            for (signature, batch) in signatures:
+                if isinstance(statuses.get(signature), Exception):
+                    print("top up not confirmed:", signature, statuses[signature])
+                    continue
+                self.top_ups += len(batch)
+                for state in batch:
+                    state.balance += self.top_up_lamports
+                    self._park(state)
+            self._refreshed.notify_all()
+        print("topped up {} signers, {} in total".format(len(states), self.top_ups))
+
+    def counters(self):
+        with self._lock:
+            now = time.monotonic()
+            return {'signers': len(self.states),
+                    'healthy': sum(1 for state in self.states if self._healthy(state, now)),
+                    'parked': sum(1 for state in self.states if state.parked),
+                    'in_flight': sum(len(state.in_flight) for state in self.states),
+                    'top_ups': self.top_ups, 'refreshes': self.refreshes}
+
+    def report(self):
+        print("signers: {signers}, healthy {healthy}, parked {parked}, in flight {in_flight}, "
+              "top ups {top_ups}, refreshes {refreshes}".format(**self.counters()))
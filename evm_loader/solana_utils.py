@@ -1,6 +1,7 @@
 import base64
 import json
 import os
+import struct
 import subprocess
 import time
 from enum import Enum
@@ -22,10 +23,11 @@ from solana.rpc.commitment import Confirmed
 from solana.rpc.types import TxOpts
 from solana.transaction import AccountMeta, TransactionInstruction, Transaction
 
+from blockhash_provider import BlockhashProvider
+from confirmation import ConfirmationTracker
 from eth_tx_utils import make_keccak_instruction_data, make_instruction_data_from_tx
+from program_address import associated_token_address_cache, program_address_cache
 from spl.token.constants import TOKEN_PROGRAM_ID, ASSOCIATED_TOKEN_PROGRAM_ID, ACCOUNT_LEN
-from spl.token.instructions import get_associated_token_address
-import base58
 import math
 
 CREATE_ACCOUNT_LAYOUT = cStruct(
@@ -51,6 +53,8 @@ ETH_TOKEN_MINT_ID: PublicKey = PublicKey(os.environ.get("ETH_TOKEN_MINT"))
 
 EVM_LOADER_SO = os.environ.get("EVM_LOADER_SO", 'target/bpfel-unknown-unknown/release/evm_loader.so')
 client = Client(solana_url)
+# refreshed on a background thread from the first use on
+blockhash_provider = BlockhashProvider(client)
 path_to_solana = 'solana'
 
 ACCOUNT_SEED_VERSION=b'\1'
@@ -127,6 +131,30 @@ class SplToken:
             return res.split()[2]
 
 
+def associated_token_address(owner, mint=ETH_TOKEN_MINT_ID):
+    """Memoized get_associated_token_address(owner, mint), see program_address.AssociatedTokenAddressCache."""
+    return PublicKey(associated_token_address_cache.get(owner, mint)[0])
+
+
+_account_metas = {}
+
+
+def account_meta(pubkey, is_signer=False, is_writable=False):
+    """Shared AccountMeta of an account that recurs in every transaction (programs, sysvars, pools, ...).
+
+    Transaction.compile_message() only updates the flags of the first meta of a key it keeps,
+    and these are never less privileged than a later duplicate, so sharing them is safe.
+    Signers are not shared: an operator or payer key belongs to one transaction.
+    """
+    if is_signer:
+        raise Exception("account_meta: {} is a signer, use AccountMeta".format(pubkey))
+    key = (pubkey if isinstance(pubkey, str) else bytes(pubkey), is_signer, is_writable)
+    meta = _account_metas.get(key)
+    if meta is None:
+        meta = _account_metas[key] = AccountMeta(pubkey=PublicKey(pubkey), is_signer=is_signer, is_writable=is_writable)
+    return meta
+
+
 def create_collateral_pool_address(collateral_pool_index):
     COLLATERAL_SEED_PREFIX = "collateral_seed_"
     seed = COLLATERAL_SEED_PREFIX + str(collateral_pool_index)
@@ -135,21 +163,10 @@ def create_collateral_pool_address(collateral_pool_index):
 
 def confirm_transaction(http_client, tx_sig, confirmations=0):
     """Confirm a transaction."""
-    TIMEOUT = 30  # 30 seconds pylint: disable=invalid-name
-    elapsed_time = 0
-    while elapsed_time < TIMEOUT:
-        print('confirm_transaction for %s', tx_sig)
-        resp = http_client.get_signature_statuses([tx_sig])
-        print('confirm_transaction: %s', resp)
-        if resp["result"]:
-            status = resp['result']['value'][0]
-            if status and (status['confirmationStatus'] == 'finalized' or status['confirmationStatus'] == 'confirmed'
-                           and status['confirmations'] >= confirmations):
-                return
-        sleep_time = 0.1
-        time.sleep(sleep_time)
-        elapsed_time += sleep_time
-    raise RuntimeError("could not confirm transaction: ", tx_sig)
+    tracker = ConfirmationTracker(http_client, confirmations=confirmations)
+    future = tracker.add(tx_sig)
+    tracker.wait()
+    future.result()
 
 
 def accountWithSeed(base, seed, program):
@@ -215,6 +232,7 @@ class neon_cli:
             raise
 
     def emulate(self, loader_id, arguments):
+        # emulator.EmulatorService runs many emulations without a shell and caches them
         cmd = 'neon-cli {} --commitment=recent --evm_loader {} --url {} emulate {}'.format(self.verbose_flags,
                                                                                            loader_id,
                                                                                            solana_url,
@@ -325,7 +343,7 @@ class EvmLoader:
             ether = ether.hex()
         (sol, nonce) = self.ether2program(ether)
         print('createEtherAccount: {} {} => {}'.format(ether, nonce, sol))
-        associated_token = get_associated_token_address(PublicKey(sol), ETH_TOKEN_MINT_ID)
+        associated_token = associated_token_address(sol)
         trx = Transaction()
         base = self.acc.get_acc().public_key()
         trx.add(TransactionInstruction(
@@ -341,7 +359,7 @@ class EvmLoader:
                 AccountMeta(pubkey=associated_token, is_signer=False, is_writable=True),
                 AccountMeta(pubkey=system, is_signer=False, is_writable=False),
                 AccountMeta(pubkey=ETH_TOKEN_MINT_ID, is_signer=False, is_writable=False),
-                AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
+                account_meta(TOKEN_PROGRAM_ID),
                 AccountMeta(pubkey=ASSOCIATED_TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
                 AccountMeta(pubkey=rentid, is_signer=False, is_writable=False),
             ]))
@@ -360,13 +378,7 @@ class EvmLoader:
         return (acc, 255)
 
     def ether2program(self, ether):
-        if isinstance(ether, str):
-            if ether.startswith('0x'): ether = ether[2:]
-        else:
-            ether = ether.hex()
-        output = neon_cli().call("create-program-address --evm_loader {} {}".format(self.loader_id, ether))
-        items = output.rstrip().split(' ')
-        return items[0], int(items[1])
+        return program_address_cache.get(self.loader_id, ether)
 
     def checkAccount(self, solana):
         info = client.get_account_info(solana)
@@ -393,7 +405,7 @@ class EvmLoader:
         else:
             ether = ether.hex()
         (sol, nonce) = self.ether2program(ether)
-        token = get_associated_token_address(PublicKey(sol), ETH_TOKEN_MINT_ID)
+        token = associated_token_address(sol)
         print('createEtherAccount: {} {} => {}'.format(ether, nonce, sol))
         seed = b58encode(bytes.fromhex(ether))
         base = self.acc.get_acc().public_key()
@@ -413,7 +425,7 @@ class EvmLoader:
                     AccountMeta(pubkey=token, is_signer=False, is_writable=True),
                     AccountMeta(pubkey=system, is_signer=False, is_writable=False),
                     AccountMeta(pubkey=ETH_TOKEN_MINT_ID, is_signer=False, is_writable=False),
-                    AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
+                    account_meta(TOKEN_PROGRAM_ID),
                     AccountMeta(pubkey=ASSOCIATED_TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
                     AccountMeta(pubkey=rentid, is_signer=False, is_writable=False),
                 ]))
@@ -428,7 +440,7 @@ class EvmLoader:
                     AccountMeta(pubkey=PublicKey(code_acc), is_signer=False, is_writable=True),
                     AccountMeta(pubkey=system, is_signer=False, is_writable=False),
                     AccountMeta(pubkey=ETH_TOKEN_MINT_ID, is_signer=False, is_writable=False),
-                    AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
+                    account_meta(TOKEN_PROGRAM_ID),
                     AccountMeta(pubkey=ASSOCIATED_TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
                     AccountMeta(pubkey=rentid, is_signer=False, is_writable=False),
                 ]))
@@ -460,7 +472,7 @@ def create_with_seed_loader_instruction(evm_loader_id, funding, created, base, s
 
 
 def getBalance(account):
-    return client.get_balance(account, commitment=Confirmed)['result']['value']
+    return get_bulk_rpc().get_balance(account, commitment=Confirmed)['result']['value']
 
 
 ACCOUNT_INFO_LAYOUT = cStruct(
@@ -489,7 +501,11 @@ class AccountInfo(NamedTuple):
 
 
 def getAccountData(client, account, expected_length):
-    info = client.get_account_info(account, commitment=Confirmed)['result']['value']
+    info = _rpc(client).get_account_info(account, commitment=Confirmed)['result']['value']
+    return _account_data(info, account, expected_length)
+
+
+def _account_data(info, account, expected_length):
     if info is None:
         raise Exception("Can't get information about {}".format(account))
 
@@ -508,6 +524,66 @@ def getTransactionCount(client, sol_account):
     return res
 
 
+# Bulk readers: getMultipleAccounts calls packed into JSON-RPC batches (see rpc_client)
+
+bulk_rpc_client = None
+
+
+def get_bulk_rpc():
+    global bulk_rpc_client
+    if bulk_rpc_client is None:
+        from rpc_client import RpcClient
+        bulk_rpc_client = RpcClient(solana_url, blockhash_provider=blockhash_provider)
+    return bulk_rpc_client
+
+
+def _rpc(http_client):
+    # the shared solana Client blocks on one connection per request, its requests go through get_bulk_rpc()
+    return get_bulk_rpc() if http_client is None or http_client is client else http_client
+
+
+def get_balances(accounts, rpc=None):
+    """Balances of many accounts, 0 for missing ones; only lamports are fetched, no account data."""
+    values = (rpc or get_bulk_rpc()).get_multiple_accounts(accounts, commitment=Confirmed, data_slice=(0, 0))
+    return [info['lamports'] if info else 0 for info in values]
+
+
+def get_account_infos(accounts, rpc=None):
+    """Decoded ACCOUNT_INFO_LAYOUT of many ether accounts, None for missing or too short ones."""
+    size = ACCOUNT_INFO_LAYOUT.sizeof()
+    values = (rpc or get_bulk_rpc()).get_multiple_accounts(accounts, commitment=Confirmed, data_slice=(0, size))
+    result = []
+    for info in values:
+        data = base64.b64decode(info['data'][0]) if info else b''
+        result.append(AccountInfo.frombytes(data) if len(data) >= size else None)
+    return result
+
+
+def get_transaction_counts(accounts, rpc=None):
+    result = []
+    for (account, info) in zip(accounts, get_account_infos(accounts, rpc)):
+        if info is None:
+            raise Exception("Can't get information about {}".format(account))
+        result.append(int.from_bytes(info.trx_count, 'little'))
+    return result
+
+
+# Counterparts of the helpers above for rpc_client.AsyncRpcClient, to keep many requests in flight
+
+async def getBalanceAsync(rpc, account):
+    return (await rpc.get_balance(account, commitment=Confirmed))['result']['value']
+
+
+async def getAccountDataAsync(rpc, account, expected_length):
+    info = (await rpc.get_account_info(account, commitment=Confirmed))['result']['value']
+    return _account_data(info, account, expected_length)
+
+
+async def getTransactionCountAsync(rpc, sol_account):
+    info = await getAccountDataAsync(rpc, sol_account, ACCOUNT_INFO_LAYOUT.sizeof())
+    return int.from_bytes(AccountInfo.frombytes(info).trx_count, 'little')
+
+
 def wallet_path():
     res = solana_cli().call("config get")
     substr = "Keypair Path: "
@@ -528,12 +604,20 @@ def operator2_keypair_path():
     return "/root/.config/solana/id2.json"
 
 def send_transaction(client, trx, acc):
-    result = client.send_transaction(trx, acc, opts=TxOpts(skip_confirmation=True, preflight_commitment="confirmed"))
-    confirm_transaction(client, result["result"])
-    result = client.get_confirmed_transaction(result["result"])
+    rpc = _rpc(client)
+    # RpcClient signs with its blockhash provider, another client with a blockhash of its own node
+    result = rpc.send_transaction(trx, acc, opts=TxOpts(skip_confirmation=True, preflight_commitment="confirmed"))
+    confirm_transaction(rpc, result["result"])
+    result = rpc.get_confirmed_transaction(result["result"])
     return result
 
 
+async def send_transaction_async(rpc, trx, acc):
+    result = await rpc.send_transaction(trx, acc, opts=TxOpts(skip_confirmation=True, preflight_commitment="confirmed"))
+    await rpc.confirm_transaction(result["result"])
+    return await rpc.get_confirmed_transaction(result["result"])
+
+
 def create_neon_evm_instr_05_single(evm_loader_program_id,
                                     caller_sol_acc,
                                     operator_sol_acc,
@@ -547,28 +631,166 @@ def create_neon_evm_instr_05_single(evm_loader_program_id,
         data=bytearray.fromhex("05") + collateral_pool_index_buf + evm_instruction,
         keys=[
             # System instructions account:
-            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
+            account_meta(sysinstruct),
 
             # Operator's SOL account:
             AccountMeta(pubkey=operator_sol_acc, is_signer=True, is_writable=True),
             # Collateral pool address:
             AccountMeta(pubkey=collateral_pool_address, is_signer=False, is_writable=True),
             # Operator's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(operator_sol_acc, ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
+            AccountMeta(pubkey=associated_token_address(operator_sol_acc), is_signer=False, is_writable=True),
             # User's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(caller_sol_acc), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
+            AccountMeta(pubkey=associated_token_address(caller_sol_acc), is_signer=False, is_writable=True),
             # System program account:
-            AccountMeta(pubkey=PublicKey(system), is_signer=False, is_writable=False),
+            account_meta(system),
 
             AccountMeta(pubkey=contract_sol_acc, is_signer=False, is_writable=True),
             AccountMeta(pubkey=code_sol_acc, is_signer=False, is_writable=True),
             AccountMeta(pubkey=caller_sol_acc, is_signer=False, is_writable=True),
 
-            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
-            AccountMeta(pubkey=evm_loader_program_id, is_signer=False, is_writable=False),
-            AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
+            account_meta(sysinstruct),
+            account_meta(evm_loader_program_id),
+            account_meta(TOKEN_PROGRAM_ID),
         ])
 
+PARTIAL_CALL_HEADER = struct.Struct('<B4sQ')  # tag, collateral pool index, step count
+CANCEL_HEADER = struct.Struct('<BQ')  # tag, nonce
+
+
+class PartialCallBuilder:
+    """Instructions of one iterative transaction, bound to its accounts.
+
+    The account lists of the partial call family are built once; each instruction only
+    packs its header (tag, collateral pool index, step count) in front of the payload.
+    Instructions share their `keys` lists, do not modify them.
+    """
+
+    def __init__(self, evm_loader_program_id, operator_sol_acc, caller_sol_acc, contract_sol_acc, code_sol_acc,
+                 storage_sol_acc, collateral_pool_index_buf=None, collateral_pool_address=None, holder_sol_acc=None,
+                 writable_code=True, add_meta=()):
+        if isinstance(collateral_pool_index_buf, int):
+            collateral_pool_index_buf = collateral_pool_index_buf.to_bytes(4, 'little')
+        if collateral_pool_index_buf is not None:
+            collateral_pool_index_buf = bytes(collateral_pool_index_buf)
+            # PARTIAL_CALL_HEADER would pad or truncate it
+            if len(collateral_pool_index_buf) != 4:
+                raise Exception("PartialCallBuilder: collateral pool index {} is not 4 bytes".format(
+                    collateral_pool_index_buf.hex()))
+        self.program_id = evm_loader_program_id
+        self.collateral_pool_index_buf = collateral_pool_index_buf
+
+        storage = AccountMeta(pubkey=storage_sol_acc, is_signer=False, is_writable=True)
+        operator = AccountMeta(pubkey=operator_sol_acc, is_signer=True, is_writable=True)
+        operator_token = AccountMeta(pubkey=associated_token_address(operator_sol_acc), is_signer=False, is_writable=True)
+        caller_token = AccountMeta(pubkey=associated_token_address(caller_sol_acc), is_signer=False, is_writable=True)
+        contract = AccountMeta(pubkey=contract_sol_acc, is_signer=False, is_writable=True)
+        code = AccountMeta(pubkey=code_sol_acc, is_signer=False, is_writable=True)
+        call_code = code if writable_code else AccountMeta(pubkey=code_sol_acc, is_signer=False, is_writable=False)
+        caller = AccountMeta(pubkey=caller_sol_acc, is_signer=False, is_writable=True)
+        programs = [account_meta(evm_loader_program_id), account_meta(TOKEN_PROGRAM_ID)]
+
+        # Collateral pool address, cancel does not need it:
+        collateral_pool = None
+        if collateral_pool_address is not None:
+            collateral_pool = AccountMeta(pubkey=collateral_pool_address, is_signer=False, is_writable=True)
+
+        def accounts(code):
+            return [
+                operator,
+                collateral_pool,
+                operator_token,
+                caller_token,
+                account_meta(system),
+                contract,
+                code,
+                caller,
+                account_meta(sysinstruct),
+            ]
+
+        self.call_keys = self.continue_keys = self.holder_keys = None
+        if collateral_pool is not None:
+            call_accounts = accounts(call_code) + list(add_meta) + programs
+            # 0x0D, 0x13: the signed transaction is in the instruction data
+            self.call_keys = [storage, account_meta(sysinstruct)] + call_accounts
+            # 0x14
+            self.continue_keys = [storage] + call_accounts
+        if collateral_pool is not None and holder_sol_acc is not None:
+            # 0x16, 0x0E: the signed transaction is read from the holder account
+            holder = AccountMeta(pubkey=holder_sol_acc, is_signer=False, is_writable=True)
+            self.holder_keys = [holder, storage] + accounts(code) + programs
+        # 0x15
+        self.cancel_keys = [
+            storage,
+            operator,
+            operator_token,
+            caller_token,
+            account_meta(incinerator, is_writable=True),
+            account_meta(system),
+            contract,
+            code,
+            caller,
+            account_meta(sysinstruct),
+        ] + programs
+
+    def _instruction(self, keys, data):
+        return TransactionInstruction(program_id=self.program_id, data=data, keys=keys)
+
+    def _step(self, keys, tag, step_count, evm_instruction=b''):
+        if keys is None:
+            raise Exception("PartialCallBuilder: instruction {:#04x} needs the collateral pool{}".format(
+                tag, " and the holder account" if tag in (0x16, 0x0E) else ""))
+        header = PARTIAL_CALL_HEADER.pack(tag, self.collateral_pool_index_buf, step_count)
+        return self._instruction(keys, header + evm_instruction if evm_instruction else header)
+
+    def partial_call_or_continue(self, step_count, evm_instruction):
+        return self._step(self.call_keys, 0x0D, step_count, evm_instruction)
+
+    def partial_call(self, step_count, evm_instruction):
+        return self._step(self.call_keys, 0x13, step_count, evm_instruction)
+
+    def continue_(self, step_count):
+        return self._step(self.continue_keys, 0x14, step_count)
+
+    def begin(self, step_count):
+        return self._step(self.holder_keys, 0x16, step_count)
+
+    def combined_continue(self, step_count):
+        return self._step(self.holder_keys, 0x0E, step_count)
+
+    def cancel(self, nonce):
+        return self._instruction(self.cancel_keys, CANCEL_HEADER.pack(0x15, nonce))
+
+
+MAX_PARTIAL_CALL_BUILDERS = 4096
+_partial_call_builders = {}
+
+
+def partial_call_builder(evm_loader_program_id, operator_sol_acc, caller_sol_acc, contract_sol_acc, code_sol_acc,
+                         storage_sol_acc, collateral_pool_index_buf=None, collateral_pool_address=None,
+                         holder_sol_acc=None, writable_code=True, add_meta=()):
+    """PartialCallBuilder of the accounts, built once per account tuple.
+
+    The create_neon_evm_instr_* wrappers are called once per step of a transaction with the
+    same accounts; PublicKey is not hashable, so the cache is keyed by the base58 strings.
+    """
+    if isinstance(collateral_pool_index_buf, int):
+        collateral_pool_index_buf = collateral_pool_index_buf.to_bytes(4, 'little')
+    key = (str(evm_loader_program_id), str(operator_sol_acc), str(caller_sol_acc), str(contract_sol_acc),
+           str(code_sol_acc), str(storage_sol_acc),
+           None if collateral_pool_index_buf is None else bytes(collateral_pool_index_buf),
+           None if collateral_pool_address is None else str(collateral_pool_address),
+           None if holder_sol_acc is None else str(holder_sol_acc), writable_code,
+           tuple((str(meta.pubkey), meta.is_signer, meta.is_writable) for meta in add_meta))
+    builder = _partial_call_builders.get(key)
+    if builder is None:
+        if len(_partial_call_builders) >= MAX_PARTIAL_CALL_BUILDERS:
+            _partial_call_builders.clear()
+        builder = _partial_call_builders[key] = PartialCallBuilder(
+            evm_loader_program_id, operator_sol_acc, caller_sol_acc, contract_sol_acc, code_sol_acc, storage_sol_acc,
+            collateral_pool_index_buf, collateral_pool_address, holder_sol_acc, writable_code, add_meta)
+    return builder
+
+
 def create_neon_evm_instr_13_partial_call_or_continue(evm_loader_program_id,
                                           caller_sol_acc,
                                           operator_sol_acc,
@@ -581,36 +803,10 @@ def create_neon_evm_instr_13_partial_call_or_continue(evm_loader_program_id,
                                           evm_instruction,
                                           writable_code=True,
                                           add_meta=[]):
-    return TransactionInstruction(
-        program_id=evm_loader_program_id,
-        data=bytearray.fromhex("0D") + collateral_pool_index_buf + step_count.to_bytes(8, byteorder='little') + evm_instruction,
-        keys=[
-            AccountMeta(pubkey=storage_sol_acc, is_signer=False, is_writable=True),
-            # System instructions account:
-            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
-
-            # Operator's SOL account:
-            AccountMeta(pubkey=operator_sol_acc, is_signer=True, is_writable=True),
-            # Collateral pool address:
-            AccountMeta(pubkey=collateral_pool_address, is_signer=False, is_writable=True),
-            # Operator's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(operator_sol_acc, ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            # User's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(caller_sol_acc), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            # System program account:
-            AccountMeta(pubkey=PublicKey(system), is_signer=False, is_writable=False),
-
-            AccountMeta(pubkey=contract_sol_acc, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=code_sol_acc, is_signer=False, is_writable=writable_code),
-            AccountMeta(pubkey=caller_sol_acc, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
-             ]
-             + add_meta +
-             [
-            AccountMeta(pubkey=evm_loader_program_id, is_signer=False, is_writable=False),
-            AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-        ])
+    return partial_call_builder(evm_loader_program_id, operator_sol_acc, caller_sol_acc, contract_sol_acc, code_sol_acc,
+                                storage_sol_acc, collateral_pool_index_buf, collateral_pool_address,
+                                writable_code=writable_code, add_meta=add_meta
+                                ).partial_call_or_continue(step_count, evm_instruction)
 
 
 def create_neon_evm_instr_19_partial_call(evm_loader_program_id,
@@ -625,36 +821,10 @@ def create_neon_evm_instr_19_partial_call(evm_loader_program_id,
                                           evm_instruction,
                                           writable_code=True,
                                           add_meta=[]):
-    return TransactionInstruction(
-        program_id=evm_loader_program_id,
-        data=bytearray.fromhex("13") + collateral_pool_index_buf + step_count.to_bytes(8, byteorder='little') + evm_instruction,
-        keys=[
-            AccountMeta(pubkey=storage_sol_acc, is_signer=False, is_writable=True),
-            # System instructions account:
-            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
-
-            # Operator's SOL account:
-            AccountMeta(pubkey=operator_sol_acc, is_signer=True, is_writable=True),
-            # Collateral pool address:
-            AccountMeta(pubkey=collateral_pool_address, is_signer=False, is_writable=True),
-            # Operator's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(operator_sol_acc, ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            # User's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(caller_sol_acc), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            # System program account:
-            AccountMeta(pubkey=PublicKey(system), is_signer=False, is_writable=False),
-
-            AccountMeta(pubkey=contract_sol_acc, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=code_sol_acc, is_signer=False, is_writable=writable_code),
-            AccountMeta(pubkey=caller_sol_acc, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
-             ]
-             + add_meta +
-             [
-            AccountMeta(pubkey=evm_loader_program_id, is_signer=False, is_writable=False),
-            AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-        ])
+    return partial_call_builder(evm_loader_program_id, operator_sol_acc, caller_sol_acc, contract_sol_acc, code_sol_acc,
+                                storage_sol_acc, collateral_pool_index_buf, collateral_pool_address,
+                                writable_code=writable_code, add_meta=add_meta
+                                ).partial_call(step_count, evm_instruction)
 
 
 def create_neon_evm_instr_20_continue(evm_loader_program_id,
@@ -668,34 +838,10 @@ def create_neon_evm_instr_20_continue(evm_loader_program_id,
                                       step_count,
                                       writable_code=True,
                                       add_meta=[]):
-    return TransactionInstruction(
-        program_id=evm_loader_program_id,
-        data=bytearray.fromhex("14") + collateral_pool_index_buf + step_count.to_bytes(8, byteorder='little'),
-        keys=[
-            # Operator's storage account:
-            AccountMeta(pubkey=storage_sol_acc, is_signer=False, is_writable=True),
-            # Operator's SOL account:
-            AccountMeta(pubkey=operator_sol_acc, is_signer=True, is_writable=True),
-            # Collateral pool address:
-            AccountMeta(pubkey=collateral_pool_address, is_signer=False, is_writable=True),
-            # Operator's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(operator_sol_acc, ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            # User's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(caller_sol_acc), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            # System program account:
-            AccountMeta(pubkey=PublicKey(system), is_signer=False, is_writable=False),
-
-            AccountMeta(pubkey=contract_sol_acc, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=code_sol_acc, is_signer=False, is_writable=writable_code),
-            AccountMeta(pubkey=caller_sol_acc, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
-             ]
-             + add_meta +
-             [
-            AccountMeta(pubkey=evm_loader_program_id, is_signer=False, is_writable=False),
-            AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-        ])
+    return partial_call_builder(evm_loader_program_id, operator_sol_acc, caller_sol_acc, contract_sol_acc, code_sol_acc,
+                                storage_sol_acc, collateral_pool_index_buf, collateral_pool_address,
+                                writable_code=writable_code, add_meta=add_meta
+                                ).continue_(step_count)
 
 
 def create_neon_evm_instr_22_begin(evm_loader_program_id,
@@ -708,32 +854,9 @@ def create_neon_evm_instr_22_begin(evm_loader_program_id,
                                    collateral_pool_index_buf,
                                    collateral_pool_address,
                                    step_count):
-    return TransactionInstruction(
-        program_id=evm_loader_program_id,
-        data=bytearray.fromhex("16") + collateral_pool_index_buf + step_count.to_bytes(8, byteorder='little'),
-        keys=[
-            AccountMeta(pubkey=holder_sol_acc, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=storage_sol_acc, is_signer=False, is_writable=True),
-
-            # Operator's SOL account:
-            AccountMeta(pubkey=operator_sol_acc, is_signer=True, is_writable=True),
-            # Collateral pool address:
-            AccountMeta(pubkey=collateral_pool_address, is_signer=False, is_writable=True),
-            # Operator's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(operator_sol_acc, ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            # User's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(caller_sol_acc), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            # System program account:
-            AccountMeta(pubkey=PublicKey(system), is_signer=False, is_writable=False),
-
-            AccountMeta(pubkey=contract_sol_acc, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=code_sol_acc, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=caller_sol_acc, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
-            AccountMeta(pubkey=evm_loader_program_id, is_signer=False, is_writable=False),
-            AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-        ])
+    return partial_call_builder(evm_loader_program_id, operator_sol_acc, caller_sol_acc, contract_sol_acc, code_sol_acc,
+                                storage_sol_acc, collateral_pool_index_buf, collateral_pool_address,
+                                holder_sol_acc=holder_sol_acc).begin(step_count)
 
 
 def create_neon_evm_instr_21_cancel(evm_loader_program_id,
@@ -743,31 +866,8 @@ def create_neon_evm_instr_21_cancel(evm_loader_program_id,
                                     contract_sol_acc,
                                     code_sol_acc,
                                     nonce):
-    return TransactionInstruction(
-        program_id=evm_loader_program_id,
-        data=bytearray.fromhex("15") + nonce.to_bytes(8, 'little'),
-        keys=[
-            AccountMeta(pubkey=storage_sol_acc, is_signer=False, is_writable=True),
-
-            # Operator's SOL account:
-            AccountMeta(pubkey=operator_sol_acc, is_signer=True, is_writable=True),
-            # Operator's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(operator_sol_acc, ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            # User's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(caller_sol_acc), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            # Incenirator
-            AccountMeta(pubkey=PublicKey(incinerator), is_signer=False, is_writable=True),
-            # System program account:
-            AccountMeta(pubkey=PublicKey(system), is_signer=False, is_writable=False),
-
-            AccountMeta(pubkey=contract_sol_acc, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=code_sol_acc, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=caller_sol_acc, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
-            AccountMeta(pubkey=evm_loader_program_id, is_signer=False, is_writable=False),
-            AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-        ])
+    return partial_call_builder(evm_loader_program_id, operator_sol_acc, caller_sol_acc, contract_sol_acc, code_sol_acc,
+                                storage_sol_acc).cancel(nonce)
 
 
 def create_neon_evm_instr_14_combined_continue(evm_loader_program_id,
@@ -780,32 +880,9 @@ def create_neon_evm_instr_14_combined_continue(evm_loader_program_id,
                                                collateral_pool_index_buf,
                                                collateral_pool_address,
                                                step_count):
-    return TransactionInstruction(
-        program_id=evm_loader_program_id,
-        data=bytearray.fromhex("0E") + collateral_pool_index_buf + step_count.to_bytes(8, byteorder='little'),
-        keys=[
-            AccountMeta(pubkey=holder_sol_acc, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=storage_sol_acc, is_signer=False, is_writable=True),
-
-            # Operator's SOL account:
-            AccountMeta(pubkey=operator_sol_acc, is_signer=True, is_writable=True),
-            # Collateral pool address:
-            AccountMeta(pubkey=collateral_pool_address, is_signer=False, is_writable=True),
-            # Operator's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(operator_sol_acc, ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            # User's NEON token account:
-            AccountMeta(pubkey=get_associated_token_address(PublicKey(caller_sol_acc), ETH_TOKEN_MINT_ID), is_signer=False, is_writable=True),
-            # System program account:
-            AccountMeta(pubkey=PublicKey(system), is_signer=False, is_writable=False),
-
-            AccountMeta(pubkey=contract_sol_acc, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=code_sol_acc, is_signer=False, is_writable=True),
-            AccountMeta(pubkey=caller_sol_acc, is_signer=False, is_writable=True),
-
-            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
-            AccountMeta(pubkey=evm_loader_program_id, is_signer=False, is_writable=False),
-            AccountMeta(pubkey=TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
-        ])
+    return partial_call_builder(evm_loader_program_id, operator_sol_acc, caller_sol_acc, contract_sol_acc, code_sol_acc,
+                                storage_sol_acc, collateral_pool_index_buf, collateral_pool_address,
+                                holder_sol_acc=holder_sol_acc).combined_continue(step_count)
 
 
 def evm_step_cost(signature_cnt):
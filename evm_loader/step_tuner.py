@@ -0,0 +1,176 @@
+"""Step counts for iterative execution (0x13/0x14/0x0D, 0x16/0x0E) from compute-unit feedback.
+
+Every evm_loader invocation logs `Program <id> consumed X of Y compute units`. StepTuner
+keeps an estimate of the compute units one EVM step costs and picks the next step count
+so that an instruction uses `target` of its budget. The estimate includes the fixed cost
+of an instruction, so the step count grows over the first transactions until the target
+is reached. The estimates are kept per contract and function selector in StepProfiles,
+so the next run starts where the previous one stopped.
+"""
+import json
+import os
+import re
+import threading
+
+from evm_events import decode_transaction
+
+COMPUTE_UNITS_PATTERN = re.compile(r'Program ([0-9A-Za-z]+) consumed ([0-9]+) of ([0-9]+) compute units')
+INVOKE_PATTERN = re.compile(r'Program ([0-9A-Za-z]+) invoke \[([0-9]+)\]')
+RESULT_PATTERN = re.compile(r'Program ([0-9A-Za-z]+) (success|failed)')
+BUDGET_EXCEEDED = ('exceeded maximum number of instructions', 'Computational budget exceeded',
+                   'ComputationalBudgetExceeded', 'exceeded CUs meter')
+DEFAULT_COMPUTE_LIMIT = 200000
+
+
+def log_messages(response):
+    """logMessages of a getConfirmedTransaction response, or the simulation logs of a failed sendTransaction."""
+    if response.get('error'):
+        return ((response['error'].get('data') or {}).get('logs')) or []
+    result = response.get('result', response)
+    return (result.get('meta') or {}).get('logMessages') or []
+
+
+def invocations(logs):
+    """[(program, logs)] of the top-level invocations.
+
+    An invocation ends with its `success` or `failed` line; native programs (system,
+    precompiles) do not log the compute units they consumed.
+    """
+    result = []
+    depth = 0
+    for log in logs:
+        invoke = INVOKE_PATTERN.match(log)
+        if invoke:
+            depth = int(invoke.group(2))
+            if depth == 1:
+                result.append((invoke.group(1), []))
+        if result:
+            result[-1][1].append(log)
+        if RESULT_PATTERN.match(log):
+            depth -= 1
+    return result
+
+
+def invocation_units(program_id, logs):
+    """(consumed, limit) of one top-level invocation of program_id, None if the runtime did not log them."""
+    depth = 0
+    for log in logs:
+        invoke = INVOKE_PATTERN.match(log)
+        if invoke:
+            depth = int(invoke.group(2))
+            continue
+        units = COMPUTE_UNITS_PATTERN.match(log)
+        if depth == 1 and units and units.group(1) == program_id:
+            return (int(units.group(2)), int(units.group(3)))
+        if RESULT_PATTERN.match(log):
+            depth -= 1
+    return None
+
+
+def consumed_units(response, program_id):
+    """[(consumed, limit)] for every top-level invocation of program_id, in instruction order."""
+    program_id = str(program_id)
+    result = []
+    for (program, logs) in invocations(log_messages(response)):
+        units = invocation_units(program_id, logs) if program == program_id else None
+        if units is not None:
+            result.append(units)
+    return result
+
+
+def transaction_error(response):
+    """The error of a failed sendTransaction, or the err of a confirmed transaction that failed."""
+    return response.get('error') or ((response.get('result') or {}).get('meta') or {}).get('err')
+
+
+def budget_exceeded(response):
+    error = str(transaction_error(response) or '')
+    return any(reason in line for line in log_messages(response) + [error] for reason in BUDGET_EXCEEDED)
+
+
+def call_returned(response):
+    """True once the evm_loader has emitted OnReturn (the iterative call is finished)."""
+    decoded = decode_transaction(response)
+    return decoded is not None and decoded.on_return is not None
+
+
+def profile_key(contract, call_data):
+    """Profiles are kept per contract and function selector."""
+    contract = contract.hex() if isinstance(contract, (bytes, bytearray)) else str(contract)
+    return "{}:{}".format(contract, bytes(call_data[:4]).hex())
+
+
+class StepProfiles:
+    def __init__(self, path=None):
+        self.path = path if path is not None else os.environ.get("STEP_PROFILES", "step_profiles.json")
+        self.profiles = {}
+        self._lock = threading.Lock()
+        if self.path and os.path.exists(self.path):
+            with open(self.path) as f:
+                self.profiles = json.load(f)
+
+    def get(self, key):
+        profile = self.profiles.get(key)
+        return profile['units_per_step'] if profile else None
+
+    def update(self, key, units_per_step, samples):
+        with self._lock:
+            profile = self.profiles.setdefault(key, {'units_per_step': units_per_step, 'samples': 0})
+            profile['units_per_step'] = units_per_step
+            profile['samples'] += samples
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(self.profiles, f, indent=1, sort_keys=True)
+            os.replace(self.path + '.tmp', self.path)
+
+
+class StepTuner:
+    def __init__(self, profiles=None, key=None, target=0.8, initial_steps=100, min_steps=1, max_steps=100000,
+                 smoothing=0.3):
+        self.profiles = profiles
+        self.key = key
+        self.target = target
+        self.initial_steps = initial_steps
+        self.min_steps = min_steps
+        self.max_steps = max_steps
+        self.smoothing = smoothing
+        self.limit = DEFAULT_COMPUTE_LIMIT
+        self.units_per_step = profiles.get(key) if profiles is not None else None
+        self.samples = 0
+        self.retries = 0
+
+    def next_steps(self):
+        if not self.units_per_step:
+            return self.initial_steps
+        steps = int(self.target * self.limit / self.units_per_step)
+        return max(self.min_steps, min(self.max_steps, steps))
+
+    def observe(self, steps, consumed, limit):
+        if steps <= 0:
+            return
+        self.limit = limit
+        sample = consumed / steps
+        # follow a rising cost at once, a falling one slowly
+        if self.units_per_step is None or sample > self.units_per_step:
+            self.units_per_step = sample
+        else:
+            self.units_per_step += self.smoothing * (sample - self.units_per_step)
+        self.samples += 1
+
+    def observe_receipt(self, steps, response, program_id):
+        for (consumed, limit) in consumed_units(response, program_id):
+            self.observe(steps, consumed, limit)
+
+    def exceeded(self, steps):
+        """The instruction ran out of compute units: at least halve the next step count."""
+        self.retries += 1
+        self.units_per_step = max(self.units_per_step or 0, 2 * self.limit / max(steps, 1))
+
+    def save(self):
+        if self.profiles is not None and self.key is not None and self.samples:
+            self.profiles.update(self.key, self.units_per_step, self.samples)
+            self.profiles.save()
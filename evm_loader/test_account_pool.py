@@ -0,0 +1,161 @@
+import base64
+import os
+import tempfile
+import threading
+import unittest
+
+from solana.account import Account
+from solana.publickey import PublicKey
+from solana.transaction import Transaction
+
+from account_pool import FINALIZED_STORAGE_TAG, STORAGE_LAYOUT, STORAGE_TAG, AccountPool, decode_header, \
+    holder_seed
+from solana_utils import CANCEL_HEADER, accountWithSeed, sysinstruct
+import test_helpers
+from test_helpers import LOADER, FakeBlockhashProvider
+
+
+class FakeRpcClient(test_helpers.FakeRpcClient):
+    def __init__(self):
+        super().__init__()
+        self.accounts = {}
+        self.created = 0
+        self.cancelled = []
+
+    def get_multiple_accounts(self, pubkeys, data_slice=None):
+        (offset, length) = data_slice
+        return [{'data': [base64.b64encode(self.accounts[str(key)][offset:offset + length]).decode(), 'base64']}
+                if str(key) in self.accounts else None for key in pubkeys]
+
+    def get_minimum_balance_for_rent_exemption(self, space):
+        return {'result': space}
+
+    def send_raw_transaction(self, wire, opts=None):
+        trx = Transaction.deserialize(wire)
+        for instruction in trx.instructions:
+            if str(instruction.program_id) == LOADER:
+                # CancelWithNonce finalizes the storage account
+                self.cancelled.append((instruction.data, instruction.keys))
+                self.accounts[str(instruction.keys[0].pubkey)] = bytes([FINALIZED_STORAGE_TAG]) + bytes(85)
+                continue
+            self.accounts[str(instruction.keys[1].pubkey)] = bytes(128)
+            self.created += 1
+        return {'result': 'sig{}'.format(self.created + len(self.cancelled))}
+
+
+def storage_header(slot, keys=()):
+    return bytes([STORAGE_TAG]) + STORAGE_LAYOUT.build(dict(
+        caller=bytes(20), nonce=1, gas_limit=2, gas_price=3, slot=slot, operator=bytes(32), accounts_len=len(keys),
+        executor_data_size=0, evm_data_size=0, gas_used_and_paid=0, number_of_payments=0, sign=bytes(65))) + \
+        b''.join(bytes(PublicKey(key)) for key in keys)
+
+
+class AccountPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'pool.json')
+        self.rpc = FakeRpcClient()
+        self.signer = Account()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def pool(self, kind, size):
+        return AccountPool(self.rpc, FakeBlockhashProvider(), self.signer, LOADER, kind, size, space=1024,
+                           path=self.path)
+
+    def test_holder_seed(self):
+        # the evm_loader checks WriteHolder against this seed
+        self.assertEqual(holder_seed(0), "f24c48dfb555ee1f6fb0327ecc23cc06")
+        pool = self.pool('holder', 3)
+        self.assertEqual(pool.accounts[0].pubkey, accountWithSeed(self.signer.public_key(), holder_seed(0),
+                                                                 PublicKey(LOADER)))
+
+    def test_prepare_and_restart(self):
+        pool = self.pool('storage', 6).prepare()
+        self.assertEqual(self.rpc.created, 6)
+        self.assertEqual(len(pool._free), 6)
+
+        # restart: nothing is created again, the unfinished call is not leased
+        self.rpc.accounts[str(pool.accounts[2].pubkey)] = storage_header(77)
+        self.rpc.accounts[str(pool.accounts[3].pubkey)] = bytes([FINALIZED_STORAGE_TAG]) + bytes(85)
+        pool = self.pool('storage', 6)
+        self.assertEqual(pool.created, set(range(6)))
+        pool.prepare()
+        self.assertEqual(self.rpc.created, 6)
+        self.assertEqual(pool.busy, {2: 77})
+        leased = [pool.lease(timeout=0).index for _ in range(5)]
+        self.assertEqual(sorted(leased), [0, 1, 3, 4, 5])
+        with self.assertRaises(Exception):
+            pool.lease(timeout=0)
+
+    def test_lease_checks_storage(self):
+        pool = self.pool('storage', 2).prepare()
+        with pool.leased() as account:
+            # the call did not finish
+            self.rpc.accounts[str(account.pubkey)] = storage_header(5)
+        other = pool.lease(timeout=0)
+        self.assertNotEqual(other.index, account.index)
+        with self.assertRaises(Exception):
+            pool.lease(timeout=0)
+        self.assertEqual(pool.busy, {account.index: 5})
+
+        # the call finished: the pool takes the account back when it runs dry
+        pool.release(other)
+        self.rpc.accounts[str(account.pubkey)] = bytes([FINALIZED_STORAGE_TAG]) + bytes(85)
+        self.assertEqual(sorted([pool.lease(timeout=0).index, pool.lease(timeout=0).index]), [0, 1])
+        self.assertEqual(pool.busy, {})
+
+    def test_cancel_busy(self):
+        pool = self.pool('storage', 3).prepare()
+        contract = str(PublicKey(os.urandom(32)))
+        self.rpc.accounts[str(pool.accounts[1].pubkey)] = storage_header(9, [contract, sysinstruct, LOADER])
+        pool = self.pool('storage', 3).prepare()
+        self.assertEqual(pool.busy, {1: 9})
+        # an abandoned call is reported, not waited for
+        with self.assertRaisesRegex(Exception, "cancel_abandoned"):
+            for _ in range(3):
+                pool.lease(timeout=0)
+
+        pool = self.pool('storage', 3)
+        self.assertEqual(pool.busy, {1: 9})
+        pool.prepare(cancel=True)
+        self.assertEqual(pool.busy, {})
+        self.assertEqual(len(pool._free), 3)
+        ((data, keys),) = self.rpc.cancelled
+        self.assertEqual(data, CANCEL_HEADER.pack(0x15, 1))
+        self.assertEqual([str(meta.pubkey) for meta in keys[:2]], [str(pool.accounts[1].pubkey),
+                                                                   str(self.signer.public_key())])
+        self.assertTrue(keys[1].is_signer)
+        self.assertEqual([(str(meta.pubkey), meta.is_writable) for meta in keys[6:]],
+                         [(contract, True), (sysinstruct, False), (LOADER, False)])
+
+    def test_concurrent_leases(self):
+        pool = self.pool('holder', 3).prepare()
+        in_use = set()
+        errors = []
+
+        def worker():
+            for _ in range(20):
+                with pool.leased(timeout=5) as account:
+                    if account.index in in_use:
+                        errors.append(account.index)
+                    in_use.add(account.index)
+                    in_use.discard(account.index)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(pool._free), 3)
+
+    def test_decode_header(self):
+        (tag, header) = decode_header(storage_header(42))
+        self.assertEqual((tag, header.slot, header.gas_price), (STORAGE_TAG, 42, 3))
+        self.assertEqual(decode_header(bytes(10))[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
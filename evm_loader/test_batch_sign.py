@@ -0,0 +1,30 @@
+import os
+import unittest
+
+from batch_sign import BatchSigner
+from eth_tx_utils import sign_tx
+
+
+class BatchSignTest(unittest.TestCase):
+    def test_order_and_results(self):
+        keys = [os.urandom(32) for _ in range(3)]
+        items = []
+        for i in range(50):
+            tx = {'to': os.urandom(20), 'value': 0, 'gas': 9999999999, 'gasPrice': 10 ** 9, 'nonce': i // 3,
+                  'data': os.urandom(68), 'chainId': 111}
+            items.append((tx, keys[i % 3], i))
+
+        with BatchSigner(processes=2, chunk_size=4, max_pending=2) as signer:
+            result = list(signer.sign(iter(items)))
+
+        self.assertEqual([context for (context, _) in result], list(range(50)))
+        for (context, signed) in result:
+            (tx, pr_key, _) = items[context]
+            self.assertEqual(signed, sign_tx(tx, pr_key))
+
+        with BatchSigner(processes=1) as signer:
+            self.assertEqual(list(signer.sign(items[:5])), result[:5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import threading
+import time
+import unittest
+
+from solana.account import Account
+from solana.system_program import TransferParams, transfer
+from solana.transaction import Transaction
+
+from blockhash_provider import BlockhashProvider
+
+BLOCKHASHES = ["EALChog1mXQ9nEgEUQpWAtmA5UueUZvZiL16ZivmR7eb", "GQfsMUa6bY4fGLGpZcHaGszgmNBsxiVvAuU8TAHXvQXa"]
+
+
+class FakeClient:
+    def __init__(self):
+        self.fees_calls = 0
+        self.last_valid = 'lastValidSlot'
+        self.sent = []
+        self.fail = False
+        self.lock = threading.Lock()
+
+    def get_fees(self, commitment):
+        with self.lock:
+            if self.fail:
+                return {'jsonrpc': '2.0', 'error': {'code': -32000, 'message': 'node is behind'}, 'id': 1}
+            self.fees_calls += 1
+            slot = self.fees_calls
+        value = {'blockhash': BLOCKHASHES[slot % 2], 'feeCalculator': {'lamportsPerSignature': 5000},
+                 self.last_valid: slot + 150}
+        return {'jsonrpc': '2.0', 'result': {'context': {'slot': slot}, 'value': value}, 'id': 1}
+
+    def send_raw_transaction(self, txn, opts=None):
+        self.sent.append(txn)
+        return {'jsonrpc': '2.0', 'result': 'sig', 'id': 1}
+
+
+class BlockhashProviderTest(unittest.TestCase):
+    def test_refresh_and_send(self):
+        client = FakeClient()
+        provider = BlockhashProvider(client, refresh_interval=0.05)
+        try:
+            recent = provider.recent()
+            self.assertEqual(recent.last_valid_slot, recent.slot + 150)
+            sender = Account()
+            for lamports in range(1, 20):
+                trx = Transaction().add(transfer(TransferParams(from_pubkey=sender.public_key(),
+                                                                to_pubkey=Account().public_key(), lamports=lamports)))
+                provider.send_transaction(trx, sender)
+                self.assertIn(trx.recent_blockhash, BLOCKHASHES)
+            # one getFees per refresh, not one per transaction
+            self.assertEqual(len(client.sent), 19)
+            time.sleep(0.3)
+            self.assertGreater(provider.recent().slot, recent.slot)
+            self.assertEqual(provider.refreshes, client.fees_calls)
+        finally:
+            provider.stop()
+
+    def test_stale(self):
+        client = FakeClient()
+        provider = BlockhashProvider(client, refresh_interval=0.01, max_age=0.1)
+        try:
+            provider.get()
+            client.fail = True
+            time.sleep(0.2)
+            with self.assertRaises(RuntimeError):
+                provider.get()
+            client.fail = False
+            time.sleep(0.05)
+            provider.get()
+        finally:
+            provider.stop()
+
+    def test_last_valid_slot(self):
+        client = FakeClient()
+        # 150 slots pass in 0.15 s
+        provider = BlockhashProvider(client, refresh_interval=0.01, slot_duration=0.001)
+        try:
+            provider.get()
+            client.fail = True
+            time.sleep(0.2)
+            with self.assertRaisesRegex(RuntimeError, "expires at slot"):
+                provider.get()
+        finally:
+            provider.stop()
+
+        # a block height is not taken for a slot
+        client = FakeClient()
+        client.last_valid = 'lastValidBlockHeight'
+        provider = BlockhashProvider(client, refresh_interval=0.01, slot_duration=0.001)
+        try:
+            self.assertIsNone(provider.last_valid_slot)
+        finally:
+            provider.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from collateral_pool import CollateralPool, CollateralPoolScheduler, discover_collateral_pools
+from solana_utils import create_collateral_pool_address
+import test_helpers
+
+
+class FakeRpcClient(test_helpers.FakeRpcClient):
+    def __init__(self, existing):
+        super().__init__()
+        self.existing = {str(create_collateral_pool_address(index)) for index in existing}
+
+    def get_multiple_accounts(self, pubkeys, data_slice=None):
+        return [{'data': ['', 'base64']} if str(key) in self.existing else None for key in pubkeys]
+
+
+def pools(count):
+    return [CollateralPool(index, create_collateral_pool_address(index)) for index in range(count)]
+
+
+class CollateralPoolTest(unittest.TestCase):
+    def test_discover(self):
+        rpc = FakeRpcClient([0, 1, 5])
+        self.assertEqual([pool.index for pool in discover_collateral_pools(rpc, count=10)], [0, 1, 5])
+        self.assertEqual(pools(3)[2].index_buf, (2).to_bytes(4, 'little'))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'collateral.json')
+            with open(path, 'w') as f:
+                for index in (5, 3, 1):
+                    f.write(json.dumps({'account': str(create_collateral_pool_address(index)), 'index': index}) + "\n")
+            # index 3 is listed but does not exist
+            self.assertEqual([pool.index for pool in discover_collateral_pools(rpc, path)], [1, 5])
+
+        with self.assertRaises(Exception):
+            discover_collateral_pools(FakeRpcClient([]), count=10)
+
+    def test_round_robin(self):
+        scheduler = CollateralPoolScheduler(pools(3), policy='round_robin')
+        held = [scheduler.acquire() for _ in range(4)]
+        self.assertEqual([pool.index for pool in held], [0, 1, 2, 0])
+        self.assertEqual((scheduler.shared, scheduler.max_sharing), (1, 2))
+
+    def test_lru(self):
+        scheduler = CollateralPoolScheduler(pools(3))
+        (a, b, c) = (scheduler.acquire(), scheduler.acquire(), scheduler.acquire())
+        self.assertEqual(len({a.index, b.index, c.index}), 3)
+        scheduler.release(b)
+        scheduler.release(a)
+        # b has been idle longer than a
+        self.assertEqual(scheduler.acquire(), b)
+        self.assertEqual(scheduler.acquire(), a)
+        self.assertEqual(scheduler.shared, 0)
+        scheduler.acquire()
+        self.assertEqual(scheduler.counters()['shared'], 1)
+        with self.assertRaises(Exception):
+            CollateralPoolScheduler(pools(1)).release(a)
+
+    def test_concurrent(self):
+        scheduler = CollateralPoolScheduler(pools(4))
+        barrier = threading.Barrier(4)
+
+        def worker():
+            for _ in range(50):
+                with scheduler.use():
+                    barrier.wait(timeout=5)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # never more transactions in flight than pools
+        counters = scheduler.counters()
+        self.assertEqual((counters['assigned'], counters['shared'], counters['in_flight']), (200, 0, 0))
+        scheduler.report()
+
+
+if __name__ == '__main__':
+    unittest.main()
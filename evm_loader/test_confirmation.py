@@ -0,0 +1,68 @@
+import threading
+import unittest
+
+from confirmation import ConfirmationTracker, MAX_SIGNATURES_PER_REQUEST, confirm_transactions
+
+
+class FakeClient:
+    """Answers getSignatureStatuses: a signature gets confirmed after `rounds` polls, 'lost' never does."""
+
+    def __init__(self, rounds=2):
+        self.rounds = rounds
+        self.seen = {}
+        self.calls = []
+
+    def get_signature_statuses(self, signatures):
+        self.calls.append(len(signatures))
+        value = []
+        for sig in signatures:
+            self.seen[sig] = self.seen.get(sig, 0) + 1
+            if sig.startswith('lost') or self.seen[sig] < self.rounds:
+                value.append(None)
+            else:
+                value.append({'slot': 1, 'confirmations': 1, 'err': None, 'confirmationStatus': 'confirmed'})
+        return {'jsonrpc': '2.0', 'result': {'context': {'slot': 1}, 'value': value}, 'id': 1}
+
+
+class ConfirmationTrackerTest(unittest.TestCase):
+    def test_batched_polling(self):
+        client = FakeClient(rounds=2)
+        signatures = ['sig%d' % i for i in range(600)]
+        result = confirm_transactions(client, signatures)
+        self.assertEqual(set(result), set(signatures))
+        self.assertTrue(all(status['confirmationStatus'] == 'confirmed' for status in result.values()))
+        # two rounds of ceil(600 / 256) requests instead of 1200 single-signature ones
+        self.assertEqual(client.calls, [256, 256, 88] * 2)
+        self.assertTrue(max(client.calls) <= MAX_SIGNATURES_PER_REQUEST)
+
+    def test_timeout(self):
+        tracker = ConfirmationTracker(FakeClient(rounds=1), timeout=0.2, min_sleep=0.01)
+        result = tracker.confirm(['sig', 'lost'])
+        self.assertEqual(result['sig']['confirmationStatus'], 'confirmed')
+        self.assertIsInstance(result['lost'], RuntimeError)
+
+    def test_confirmations(self):
+        client = FakeClient(rounds=1)
+        result = confirm_transactions(client, ['sig'], confirmations=2, timeout=0.2)
+        self.assertIsInstance(result['sig'], RuntimeError)
+
+    def test_background_callbacks(self):
+        tracker = ConfirmationTracker(FakeClient(rounds=3), min_sleep=0.01).start()
+        done = []
+        event = threading.Event()
+
+        def callback(future):
+            done.append(future.result()['confirmationStatus'])
+            if len(done) == 10:
+                event.set()
+
+        futures = [tracker.add('sig%d' % i, callback) for i in range(10)]
+        futures.append(tracker.add('sig0'))
+        self.assertTrue(event.wait(5))
+        self.assertEqual(futures[-1].result(timeout=5)['confirmationStatus'], 'confirmed')
+        tracker.stop()
+        self.assertEqual(tracker.pending(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from base58 import b58encode
+
+from cu_profiler import Profiler, parse_receipt, percentile
+from test_helpers import KECCAK, LOADER, TOKEN
+
+
+def evm_logs(consumed, memory, inner=False, failed=False):
+    logs = ["Program {} invoke [1]".format(LOADER)]
+    if inner:
+        logs += ["Program {} invoke [2]".format(TOKEN),
+                 "Program log: Instruction: Transfer",
+                 "Program log: Total memory occupied: 1",
+                 "Program {} consumed 3000 of 180000 compute units".format(TOKEN),
+                 "Program {} success".format(TOKEN)]
+    if failed:
+        logs += ["Program {} consumed {} of 200000 compute units".format(LOADER, consumed),
+                 "Program {} failed: custom program error: 0x1".format(LOADER)]
+        return logs
+    return logs + ["Program log: Total memory occupied: {}".format(memory),
+                   "Program {} consumed {} of 200000 compute units".format(LOADER, consumed),
+                   "Program {} success".format(LOADER)]
+
+
+def receipt(instructions, logs):
+    keys = [KECCAK, LOADER]
+    return {'result': {
+        'meta': {'err': None, 'logMessages': logs},
+        'transaction': {'message': {'accountKeys': keys, 'instructions': [
+            {'programIdIndex': keys.index(program), 'accounts': [], 'data': b58encode(data).decode()}
+            for (program, data) in instructions]}}}}
+
+
+class ProfilerTest(unittest.TestCase):
+    def test_parse(self):
+        # the Keccak precompile does not log anything
+        call = receipt([(KECCAK, b'\x01'), (LOADER, b'\x05' + bytes(10))], evm_logs(25000, 4096, inner=True))
+        (m,) = parse_receipt(call, LOADER)
+        self.assertEqual((m.index, m.tag, m.name), (1, 5, 'CallFromRawEthereumTX'))
+        self.assertEqual((m.consumed, m.limit, m.memory, m.success), (25000, 200000, 4096, True))
+
+        continues = receipt([(LOADER, b'\x14' + bytes(12)), (LOADER, b'\x14' + bytes(12))],
+                            evm_logs(190000, 8192) + evm_logs(200000, None, failed=True))
+        (first, second) = parse_receipt(continues, LOADER)
+        self.assertEqual((first.consumed, first.memory, first.success), (190000, 8192, True))
+        self.assertEqual((second.consumed, second.memory, second.success), (200000, None, False))
+
+        # no logs at all, or a failed sendTransaction
+        (m,) = parse_receipt(receipt([(LOADER, b'\x16')], []), LOADER)
+        self.assertEqual((m.tag, m.consumed, m.success), (0x16, None, None))
+        self.assertEqual(parse_receipt({'error': {'message': 'failed'}}, LOADER), [])
+
+    def test_profiler(self):
+        profiler = Profiler(LOADER)
+        for (transaction, steps) in (('a', 3), ('b', 5)):
+            profiler.add(receipt([(LOADER, b'\x13')], evm_logs(10000, 1000)), 'swap', transaction)
+            for step in range(steps - 1):
+                profiler.add(receipt([(LOADER, b'\x14')], evm_logs(100000 + step, 2000 + step)), 'swap', transaction)
+        profiler.add(receipt([(KECCAK, b''), (LOADER, b'\x05')], evm_logs(30000, 500)), 'transfer')
+
+        summary = profiler.summary()
+        self.assertEqual(summary['swap']['transaction_units'], {'count': 2, 'p50': 210001, 'p95': 410006,
+                                                                 'max': 410006})
+        self.assertEqual(summary['swap']['steps']['max'], 5)
+        self.assertEqual(summary['swap']['memory']['max'], 2003)
+        self.assertEqual(summary['transfer']['instruction_units']['p50'], 30000)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler.write_json(os.path.join(tmp, 'profile.json'))
+            profiler.write_csv(os.path.join(tmp, 'profile.csv'))
+            with open(os.path.join(tmp, 'profile.json')) as f:
+                self.assertEqual(json.load(f)['summary']['swap']['failed'], 0)
+            with open(os.path.join(tmp, 'profile.csv')) as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(rows[-1]['name'], 'CallFromRawEthereumTX')
+        profiler.report()
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 50), percentile(values, 95), percentile(values, 100)), (50, 95, 100))
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertIsNone(percentile([None], 50))
+
+
+if __name__ == '__main__':
+    unittest.main()
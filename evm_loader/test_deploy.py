@@ -2,6 +2,7 @@ import unittest
 from base58 import b58decode
 from solana_utils import *
 from eth_tx_utils import  make_instruction_data_from_tx, pack
+from holder_writer import HolderWriter, holder_message
 from spl.token.constants import TOKEN_PROGRAM_ID, ASSOCIATED_TOKEN_PROGRAM_ID, ACCOUNT_LEN
 from spl.token.instructions import get_associated_token_address, initialize_account, InitializeAccountParams
 from sha3 import keccak_256
@@ -37,13 +38,6 @@ def create_account_layout(lamports, space, ether, nonce):
         nonce=nonce
     ))
 
-def write_holder_layout(nonce, offset, data):
-    return (bytes.fromhex('12') +
-            nonce.to_bytes(8, byteorder='little') +
-            offset.to_bytes(4, byteorder='little') +
-            len(data).to_bytes(8, byteorder='little') +
-            data)
-
 class DeployTest(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -113,29 +107,12 @@ class DeployTest(unittest.TestCase):
             'chainId': 111
         }
         (from_addr, sign, msg) = make_instruction_data_from_tx(tx, self.user_acc.secret_key())
-        msg = sign + len(msg).to_bytes(8, byteorder="little") + msg
+        msg = holder_message(sign, msg)
         #print("msg", msg.hex())
 
         # Write transaction to transaction holder account
-        offset = 0
-        receipts = []
-        rest = msg
-        while len(rest):
-            (part, rest) = (rest[:1000], rest[1000:])
-            trx = Transaction()
-            trx.add(TransactionInstruction(program_id=evm_loader_id,
-                data=write_holder_layout(holder_id, offset, part),
-                keys=[
-                    AccountMeta(pubkey=holder, is_signer=False, is_writable=True),
-                    AccountMeta(pubkey=self.operator_acc.public_key(), is_signer=True, is_writable=False),
-                ]))
-            receipts.append(client.send_transaction(trx, self.operator_acc, opts=TxOpts(skip_confirmation=True,
-                                                                                        preflight_commitment="confirmed"))["result"])
-            offset += len(part)
-        print("receipts", receipts)
-        for rcpt in receipts:
-            confirm_transaction(client, rcpt)
-            print("confirmed:", rcpt)
+        writer = HolderWriter(get_bulk_rpc(), blockhash_provider, evm_loader_id, self.operator_acc, holder, holder_id)
+        print("holder written with", writer.write(msg), "transactions")
 
         base = self.operator_acc.public_key()
         seed = b58encode(ACCOUNT_SEED_VERSION+contract_eth).decode('utf8')
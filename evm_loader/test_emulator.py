@@ -0,0 +1,115 @@
+import json
+import os
+import stat
+import sys
+import tempfile
+import unittest
+
+from emulator import EmulationResult, EmulatorService, parse_emulate_output
+import test_helpers
+from test_helpers import LOADER
+
+CALLER = "a" * 40
+CONTRACT = "b" * 40
+
+# prints log lines around the result like neon-cli -vvv, appends its arguments to $CALLS
+FAKE_NEON_CLI = '''#!{python}
+import json, os, sys, time
+args = sys.argv[1:]
+with open(os.environ["CALLS"], "a") as f:
+    f.write(json.dumps(args) + "\\n")
+time.sleep(0.05)
+(caller, contract) = args[args.index("emulate") + 1:][:2]
+if contract == "dead" * 10:
+    sys.exit(1)
+print("[2022-02-25 INFO] emulate")
+print(json.dumps({{
+    "accounts": [
+        {{"address": "0x" + caller, "account": "Caller", "contract": None, "writable": True, "code_size": None}},
+        {{"address": "0x" + contract, "account": "Contract", "contract": "Code", "writable": False, "code_size": 42}},
+    ],
+    "solana_accounts": [{{"pubkey": "Extra", "is_signer": False, "is_writable": True}}],
+    "token_accounts": [], "result": "", "exit_status": "succeed", "exit_reason": {{"Succeed": "Stopped"}},
+    "steps_executed": 10}}))
+print("[2022-02-25 DEBUG] done")
+'''
+
+
+class FakeRpcClient(test_helpers.FakeRpcClient):
+    def __init__(self):
+        super().__init__()
+        self.slot = 100
+
+    def get_slot(self):
+        return {'result': self.slot}
+
+
+class EmulatorServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.command = os.path.join(self.tmp.name, "neon-cli")
+        with open(self.command, "w") as f:
+            f.write(FAKE_NEON_CLI.format(python=sys.executable))
+        os.chmod(self.command, os.stat(self.command).st_mode | stat.S_IEXEC)
+        self.calls = os.path.join(self.tmp.name, "calls")
+        os.environ["CALLS"] = self.calls
+        self.rpc = FakeRpcClient()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def runs(self):
+        if not os.path.exists(self.calls):
+            return []
+        with open(self.calls) as f:
+            return [json.loads(line) for line in f]
+
+    def service(self, **kwargs):
+        return EmulatorService(LOADER, url="http://localhost:8899", rpc=self.rpc, command=self.command,
+                               slot_interval=0, **kwargs)
+
+    def test_result(self):
+        with self.service() as emulator:
+            result = emulator.emulate(bytes.fromhex(CALLER), CONTRACT, b"\x01\x02", 5)
+        self.assertTrue(result.succeed)
+        self.assertEqual(result.writable_accounts, ["Caller", "Extra"])
+        self.assertEqual(result.code_size("0x" + CONTRACT.upper()), 42)
+        self.assertIsNone(result.code_size("c" * 40))
+        self.assertEqual(self.runs()[0][-4:], [CALLER, CONTRACT, "0102", "5"])
+
+    def test_cache(self):
+        with self.service() as emulator:
+            requests = [(CALLER, CONTRACT, "01", "")] * 5 + [(CALLER, CONTRACT, "02", "")]
+            results = emulator.emulate_many(requests)
+            self.assertEqual(len(self.runs()), 2)
+            self.assertTrue(all(isinstance(result, EmulationResult) for result in results))
+            self.assertEqual(results[-1].raw["accounts"][0]["writable"], True)
+            self.assertEqual(sorted(run[-1] for run in self.runs()), ["01", "02"])
+
+            emulator.emulate(CALLER, CONTRACT, "01", "")
+            self.assertEqual(len(self.runs()), 2)
+            # a new slot, the state may have changed
+            self.rpc.slot += 1
+            emulator.emulate(CALLER, CONTRACT, "01", "")
+            self.assertEqual(len(self.runs()), 3)
+            self.assertEqual((emulator.hits, emulator.misses), (5, 3))
+            emulator.report()
+
+    def test_failure(self):
+        with self.service() as emulator:
+            (result,) = emulator.emulate_many([(CALLER, "dead" * 10, "", "")])
+            self.assertIsInstance(result, Exception)
+            # failures are not cached
+            with self.assertRaises(Exception):
+                emulator.emulate(CALLER, "dead" * 10)
+            self.assertEqual((len(self.runs()), emulator.errors), (2, 2))
+
+    def test_parse_output(self):
+        js = parse_emulate_output('log\n{"exit_status": "revert", "result": "08c379a0"}\n{not json\n\n')
+        self.assertEqual(js["exit_status"], "revert")
+        with self.assertRaises(Exception):
+            parse_emulate_output("error: account not found\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
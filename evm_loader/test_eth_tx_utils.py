@@ -0,0 +1,108 @@
+import os
+import random
+import unittest
+
+from sha3 import keccak_256
+
+from eth_tx_utils import Trx, make_instruction_data_from_tx, materialize, pack, sign_tx, span_bytes, unpack, unpack_spans
+
+raw_trx = "f86c018522ecb25c0082520894a090e606e30bd747d4e6245a1517ebe430f0057e880340c0086a5cbe008025a0e213a2a87b050644f9c982144fa762132bbc00b9ac63d168d68146e300de6b4ba059dbbae6d190d820ddde818a98204232194eb6d27226190b4c0be82480d6a735"
+
+
+def random_item(depth=0):
+    if depth < 3 and random.random() < 0.3:
+        return [random_item(depth + 1) for _ in range(random.randint(0, 5))]
+    return os.urandom(random.choice([0, 1, 2, 20, 55, 56, 300, 70000]))
+
+
+def normalize(item):
+    # unpack() returns ints for single bytes and None/() for empty items
+    if isinstance(item, (list, tuple)):
+        return [normalize(i) for i in item]
+    if item is None:
+        return b''
+    if isinstance(item, int):
+        return bytes((item,))
+    return item
+
+
+class RlpEncodeTest(unittest.TestCase):
+    def test_canonical(self):
+        self.assertEqual(pack(None).hex(), "80")
+        self.assertEqual(pack(0).hex(), "80")
+        self.assertEqual(pack(0x7f).hex(), "7f")
+        self.assertEqual(pack(0x80).hex(), "8180")
+        self.assertEqual(pack(b'\x05').hex(), "05")
+        self.assertEqual(pack(b'\x80').hex(), "8180")
+        self.assertEqual(pack("dog").hex(), "83646f67")
+        self.assertEqual(pack([]).hex(), "c0")
+        self.assertEqual(pack([[], [[]], [[], [[]]]]).hex(), "c7c0c1c0c3c0c1c0")
+        self.assertEqual(pack(b'a' * 56).hex(), "b838" + "61" * 56)
+        self.assertEqual(pack([b'a' * 56]).hex(), "f83a" + "b838" + "61" * 56)
+
+    def test_round_trip(self):
+        for _ in range(200):
+            item = random_item()
+            data = pack(item)
+            self.assertEqual(materialize(data, unpack_spans(data, strict=True)), normalize(item))
+
+    def test_trx_memoization(self):
+        trx = Trx.fromString(bytes.fromhex(raw_trx))
+        msg = trx.get_msg()
+        self.assertIs(trx.get_msg(), msg)
+        self.assertEqual(trx.hash(), keccak_256(msg).digest())
+        trx.nonce = 2
+        self.assertNotEqual(trx.get_msg(), msg)
+        trx.nonce = 1
+        self.assertEqual(trx.get_msg(), msg)
+
+
+class RlpDecodeTest(unittest.TestCase):
+    def test_matches_unpack(self):
+        for _ in range(200):
+            data = pack(random_item())
+            (expected, rest) = unpack(memoryview(data))
+            self.assertEqual(len(rest), 0)
+            self.assertEqual(materialize(data, unpack_spans(data)), normalize(expected))
+
+    def test_spans_are_lazy(self):
+        data = pack([b'\x01' * 100, [b'abc']])
+        (first, [second]) = unpack_spans(data)
+        self.assertEqual(first, (4, 100))
+        self.assertEqual(span_bytes(data, second), b'abc')
+
+    def test_strict_mode(self):
+        for bad in (b'\x81\x05', b'\xb8\x05abcde', b'\xb9\x00\x38' + b'a' * 56, b'\xf8\x01\x80', b'\x82ab\x00'):
+            with self.assertRaises(Exception):
+                unpack_spans(bad, strict=True)
+        with self.assertRaises(Exception):
+            unpack_spans(b'\x83ab')
+
+    def test_trx_from_string(self):
+        trx = Trx.fromString(bytes.fromhex(raw_trx), strict=True)
+        self.assertEqual(trx.nonce, 1)
+        self.assertEqual(trx.toAddress.hex(), "a090e606e30bd747d4e6245a1517ebe430f0057e")
+        self.assertEqual(trx.callData, None)
+        self.assertEqual(str(trx), raw_trx)
+
+
+class SignTest(unittest.TestCase):
+    # EIP-155 example transaction
+    tx = {'nonce': 9, 'gasPrice': 20 * 10 ** 9, 'gas': 21000, 'to': '0x' + '35' * 20, 'value': 10 ** 18, 'data': '',
+          'chainId': 1}
+    private_key = bytes.fromhex('46' * 32)
+    signed = "f86c098504a817c800825208943535353535353535353535353535353535353535880de0b6b3a76400008025a028ef61340bd939bc2195fe537567866003e1a15d3c71ff63e1590620aa636276a067cbe9d8997f761aecb703304b3800ccf555c9f3dc64214b297fb1966a3b6d83"
+
+    def test_matches_signed_transaction(self):
+        (from_addr, sign, msg) = make_instruction_data_from_tx(self.tx, self.private_key)
+        self.assertEqual(keccak_256(msg).hexdigest(), "daf5a779ae972f972197303d7b574746c7ef83eadac0f2791ad23db92e4c8e53")
+        self.assertEqual(from_addr.hex(), "9d8a62f656a8d1615c1294fd71e9cfb3e4855a4f")
+        self.assertEqual((from_addr, sign, msg), make_instruction_data_from_tx(self.signed))
+
+    def test_verify(self):
+        result = sign_tx(dict(self.tx, to=bytes.fromhex('35' * 20)), '0x' + self.private_key.hex(), verify=True)
+        self.assertEqual(result, sign_tx(self.tx, self.private_key))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+from base58 import b58encode
+from eth_utils import abi
+
+from evm_events import EventIndex, OnEvent, OnReturn, REVERTED, address_topic, decode_instruction, \
+    decode_transaction, uint_word
+from test_helpers import KECCAK, LOADER, TOKEN
+
+TRANSFER = abi.event_signature_to_log_topic('Transfer(address,address,uint256)')
+ERC20 = bytes.fromhex("11" * 20)
+(ALICE, BOB) = ("22" * 20, "33" * 20)
+
+
+def on_event(address, topics, data):
+    return bytes([7]) + address + len(topics).to_bytes(8, "little") + b"".join(topics) + data
+
+
+def on_return(status, data=b''):
+    return bytes([6, status]) + (21000).to_bytes(8, "little") + data
+
+
+def receipt(signature, inner, err=None, slot=10):
+    """A call through instruction 1; inner are (program, data) invoked by it."""
+    keys = [KECCAK, LOADER, TOKEN]
+    return {'result': {
+        'slot': slot,
+        'meta': {'err': err, 'innerInstructions': [{'index': 1, 'instructions': [
+            {'programIdIndex': keys.index(program), 'accounts': [], 'data': b58encode(data).decode()}
+            for (program, data) in inner]}] if inner else []},
+        'transaction': {'signatures': [signature], 'message': {'accountKeys': keys, 'instructions': [
+            {'programIdIndex': 0, 'accounts': [], 'data': ''},
+            {'programIdIndex': 1, 'accounts': [], 'data': ''}]}}}}
+
+
+def transfer(signature, sender, receiver, value, slot=10):
+    return receipt(signature, [
+        # SPL token MintTo starts with 7 too
+        (TOKEN, bytes([7]) + bytes(8)),
+        (LOADER, on_event(ERC20, [TRANSFER, address_topic(sender), address_topic(receiver)], uint_word(value))),
+        (LOADER, on_return(0x12))], slot=slot)
+
+
+class EvmEventsTest(unittest.TestCase):
+    def test_decode(self):
+        decoded = decode_transaction(transfer("sig1", ALICE, BOB, 5))
+        self.assertEqual((decoded.signature, decoded.slot, decoded.error), ("sig1", 10, None))
+        self.assertEqual(decoded.on_return, OnReturn(0x12, 21000, b''))
+        self.assertTrue(decoded.on_return.succeed)
+        (event,) = decoded.events
+        self.assertIsInstance(event.address, memoryview)
+        self.assertEqual(event, OnEvent(ERC20, [TRANSFER, address_topic(ALICE), address_topic(BOB)], uint_word(5)))
+        self.assertEqual(decoded.find(ERC20.hex(), TRANSFER), [event])
+        self.assertEqual(decoded.find(topic0=bytes(32)), [])
+
+        reverted = decode_transaction(receipt("sig2", [(LOADER, on_return(REVERTED, b'\x08\xc3'))]))
+        self.assertTrue(reverted.reverted)
+        self.assertEqual(bytes(reverted.on_return.data), b'\x08\xc3')
+
+        self.assertIsNone(decode_transaction({'result': None}))
+        self.assertIsNone(decode_instruction(b''))
+        with self.assertRaises(Exception):
+            decode_instruction(on_event(ERC20, [TRANSFER, TRANSFER], b'')[:-1])
+
+    def test_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "events.sqlite")
+            index = EventIndex(path, commit_every=2)
+            for i in range(5):
+                index.add(decode_transaction(transfer("sig{}".format(i), ALICE if i % 2 else BOB, BOB, i, slot=i)))
+            failed = decode_transaction(receipt("failed", [], err={'InstructionError': [1, 'InvalidArgument']}))
+            index.add(failed)
+            index.close()
+
+            with EventIndex(path) as index:
+                self.assertIn("sig3", index)
+                self.assertNotIn("sig9", index)
+                self.assertEqual(index.get("sig3"), decode_transaction(transfer("sig3", ALICE, BOB, 3, slot=3)))
+                self.assertEqual(index.get("failed").error, {'InstructionError': [1, 'InvalidArgument']})
+                self.assertIsNone(index.get("failed").on_return)
+                self.assertEqual(index.count(ERC20, TRANSFER), 5)
+                self.assertEqual(index.count(topic0=bytes(32)), 0)
+                events = index.events(address="0x" + ERC20.hex(), topic0=TRANSFER)
+                self.assertEqual([signature for (signature, _, _) in events], ["sig0", "sig1", "sig2", "sig3", "sig4"])
+                self.assertEqual([int.from_bytes(event.data, "big") for (_, _, event) in events], [0, 1, 2, 3, 4])
+                self.assertEqual(index.events(signature="sig1")[0][2].topics[1], address_topic(ALICE))
+
+                # storing a receipt again replaces its events
+                index.add(decode_transaction(receipt("sig1", [(LOADER, on_return(REVERTED))])))
+                self.assertEqual(index.count(ERC20), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
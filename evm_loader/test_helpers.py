@@ -0,0 +1,52 @@
+"""Program ids and fakes shared by the unit tests of the performance helpers.
+
+The fakes of rpc_client.RpcClient and BlockhashProvider only answer what every test
+needs; a test subclasses them for the node it simulates.
+"""
+import asyncio
+
+LOADER = "eeLSJgWzzxrqKv1UxtRVVH8FX3qCQWUs9QuAjJpETGU"
+KECCAK = "KeccakSecp256k11111111111111111111111111111"
+TOKEN = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+BLOCKHASH = "EETubP5AKHgjPAhzPAFcb8BAY1hMH639CWCFTqi3hq1k"
+
+CONFIRMED = {'confirmationStatus': 'confirmed', 'confirmations': 1, 'err': None}
+
+
+class FakeRpcClient:
+    """RpcClient over `node`, a fake of the AsyncClient; every signature is confirmed unless confirmed() says no."""
+
+    def __init__(self, node=None):
+        self.rpc = node
+
+    def run(self, coro):
+        return asyncio.run(coro)
+
+    def gather(self, coros):
+        async def _gather():
+            return await asyncio.gather(*coros)
+        return asyncio.run(_gather())
+
+    def confirmed(self, signature):
+        return True
+
+    def get_signature_statuses(self, signatures, search_transaction_history=False):
+        value = [CONFIRMED if self.confirmed(signature) else None for signature in signatures]
+        return {'result': {'value': value}}
+
+
+class FakeBlockhashProvider:
+    """Always BLOCKHASH; sign() skips the signers of fake transactions, which are None."""
+
+    def recent(self):
+        return self.get()
+
+    def get(self):
+        return BLOCKHASH
+
+    def sign(self, trx, *signers):
+        trx.recent_blockhash = self.get()
+        signers = [signer for signer in signers if signer is not None]
+        if signers:
+            trx.sign(*signers)
+        return trx
@@ -0,0 +1,74 @@
+import asyncio
+import base64
+import os
+import unittest
+
+from solana.account import Account
+from solana.transaction import Transaction
+
+from holder_writer import HOLDER_DATA_OFFSET, WRITE_HOLDER_HEADER, HolderWriter, holder_message
+from message_template import PACKET_DATA_SIZE
+import test_helpers
+from test_helpers import BLOCKHASH, LOADER, FakeBlockhashProvider
+
+
+class FakeNode:
+    """Applies WriteHolder instructions to one holder account, dropping the chunks at `drop` offsets once."""
+
+    def __init__(self, size, drop=()):
+        self.data = bytearray(size)
+        self.drop = set(drop)
+        self.wires = []
+
+    async def send_raw_transaction(self, wire, opts=None):
+        await asyncio.sleep(0)
+        self.wires.append(wire)
+        assert len(wire) <= PACKET_DATA_SIZE
+        trx = Transaction.deserialize(wire)
+        assert trx.recent_blockhash == BLOCKHASH
+        data = trx.instructions[0].data
+        (tag, holder_id, offset, length) = WRITE_HOLDER_HEADER.unpack_from(data)
+        if offset in self.drop:
+            self.drop.remove(offset)
+        else:
+            part = data[WRITE_HOLDER_HEADER.size:]
+            self.data[HOLDER_DATA_OFFSET + offset:HOLDER_DATA_OFFSET + offset + length] = part
+        return {'result': 'sig{}'.format(len(self.wires))}
+
+
+class FakeRpcClient(test_helpers.FakeRpcClient):
+    def get_account_info(self, pubkey):
+        return {'result': {'value': {'data': [base64.b64encode(bytes(self.rpc.data)).decode(), 'base64']}}}
+
+
+class HolderWriterTest(unittest.TestCase):
+    def writer(self, node):
+        return HolderWriter(FakeRpcClient(node), FakeBlockhashProvider(), LOADER, Account(), Account().public_key())
+
+    def test_chunk_size(self):
+        writer = self.writer(FakeNode(0))
+        self.assertGreater(writer.chunk_size, 1000)
+        wire = writer.template.build(writer.signer, BLOCKHASH, {}, [writer.layout(0, bytes(writer.chunk_size))])
+        self.assertEqual(len(wire), PACKET_DATA_SIZE)
+
+    def test_write(self):
+        message = holder_message(os.urandom(65), os.urandom(5000))
+        node = FakeNode(8192)
+        writer = self.writer(node)
+        chunks = -(-len(message) // writer.chunk_size)
+        self.assertEqual(writer.write(message), chunks)
+        self.assertEqual(len(node.wires), chunks)
+        self.assertEqual(bytes(node.data[HOLDER_DATA_OFFSET:HOLDER_DATA_OFFSET + len(message)]), message)
+
+    def test_resend_missing(self):
+        message = holder_message(os.urandom(65), os.urandom(5000))
+        node = FakeNode(8192)
+        writer = self.writer(node)
+        node.drop = {writer.chunk_size, 3 * writer.chunk_size}
+        # only the two dropped chunks are written again
+        self.assertEqual(writer.write(message), -(-len(message) // writer.chunk_size) + 2)
+        self.assertEqual(bytes(node.data[HOLDER_DATA_OFFSET:HOLDER_DATA_OFFSET + len(message)]), message)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import random
+import time
+import unittest
+
+from base58 import b58encode
+from solana.publickey import PublicKey
+
+from collateral_pool import CollateralPool, CollateralPoolScheduler
+from confirmation import ConfirmationTracker
+from iterative_pipeline import IterativePipeline, IterativeStats
+from step_tuner import StepTuner
+import test_helpers
+from test_helpers import LOADER, FakeBlockhashProvider
+
+UNITS_PER_STEP = 100
+
+
+class FakeTransaction:
+    def __init__(self, steps):
+        self.steps = steps
+        self.recent_blockhash = None
+
+    def serialize(self):
+        return (self.recent_blockhash, self.steps)
+
+
+class FakeNode:
+    """Executes continues one after another on a storage account that needs `total_steps` EVM steps."""
+
+    def __init__(self, total_steps):
+        self.remaining = total_steps
+        self.signatures = set()
+        self.receipts = {}
+        self.sent_at = {}
+        self.sent = 0
+
+    async def send_raw_transaction(self, txn, opts=None):
+        (blockhash, steps) = txn
+        assert txn not in self.signatures, "duplicate transaction"
+        self.signatures.add(txn)
+        self.sent += 1
+        await asyncio.sleep(random.random() * 0.01)
+        if 10000 + UNITS_PER_STEP * steps > 200000:
+            return {'error': {'message': 'Transaction simulation failed', 'data': {'logs': [
+                "Program failed to complete: exceeded maximum number of instructions allowed (200000)"]}}}
+        if self.remaining <= 0 and steps > 0:
+            return {'error': {'message': 'Transaction simulation failed: invalid storage account'}}
+        executed = min(steps, self.remaining)
+        self.remaining -= executed
+        logs = ["Program {} invoke [1]".format(LOADER),
+                "Program {} consumed {} of 200000 compute units".format(LOADER, 10000 + UNITS_PER_STEP * steps),
+                "Program {} success".format(LOADER)]
+        inner = []
+        if self.remaining == 0 and steps > 0:
+            inner = [{'index': 0, 'instructions': [{'data': b58encode(bytes([6, 0x11])).decode()}]}]
+        signature = "sig{}".format(self.sent)
+        self.sent_at[signature] = time.monotonic()
+        self.receipts[signature] = {'result': {'meta': {'err': None, 'logMessages': logs, 'innerInstructions': inner}}}
+        return {'result': signature}
+
+    def confirmed(self, signature):
+        # a transaction is confirmed 50 ms after it was sent
+        return signature in self.receipts and time.monotonic() - self.sent_at[signature] >= 0.05
+
+    async def get_confirmed_transaction(self, signature):
+        return self.receipts[signature]
+
+
+class FakeRpcClient(test_helpers.FakeRpcClient):
+    def confirmed(self, signature):
+        return self.rpc.confirmed(signature)
+
+
+class IterativePipelineTest(unittest.TestCase):
+    def execute(self, node, in_flight, tuner, collateral_pools=None, begin=FakeTransaction, continue_=FakeTransaction):
+        rpc = FakeRpcClient(node)
+        tracker = ConfirmationTracker(rpc, min_sleep=0.01, max_sleep=0.01)
+        pipeline = IterativePipeline(rpc, None, FakeBlockhashProvider(), LOADER, in_flight=in_flight, tuner=tuner,
+                                     tracker=tracker, collateral_pools=collateral_pools)
+        try:
+            return pipeline.execute(begin, continue_)
+        finally:
+            tracker.stop()
+
+    def test_pipeline(self):
+        stats = IterativeStats()
+        for in_flight in (1, 4):
+            node = FakeNode(10000)
+            result = stats.add(self.execute(node, in_flight, StepTuner(initial_steps=500, target=0.9)))
+            self.assertEqual(node.remaining, 0)
+            self.assertEqual(result.transactions, node.sent)
+            self.assertEqual(result.retries, 0)
+            self.assertLess(result.surplus, in_flight)
+        (serial, pipelined) = stats.results
+        self.assertLess(pipelined.latency, serial.latency)
+        stats.report()
+
+    def test_compute_budget(self):
+        node = FakeNode(10000)
+        result = self.execute(node, 3, StepTuner(initial_steps=5000))
+        self.assertEqual(node.remaining, 0)
+        self.assertGreater(result.retries, 0)
+
+    def test_failure(self):
+        # the call never returns: every continue is rejected
+        node = FakeNode(0)
+        with self.assertRaises(Exception):
+            self.execute(node, 3, StepTuner(initial_steps=100))
+
+    def test_collateral_pools(self):
+        scheduler = CollateralPoolScheduler([CollateralPool(index, PublicKey(os.urandom(32))) for index in range(2)])
+        (used, calls) = ([], [])
+
+        def build(steps, pool):
+            used.append(pool.index)
+            return FakeTransaction(steps)
+
+        for total_steps in (10000, 10000, 0):
+            used.clear()
+            try:
+                self.execute(FakeNode(total_steps), 3, StepTuner(initial_steps=500), scheduler, build, build)
+            except Exception:
+                self.assertEqual(total_steps, 0)
+            # every transaction of a call writes the same pool
+            self.assertEqual(len(set(used)), 1)
+            self.assertEqual(scheduler.counters()['in_flight'], 0)
+            calls.append(used[0])
+        # the pool idle for longer is used next, also after a failed call
+        self.assertEqual(calls, [0, 1, 0])
+        self.assertEqual(scheduler.shared, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import unittest
+
+import base58
+from nacl.signing import VerifyKey
+from solana.account import Account
+from solana.message import Message
+from solana.publickey import PublicKey
+from solana.transaction import AccountMeta, Transaction, TransactionInstruction
+
+from message_template import MessageTemplate, Slot
+
+keccakprog = "KeccakSecp256k11111111111111111111111111111"
+sysinstruct = "Sysvar1nstructions1111111111111111111111111"
+program = PublicKey(os.urandom(32))
+
+
+def instructions(contract, caller, keccak_data=b'', data=b''):
+    return [
+        TransactionInstruction(program_id=keccakprog, data=keccak_data,
+                               keys=[AccountMeta(pubkey=PublicKey(keccakprog), is_signer=False, is_writable=False)]),
+        TransactionInstruction(program_id=program, data=data, keys=[
+            AccountMeta(pubkey=contract, is_signer=False, is_writable=True),
+            AccountMeta(pubkey=caller, is_signer=False, is_writable=True),
+            AccountMeta(pubkey=PublicKey(sysinstruct), is_signer=False, is_writable=False),
+            AccountMeta(pubkey=program, is_signer=False, is_writable=False),
+        ]),
+    ]
+
+
+def resolve(raw):
+    """Instructions of a wire transaction as (program, [(key, is_signer, is_writable)], data)."""
+    msg = Message.deserialize(raw[65:])
+    header = msg.header
+    keys = msg.account_keys
+    signed = header.num_required_signatures
+
+    def meta(i):
+        if i < signed:
+            return (str(keys[i]), True, i < signed - header.num_readonly_signed_accounts)
+        return (str(keys[i]), False, i < len(keys) - header.num_readonly_unsigned_accounts)
+
+    return [(str(keys[instr.program_id_index]), [meta(i) for i in instr.accounts], base58.b58decode(instr.data))
+            for instr in msg.instructions], str(msg.recent_blockhash), raw[1:65], raw[65:]
+
+
+class MessageTemplateTest(unittest.TestCase):
+    def test_same_as_transaction(self):
+        template = MessageTemplate(instructions(Slot("contract"), Slot("caller")))
+        blockhash = str(PublicKey(os.urandom(32)))
+        for size in (10, 200, 700):
+            signer = Account(os.urandom(32))
+            (contract, caller) = (PublicKey(os.urandom(32)), PublicKey(os.urandom(32)))
+            data = [os.urandom(12), os.urandom(size)]
+
+            trx = Transaction()
+            for instr in instructions(contract, caller, *data):
+                trx.add(instr)
+            trx.recent_blockhash = blockhash
+            trx.sign(signer)
+            expected = trx.serialize()
+
+            raw = template.build(signer, blockhash, {'contract': str(contract), 'caller': bytes(caller)}, data)
+            self.assertEqual(len(raw), len(expected))
+            (instrs, raw_blockhash, signature, msg) = resolve(raw)
+            self.assertEqual(instrs, resolve(expected)[0])
+            self.assertEqual(raw_blockhash, blockhash)
+            self.assertEqual(str(Message.deserialize(msg).account_keys[0]), str(signer.public_key()))
+            VerifyKey(bytes(signer.public_key())).verify(msg, signature)
+
+    def test_too_large(self):
+        template = MessageTemplate(instructions(Slot("contract"), Slot("caller")))
+        slots = {'contract': os.urandom(32), 'caller': os.urandom(32)}
+        with self.assertRaises(RuntimeError):
+            template.build(Account(), str(PublicKey(1)), slots, [b'', os.urandom(1100)])
+
+    def test_single_signer(self):
+        signer = PublicKey(os.urandom(32))
+        with self.assertRaises(Exception):
+            MessageTemplate([TransactionInstruction(program_id=program, data=b'', keys=[
+                AccountMeta(pubkey=signer, is_signer=True, is_writable=False)])])
+
+
+if __name__ == '__main__':
+    unittest.main()
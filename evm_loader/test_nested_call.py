@@ -4,6 +4,7 @@ from base58 import b58decode
 from sha3 import keccak_256
 from solana_utils import *
 from eth_tx_utils import make_keccak_instruction_data, make_instruction_data_from_tx, Trx
+from holder_writer import HolderWriter, holder_message
 from spl.token.instructions import get_associated_token_address
 from eth_keys import keys
 from eth_utils import abi
@@ -25,13 +26,6 @@ def get_recent_account_balance(code_account_address):
     return http_client.get_balance(code_account_address, commitment='recent')['result']['value']
 
 
-def write_holder_layout(nonce, offset, data):
-    return (bytes.fromhex('12') +
-            nonce.to_bytes(8, byteorder='little') +
-            offset.to_bytes(4, byteorder='little') +
-            len(data).to_bytes(8, byteorder='little') +
-            data)
-
 
 def create_holder_account(operator_acc):
     holder_id_bytes = holder_id.to_bytes((holder_id.bit_length() + 7) // 8, 'big')
@@ -319,25 +313,8 @@ class EventTest(unittest.TestCase):
             ])
 
     def write_transaction_to_holder_account(self, holder, signature, message):
-        message = signature + len(message).to_bytes(8, byteorder="little") + message
-
-        offset = 0
-        receipts = []
-        rest = message
-        while len(rest):
-            (part, rest) = (rest[:1000], rest[1000:])
-            trx = Transaction()
-            trx.add(TransactionInstruction(program_id=evm_loader_id,
-                data=write_holder_layout(holder_id, offset, part),
-                keys=[
-                    AccountMeta(pubkey=holder, is_signer=False, is_writable=True),
-                    AccountMeta(pubkey=self.acc.public_key(), is_signer=True, is_writable=False),
-                ]))
-            receipts.append(http_client.send_transaction(trx, self.acc, opts=TxOpts(skip_confirmation=True, preflight_commitment="confirmed"))["result"])
-            offset += len(part)
-
-        for rcpt in receipts:
-            confirm_transaction(http_client, rcpt)
+        writer = HolderWriter(get_bulk_rpc(), blockhash_provider, evm_loader_id, self.acc, holder, holder_id)
+        writer.write(holder_message(signature, message))
 
     def call_partial_signed(self, input, contract_eth, contract, code):
         tx = {'to': contract_eth, 'value': 0, 'gas': 999_999_999, 'gasPrice': 1_000_000_000,
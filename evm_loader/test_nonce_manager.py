@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import unittest
+
+from nonce_manager import NonceManager, invalid_nonce
+
+INVALID_ARGUMENT = {'result': {'meta': {'err': {'InstructionError': [1, 'InvalidArgument']}}}}
+SUCCESS = {'result': {'meta': {'err': None}}}
+
+
+class FakeChain:
+    def __init__(self, counts):
+        self.counts = counts
+        self.reads = []
+
+    def read_counts(self, callers):
+        self.reads.append(list(callers))
+        return [self.counts[caller] for caller in callers]
+
+
+class NonceManagerTest(unittest.TestCase):
+    def test_reserve_and_release(self):
+        chain = FakeChain({'a': 7})
+        nonces = NonceManager(chain.read_counts)
+        self.assertEqual([nonces.reserve('a') for _ in range(4)], [7, 8, 9, 10])
+        self.assertEqual(chain.reads, [['a']])
+
+        # a gap in the middle is handed out again first
+        nonces.release('a', 8)
+        self.assertEqual(nonces.reserve('a'), 8)
+        # the highest reservations are undone
+        nonces.release('a', 9)
+        nonces.release('a', 10)
+        self.assertEqual(nonces.reserve('a'), 9)
+        nonces.commit('a', 7)
+        nonces.release('a', 7)
+        self.assertEqual(nonces.reserve('a'), 10)
+
+    def test_only_in_flight_reserved(self):
+        nonces = NonceManager(FakeChain({'a': 0}).read_counts)
+        sent = [nonces.reserve('a') for _ in range(6)]
+        for nonce in sent[:3]:
+            nonces.commit('a', nonce)
+        self.assertTrue(nonces.observe('a', sent[3], SUCCESS))
+        nonces.release('a', sent[5])
+        self.assertEqual(nonces._state('a').reserved, {4})
+        self.assertEqual(nonces.reserve('a'), 5)
+
+    def test_resync_on_invalid_argument(self):
+        chain = FakeChain({'a': 0})
+        nonces = NonceManager(chain.read_counts)
+        sent = [nonces.reserve('a') for _ in range(5)]
+        # nonce 1 was dropped on the way: the chain stops at 1
+        self.assertTrue(nonces.observe('a', sent[0], SUCCESS))
+        chain.counts['a'] = 1
+        self.assertFalse(nonces.observe('a', sent[2], INVALID_ARGUMENT))
+        self.assertEqual(nonces.resyncs, 1)
+        self.assertEqual(nonces.reserve('a'), 1)
+        # releases of reservations from before the resync are ignored
+        nonces.release('a', sent[4])
+        self.assertEqual(nonces.reserve('a'), 2)
+
+    def test_prefetch(self):
+        chain = FakeChain({'a': 1, 'b': 2, 'c': 3})
+        nonces = NonceManager(chain.read_counts)
+        nonces.reserve('a')
+        nonces.prefetch(['a', 'b', 'c', 'b'])
+        self.assertEqual(chain.reads, [['a'], ['b', 'c']])
+        self.assertEqual((nonces.reserve('a'), nonces.reserve('b'), nonces.reserve('c')), (2, 2, 3))
+
+    def test_threads_and_tasks(self):
+        nonces = NonceManager(FakeChain({'a': 0}).read_counts)
+        taken = []
+
+        def worker():
+            for _ in range(200):
+                taken.append(nonces.reserve('a'))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        async def task():
+            for _ in range(100):
+                taken.append(nonces.reserve('a'))
+                await asyncio.sleep(0)
+
+        async def tasks():
+            await asyncio.gather(*[task() for _ in range(4)])
+
+        asyncio.run(tasks())
+        self.assertEqual(sorted(taken), list(range(1200)))
+
+    def test_invalid_nonce(self):
+        self.assertTrue(invalid_nonce(INVALID_ARGUMENT))
+        self.assertTrue(invalid_nonce(INVALID_ARGUMENT['result']))
+        self.assertFalse(invalid_nonce(SUCCESS))
+        self.assertFalse(invalid_nonce({'result': None}))
+        self.assertFalse(invalid_nonce({'result': {'meta': {'err': {'InstructionError': [1, 'AccountDataTooSmall']}}}}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+
+from solana.account import Account
+
+from solana_utils import PartialCallBuilder, TOKEN_PROGRAM_ID, account_meta, associated_token_address, sysinstruct, \
+    system, create_neon_evm_instr_19_partial_call, create_neon_evm_instr_20_continue, create_neon_evm_instr_22_begin
+
+
+class PartialCallBuilderTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        (cls.loader, cls.operator, cls.caller, cls.contract, cls.code, cls.storage, cls.holder, cls.pool) = \
+            [Account().public_key() for _ in range(8)]
+        cls.builder = PartialCallBuilder(cls.loader, cls.operator, cls.caller, cls.contract, cls.code, cls.storage,
+                                         (3).to_bytes(4, 'little'), cls.pool, holder_sol_acc=cls.holder,
+                                         writable_code=False)
+
+    def keys(self, instruction):
+        return [(str(meta.pubkey), meta.is_signer, meta.is_writable) for meta in instruction.keys]
+
+    def test_continue(self):
+        instruction = self.builder.continue_(500)
+        self.assertEqual(instruction.data, bytes.fromhex("14" "03000000" "f401000000000000"))
+        self.assertEqual(self.keys(instruction), [
+            (str(self.storage), False, True),
+            (str(self.operator), True, True),
+            (str(self.pool), False, True),
+            (str(associated_token_address(self.operator)), False, True),
+            (str(associated_token_address(self.caller)), False, True),
+            (system, False, False),
+            (str(self.contract), False, True),
+            (str(self.code), False, False),
+            (str(self.caller), False, True),
+            (sysinstruct, False, False),
+            (str(self.loader), False, False),
+            (str(TOKEN_PROGRAM_ID), False, False),
+        ])
+        # only the step count changes between instructions
+        self.assertIs(self.builder.continue_(1000).keys, instruction.keys)
+
+    def test_compatible(self):
+        instruction = create_neon_evm_instr_19_partial_call(self.loader, self.caller, self.operator, self.storage,
+                                                            self.contract, self.code, (3).to_bytes(4, 'little'),
+                                                            self.pool, 10, b'trx', writable_code=False)
+        self.assertEqual(instruction.data, self.builder.partial_call(10, b'trx').data)
+        self.assertEqual(self.keys(instruction), self.keys(self.builder.partial_call(10, b'trx')))
+
+        instruction = create_neon_evm_instr_22_begin(self.loader, self.caller, self.operator, self.storage,
+                                                     self.holder, self.contract, self.code,
+                                                     (3).to_bytes(4, 'little'), self.pool, 10)
+        self.assertEqual(self.keys(instruction), self.keys(self.builder.begin(10)))
+        # the holder layout always writes the code account
+        self.assertIn((str(self.code), False, True), self.keys(instruction))
+
+    def test_cancel(self):
+        builder = PartialCallBuilder(self.loader, self.operator, self.caller, self.contract, self.code, self.storage)
+        self.assertEqual(builder.cancel(2).data, bytes.fromhex("15" "0200000000000000"))
+        with self.assertRaises(Exception):
+            builder.continue_(500)
+
+    def test_account_meta(self):
+        self.assertIs(account_meta(system), account_meta(system))
+        with self.assertRaises(Exception):
+            account_meta(self.operator, is_signer=True)
+
+    def test_collateral_pool_index(self):
+        builder = PartialCallBuilder(self.loader, self.operator, self.caller, self.contract, self.code, self.storage,
+                                     3, self.pool)
+        self.assertEqual(builder.continue_(500).data, self.builder.continue_(500).data)
+        for index in (b'\x03', bytes(8)):
+            with self.assertRaises(Exception):
+                PartialCallBuilder(self.loader, self.operator, self.caller, self.contract, self.code, self.storage,
+                                   index, self.pool)
+
+    def test_cached(self):
+        def continue_(index, step_count):
+            return create_neon_evm_instr_20_continue(self.loader, self.caller, self.operator, self.storage,
+                                                     self.contract, self.code, index, self.pool, step_count)
+
+        instruction = continue_((3).to_bytes(4, 'little'), 10)
+        # the accounts of the steps of one transaction are built once
+        self.assertIs(continue_((3).to_bytes(4, 'little'), 20).keys, instruction.keys)
+        self.assertEqual(continue_((3).to_bytes(4, 'little'), 20).data, bytes.fromhex("14" "03000000" "1400000000000000"))
+        self.assertEqual(continue_((4).to_bytes(4, 'little'), 20).data, bytes.fromhex("14" "04000000" "1400000000000000"))
+
+
+if __name__ == '__main__':
+    unittest.main()
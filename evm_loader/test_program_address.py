@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from solana.publickey import PublicKey
+
+from spl.token.instructions import get_associated_token_address
+
+from program_address import ACCOUNT_SEED_VERSION, AddressCache, AssociatedTokenAddressCache, ProgramAddressCache, \
+    ether2program, find_associated_token_address, find_program_address, is_on_curve
+
+loader_id = "eeLSJgWzzxrqKv1UxtRVVH8FX3qCQWUs9QuAjJpETGU"
+
+
+class ProgramAddressTest(unittest.TestCase):
+    def test_matches_find_program_address(self):
+        for _ in range(200):
+            ether = os.urandom(20)
+            (expected, expected_nonce) = PublicKey.find_program_address([ACCOUNT_SEED_VERSION, ether], PublicKey(loader_id))
+            (address, nonce) = find_program_address([ACCOUNT_SEED_VERSION, ether], loader_id)
+            self.assertEqual(address, bytes(expected))
+            self.assertEqual(nonce, expected_nonce)
+
+    def test_curve_check(self):
+        # A real ed25519 public key is on the curve, the derived address is not
+        self.assertTrue(is_on_curve(bytes(PublicKey(loader_id))))
+        (address, _) = find_program_address([ACCOUNT_SEED_VERSION, bytes(20)], loader_id)
+        self.assertFalse(is_on_curve(address))
+
+    def test_cache(self):
+        ether = "0x" + os.urandom(20).hex()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "pda.sqlite")
+            cache = ProgramAddressCache(max_size=2, path=path)
+            result = cache.get(loader_id, ether)
+            self.assertEqual(result, ether2program(ether, loader_id))
+            self.assertEqual(cache.get(loader_id, ether[2:]), result)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            for _ in range(3):
+                cache.get(loader_id, os.urandom(20))
+            self.assertEqual(len(cache._lru), 2)
+            cache.close()
+
+            reopened = ProgramAddressCache(path=path)
+            self.assertEqual(reopened._load((bytes(PublicKey(loader_id)), bytes.fromhex(ether[2:]))), result)
+            reopened.close()
+
+    def test_derive_is_abstract(self):
+        with self.assertRaises(TypeError):
+            AddressCache()
+
+    def test_associated_token_address(self):
+        mint = "HPsV9Deocecw3GeZv1FkAPNCBRfuVyfw9MMwjwRe1xaU"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "pda.sqlite")
+            cache = AssociatedTokenAddressCache(path=path)
+            for _ in range(20):
+                owner = PublicKey(os.urandom(32))
+                expected = get_associated_token_address(owner, PublicKey(mint))
+                self.assertEqual(find_associated_token_address(owner, mint)[0], bytes(expected))
+                self.assertEqual(cache.get(owner, mint)[0], str(expected))
+                self.assertEqual(cache.get(str(owner), PublicKey(mint))[0], str(expected))
+            self.assertEqual((cache.hits, cache.misses), (20, 20))
+            cache.close()
+
+            # the same file holds both tables
+            pda = ProgramAddressCache(path=path)
+            self.assertIsNotNone(pda.get(loader_id, bytes(20)))
+            pda.close()
+            reopened = AssociatedTokenAddressCache(path=path)
+            self.assertEqual(reopened._load((bytes(owner), bytes(PublicKey(mint))))[0], str(expected))
+            reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
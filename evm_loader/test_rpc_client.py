@@ -0,0 +1,177 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from solana.account import Account
+from solana.system_program import TransferParams, transfer
+from solana.transaction import Transaction
+
+from rpc_client import AsyncRpcClient, RpcClient
+
+BLOCKHASH = "EETubP5AKHgjPAhzPAFcb8BAY1hMH639CWCFTqi3hq1k"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if isinstance(request, list):
+            server.batches.append(len(request))
+            result = [{'jsonrpc': '2.0', 'result': self.result(item), 'id': item['id']} for item in reversed(request)]
+            return self.reply(result)
+        with server.lock:
+            server.methods.append(request['method'])
+            server.connections.add(self.client_address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if request['method'] == 'slow':
+                time.sleep(1)
+            else:
+                time.sleep(0.01)
+            response = {'jsonrpc': '2.0', 'result': self.result(request), 'id': request['id']}
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+        self.reply(response)
+
+    def result(self, request):
+        if request['method'] == 'getBalance':
+            return {'context': {'slot': 1}, 'value': len(request['params'][0])}
+        if request['method'] == 'getMultipleAccounts':
+            # accounts with an odd key length do not exist
+            value = [{'lamports': len(key), 'data': ['', 'base64']} if len(key) % 2 == 0 else None
+                     for key in request['params'][0]]
+            return {'context': {'slot': 1}, 'value': value}
+        if request['method'] == 'getFees':
+            return {'context': {'slot': 1}, 'value': {'blockhash': BLOCKHASH, 'lastValidSlot': 151,
+                                                      'feeCalculator': {'lamportsPerSignature': 5000}}}
+        if request['method'] == 'sendTransaction':
+            return 'sig'
+        if request['method'] == 'getSignatureStatuses' and request['params'][0][0].startswith('tx'):
+            # "tx-pending" never confirms
+            return {'context': {'slot': 1}, 'value': [
+                None if sig == 'tx-pending' else {'confirmationStatus': 'confirmed', 'confirmations': 1}
+                for sig in request['params'][0]]}
+        return request['params']
+
+    def reply(self, response):
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RpcClientTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls.server.daemon_threads = True
+        cls.server.lock = threading.Lock()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = 'http://127.0.0.1:{}'.format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.connections = set()
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.batches = []
+        self.server.methods = []
+
+    def test_pool_and_concurrency(self):
+        async def run():
+            async with AsyncRpcClient(self.url, max_connections=8, max_concurrency=8) as rpc:
+                return await asyncio.gather(*[rpc.call('echo', i) for i in range(200)])
+
+        result = asyncio.run(run())
+        self.assertEqual([resp['result'] for resp in result], [[i] for i in range(200)])
+        self.assertLessEqual(self.server.max_in_flight, 8)
+        self.assertGreater(self.server.max_in_flight, 1)
+        # connections are kept alive and reused
+        self.assertLessEqual(len(self.server.connections), 8)
+
+    def test_method_timeout(self):
+        async def run():
+            async with AsyncRpcClient(self.url, timeouts={'slow': 0.1}) as rpc:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await rpc.call('slow')
+                self.assertEqual((await rpc.call('slow', timeout=5))['result'], [])
+
+        asyncio.run(run())
+
+    def test_batch(self):
+        async def run():
+            async with AsyncRpcClient(self.url) as rpc:
+                result = await rpc.batch([('echo', [i]) for i in range(45)])
+                self.assertEqual([resp['result'] for resp in result], [[i] for i in range(45)])
+                self.assertEqual(sorted(self.server.batches), [5, 20, 20])
+
+                self.server.batches = []
+                keys = ['k' * (i % 7 + 1) for i in range(250)]
+                value = await rpc.get_multiple_accounts(keys, data_slice=(0, 0))
+                self.assertEqual(len(value), 250)
+                self.assertEqual([info['lamports'] if info else None for info in value],
+                                 [len(key) if len(key) % 2 == 0 else None for key in keys])
+                # three getMultipleAccounts calls (100 + 100 + 50 keys) in one batch
+                self.assertEqual(self.server.batches, [3])
+
+        asyncio.run(run())
+
+    def test_sync_wrapper(self):
+        with RpcClient(self.url) as client:
+            self.assertEqual(client.get_balance('abc')['result']['value'], 3)
+            self.assertEqual(client.get_signature_statuses(['sig'])['result'],
+                             [['sig'], {'searchTransactionHistory': False}])
+            result = client.gather([client.rpc.get_balance('a' * i) for i in range(50)])
+            self.assertEqual([resp['result']['value'] for resp in result], list(range(50)))
+            future = client.submit(client.rpc.call('echo', 1))
+            self.assertEqual(future.result()['result'], [1])
+            with self.assertRaises(AttributeError):
+                client.url
+
+    def test_confirm_transaction(self):
+        async def run():
+            async with AsyncRpcClient(self.url, confirm_interval=0.05) as rpc:
+                statuses = await asyncio.gather(*[rpc.confirm_transaction("tx{}".format(i)) for i in range(300)])
+                self.assertEqual(len(statuses), 300)
+                # 256 + 44 signatures in one poll
+                self.assertEqual(self.server.methods.count('getSignatureStatuses'), 2)
+                with self.assertRaises(RuntimeError):
+                    await asyncio.gather(rpc.confirm_transaction("tx-ok"),
+                                         rpc.confirm_transaction("tx-pending", timeout=0.2))
+                self.assertEqual(rpc._confirming, {})
+
+        asyncio.run(run())
+
+    def test_send_transaction(self):
+        with RpcClient(self.url) as client:
+            sender = Account()
+            for _ in range(3):
+                trx = Transaction().add(transfer(TransferParams(from_pubkey=sender.public_key(),
+                                                                to_pubkey=Account().public_key(), lamports=1)))
+                self.assertEqual(client.send_transaction(trx, sender)['result'], 'sig')
+                self.assertEqual(str(trx.recent_blockhash), BLOCKHASH)
+            # the blockhash comes from the provider, not from a request per transaction
+            self.assertEqual(self.server.methods.count('sendTransaction'), 3)
+            self.assertNotIn('getRecentBlockhash', self.server.methods)
+            self.assertLessEqual(self.server.methods.count('getFees'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
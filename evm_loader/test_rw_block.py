@@ -8,6 +8,7 @@ from spl.token.constants import TOKEN_PROGRAM_ID, ASSOCIATED_TOKEN_PROGRAM_ID, A
 from spl.token.instructions import get_associated_token_address
 from eth_tx_utils import make_keccak_instruction_data, make_instruction_data_from_tx
 from eth_utils import abi
+from emulator import EmulatorService
 
 solana_url = os.environ.get("SOLANA_URL", "http://localhost:8899")
 client = Client(solana_url)
@@ -16,13 +17,15 @@ evm_loader_id = os.environ.get("EVM_LOADER")
 ETH_TOKEN_MINT_ID: PublicKey = PublicKey(os.environ.get("ETH_TOKEN_MINT"))
 
 
+# the tests change the state between emulations, nothing is cached
+emulator = EmulatorService(evm_loader_id, url=solana_url, cache_size=0, slot_interval=None)
+
+
 def emulate(caller, contract, data, value):
-    cmd = "{} {} {} {}".format(caller, contract, data, value)
-    output = neon_cli().emulate(evm_loader_id, cmd)
-    result = json.loads(output)
-    if result["exit_status"] != "succeed":
-        raise Exception("evm emulator error ", result)
-    return result
+    result = emulator.emulate(caller, contract, data, value)
+    if not result.succeed:
+        raise Exception("evm emulator error ", result.raw)
+    return result.raw
 
 def create_account_with_seed(client, funding, base, seed, storage_size):
     account = accountWithSeed(base.public_key(), seed, PublicKey(evm_loader_id))
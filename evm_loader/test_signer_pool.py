@@ -0,0 +1,118 @@
+import unittest
+
+from solana.account import Account
+
+from signer_pool import FEE, SignerPool, rate_limited_error
+import test_helpers
+
+
+class FakeRpcClient(test_helpers.FakeRpcClient):
+    def __init__(self, balances):
+        super().__init__()
+        self.balances = balances
+        self.landed = set()
+        self.multiple_accounts = 0
+
+    def get_multiple_accounts(self, pubkeys, commitment=None, data_slice=None):
+        self.multiple_accounts += 1
+        return [{'lamports': self.balances[str(key)]} if str(key) in self.balances else None for key in pubkeys]
+
+    def confirmed(self, signature):
+        return signature in self.landed
+
+
+class FakeBlockhashProvider(test_helpers.FakeBlockhashProvider):
+    def __init__(self, rpc):
+        self.rpc = rpc
+        self.transactions = []
+
+    def send_transaction(self, trx, *signers, opts=None):
+        self.transactions.append(trx)
+        for instruction in trx.instructions:
+            key = str(instruction.keys[1].pubkey)
+            self.rpc.balances[key] = self.rpc.balances.get(key, 0) + int.from_bytes(instruction.data[4:12], 'little')
+        signature = 'topup{}'.format(len(self.transactions))
+        self.rpc.landed.add(signature)
+        return {'result': signature}
+
+
+class SignerPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.signers = [Account() for _ in range(3)]
+        self.rpc = FakeRpcClient({str(signer.public_key()): 10 ** 6 for signer in self.signers})
+
+    def pool(self, **kwargs):
+        pool = SignerPool(self.signers, self.rpc, **kwargs)
+        self.addCleanup(pool.stop)
+        return pool
+
+    def test_least_loaded(self):
+        pool = self.pool(refresh_interval=1000)
+        picked = []
+        for i in range(6):
+            signer = pool.next_acc()
+            picked.append(signer)
+            pool.sent(signer, 'sig{}'.format(i))
+        # every signer gets the same load
+        self.assertEqual(sorted(picked.count(signer) for signer in self.signers), [2, 2, 2])
+        self.assertEqual(self.rpc.multiple_accounts, 1)
+
+        # a signer whose transactions are confirmed is preferred
+        self.rpc.landed.update({'sig0', 'sig3'})
+        pool.refresh()
+        self.assertEqual(pool.counters()['in_flight'], 4)
+        self.assertIs(pool.next_acc(), picked[0])
+
+    def test_rate_limited_and_in_flight_limit(self):
+        pool = self.pool(max_in_flight=1, refresh_interval=1000)
+        pool.rate_limited(self.signers[0], seconds=60)
+        for i in range(2):
+            signer = pool.next_acc()
+            self.assertIsNot(signer, self.signers[0])
+            pool.sent(signer, 'sig{}'.format(i))
+        with self.assertRaises(Exception):
+            pool.next_acc(timeout=0)
+        # the background refresh finds sig1 confirmed, the waiting next_acc gets its signer
+        refreshes = pool.refreshes
+        self.rpc.landed.add('sig1')
+        self.assertIsNotNone(pool.next_acc(timeout=5))
+        self.assertGreater(pool.refreshes, refreshes)
+
+    def test_rate_limited_error(self):
+        class HTTPError(Exception):
+            def __init__(self, status):
+                self.response = type('Response', (), {'status_code': status})()
+
+        self.assertTrue(rate_limited_error(HTTPError(429)))
+        self.assertFalse(rate_limited_error(HTTPError(500)))
+        self.assertFalse(rate_limited_error(Exception("blockhash 429abc not found")))
+        self.assertTrue(rate_limited_error({'error': {'code': 429, 'message': 'Too many requests'}}))
+        self.assertFalse(rate_limited_error({'error': {'code': -32002, 'message': '429'}}))
+
+    def test_park_and_top_up(self):
+        poor = self.signers[1]
+        self.rpc.balances[str(poor.public_key())] = 3 * FEE
+        pool = self.pool(min_balance=2 * FEE, refresh_interval=1000)
+        pool.refresh()
+        self.assertEqual(pool.counters()['parked'], 0)
+        # the fees of sent transactions are charged before the next refresh
+        pool.sent(poor, 'sig0')
+        pool.sent(poor, 'sig1')
+        self.assertEqual(pool.counters()['parked'], 1)
+        for _ in range(10):
+            self.assertIsNot(pool.next_acc(), poor)
+
+        funder = Account()
+        provider = FakeBlockhashProvider(self.rpc)
+        pool = self.pool(min_balance=10 ** 7, funder=funder, top_up=10 ** 7, blockhash_provider=provider,
+                         refresh_interval=1000)
+        pool.refresh()
+        # all three in one transfer transaction
+        self.assertEqual(len(provider.transactions), 1)
+        self.assertEqual(len(provider.transactions[0].instructions), 3)
+        self.assertEqual(pool.counters()['parked'], 0)
+        self.assertEqual(pool.top_ups, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
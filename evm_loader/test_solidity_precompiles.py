@@ -5,15 +5,19 @@ from spl.token.constants import TOKEN_PROGRAM_ID, ACCOUNT_LEN
 import unittest
 from eth_utils import abi
 from base58 import b58decode
-import re
 
 from eth_tx_utils import make_keccak_instruction_data, make_instruction_data_from_tx, JsonEncoder
 from solana_utils import *
+from step_tuner import StepProfiles, StepTuner, profile_key
+from holder_writer import HolderWriter, holder_message
+from cu_profiler import Profiler
 
 CONTRACTS_DIR = os.environ.get("CONTRACTS_DIR", "evm_loader/")
 evm_loader_id = os.environ.get("EVM_LOADER")
 ETH_TOKEN_MINT_ID: PublicKey = PublicKey(os.environ.get("ETH_TOKEN_MINT"))
 holder_id = 0
+# profiles are only written when STEP_PROFILES names a file, not into the working directory
+step_profiles = StepProfiles(os.environ.get("STEP_PROFILES", ""))
 
 class PrecompilesTests(unittest.TestCase):
     @classmethod
@@ -55,6 +59,15 @@ class PrecompilesTests(unittest.TestCase):
 
         with open(CONTRACTS_DIR+"precompiles_testdata.json") as json_data:
             cls.test_data = json.load(json_data)
+        cls.profiler = Profiler(evm_loader_id)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.profiler.report()
+        # CU_PROFILE=path writes path.json and path.csv, to compare evm_loader builds
+        if os.environ.get("CU_PROFILE"):
+            cls.profiler.write_json(os.environ["CU_PROFILE"] + ".json")
+            cls.profiler.write_csv(os.environ["CU_PROFILE"] + ".csv")
 
     def send_transaction(self, data):
         if len(data) > 512:
@@ -63,65 +76,13 @@ class PrecompilesTests(unittest.TestCase):
         else:
             trx = self.make_transactions(data)
             result = send_transaction(client, trx, self.acc)
-            self.get_measurements(result)
+            self.get_measurements(result, data)
             result = result["result"]
             return b58decode(result['meta']['innerInstructions'][0]['instructions'][-1]['data'])[8+2:].hex()
 
-    def extract_measurements_from_receipt(self, receipt):
-        log_messages = receipt['result']['meta']['logMessages']
-        transaction = receipt['result']['transaction']
-        accounts = transaction['message']['accountKeys']
-        instructions = []
-        for instr in transaction['message']['instructions']:
-            program = accounts[instr['programIdIndex']]
-            instructions.append({
-                'accs': [accounts[acc] for acc in instr['accounts']],
-                'program': accounts[instr['programIdIndex']],
-                'data': b58decode(instr['data']).hex()
-            })
-
-        pattern = re.compile('Program ([0-9A-Za-z]+) (.*)')
-        messages = []
-        for log in log_messages:
-            res = pattern.match(log)
-            if res:
-                (program, reason) = res.groups()
-                if reason == 'invoke [1]': messages.append({'program':program,'logs':[]})
-            messages[-1]['logs'].append(log)
-
-        for instr in instructions:
-            if instr['program'] in ('KeccakSecp256k11111111111111111111111111111',): continue
-            if messages[0]['program'] != instr['program']:
-                raise Exception('Invalid program in log messages: expect %s, actual %s' % (messages[0]['program'], instr['program']))
-            instr['logs'] = messages.pop(0)['logs']
-            exit_result = re.match(r'Program %s (success)'%instr['program'], instr['logs'][-1])
-            if not exit_result: raise Exception("Can't get exit result")
-            instr['result'] = exit_result.group(1)
-
-            if instr['program'] == evm_loader_id:
-                memory_result = re.match(r'Program log: Total memory occupied: ([0-9]+)', instr['logs'][-3])
-                instruction_result = re.match(r'Program %s consumed ([0-9]+) of ([0-9]+) compute units'%instr['program'], instr['logs'][-2])
-                if not (memory_result and instruction_result):
-                    raise Exception("Can't parse measurements for evm_loader")
-                instr['measurements'] = {
-                        'instructions': instruction_result.group(1),
-                        'memory': memory_result.group(1)
-                    }
-
-        result = []
-        for instr in instructions:
-            if instr['program'] == evm_loader_id:
-                result.append({
-                        'program':instr['program'],
-                        'measurements':instr['measurements'],
-                        'result':instr['result'],
-                        'data':instr['data']
-                    })
-        return result
-
-    def get_measurements(self, result):
-        measurements = self.extract_measurements_from_receipt(result)
-        for m in measurements: print(json.dumps(m))
+    def get_measurements(self, result, call_data, transaction=None):
+        measurements = self.profiler.add(result, profile_key(self.eth_contract, call_data), transaction)
+        for m in measurements: print(json.dumps(m._asdict()))
 
     def make_transactions(self, call_data):
         eth_tx = {
@@ -207,26 +168,8 @@ class PrecompilesTests(unittest.TestCase):
         return storage
 
     def write_transaction_to_holder_account(self, holder, signature, message):
-        message = signature + len(message).to_bytes(8, byteorder="little") + message
-
-        offset = 0
-        receipts = []
-        rest = message
-        while len(rest):
-            (part, rest) = (rest[:1000], rest[1000:])
-            trx = Transaction()
-            trx.add(TransactionInstruction(program_id=evm_loader_id,
-                data=(bytes.fromhex('12') + holder_id.to_bytes(8, byteorder="little") + offset.to_bytes(4, byteorder="little") + len(part).to_bytes(8, byteorder="little") + part),
-                keys=[
-                    AccountMeta(pubkey=holder, is_signer=False, is_writable=True),
-                    AccountMeta(pubkey=self.acc.public_key(), is_signer=True, is_writable=False),
-                ]))
-            receipts.append(client.send_transaction(trx, self.acc, opts=TxOpts(skip_confirmation=True, preflight_commitment="confirmed"))["result"])
-            offset += len(part)
-
-        for rcpt in receipts:
-            confirm_transaction(client, rcpt)
-
+        writer = HolderWriter(get_bulk_rpc(), blockhash_provider, evm_loader_id, self.acc, holder, holder_id)
+        writer.write(holder_message(signature, message))
 
     def call_with_holder_account(self, input):
         tx = {'to': self.eth_contract, 'value': 0, 'gas': 999999999, 'gasPrice': 1_000_000_000,
@@ -246,18 +189,22 @@ class PrecompilesTests(unittest.TestCase):
         trx.add(self.sol_instr_22_partial_call_from_account(holder, storage, 0))
         send_transaction(client, trx, self.acc)
 
+        tuner = StepTuner(step_profiles, profile_key(self.eth_contract, input), initial_steps=400)
         while (True):
             print("Continue")
+            steps = tuner.next_steps()
             trx = Transaction()
-            trx.add(self.sol_instr_20_continue(storage, 400))
+            trx.add(self.sol_instr_20_continue(storage, steps))
             result = send_transaction(client, trx, self.acc)
 
-            self.get_measurements(result)
+            tuner.observe_receipt(steps, result, evm_loader_id)
+            self.get_measurements(result, input, transaction=sign[:8].hex())
             result = result["result"]
 
             if (result['meta']['innerInstructions'] and result['meta']['innerInstructions'][0]['instructions']):
                 data = b58decode(result['meta']['innerInstructions'][0]['instructions'][-1]['data'])
                 if (data[0] == 6):
+                    tuner.save()
                     return result
 
     def make_ecrecover(self, data):
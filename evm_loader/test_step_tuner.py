@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+from base58 import b58encode
+
+from step_tuner import StepProfiles, StepTuner, budget_exceeded, consumed_units, profile_key
+from test_helpers import KECCAK, LOADER, TOKEN
+
+OVERHEAD = 20000
+UNITS_PER_STEP = 150
+
+
+def receipt(consumed, returned=False):
+    logs = ["Program {} invoke [1]".format(KECCAK), "Program {} success".format(KECCAK)]
+    for units in consumed:
+        logs += [
+            "Program {} invoke [1]".format(LOADER),
+            "Program {} invoke [2]".format(TOKEN),
+            "Program {} consumed 2000 of 180000 compute units".format(TOKEN),
+            "Program {} success".format(TOKEN),
+            "Program log: Total memory occupied: 1024",
+            "Program {} consumed {} of 200000 compute units".format(LOADER, units),
+            "Program {} success".format(LOADER),
+        ]
+    inner = [{'index': 1, 'instructions': [{'data': b58encode(bytes([6, 0x12])).decode()}]}] if returned else []
+    return {'result': {'meta': {'err': None, 'logMessages': logs, 'innerInstructions': inner}}}
+
+
+def exceeded():
+    return {'error': {'code': -32002, 'message': 'Transaction simulation failed', 'data': {'logs': [
+        "Program {} invoke [1]".format(LOADER),
+        "Program {} consumed 200000 of 200000 compute units".format(LOADER),
+        "Program failed to complete: exceeded maximum number of instructions allowed (200000) at instruction #1234",
+    ]}}}
+
+
+class StepTunerTest(unittest.TestCase):
+    def test_consumed_units(self):
+        self.assertEqual(consumed_units(receipt([1000, 2000]), LOADER), [(1000, 200000), (2000, 200000)])
+        self.assertEqual(consumed_units(receipt([1000]), TOKEN), [])
+        # the system program pays the operator from within the loader and logs no compute units
+        system = "11111111111111111111111111111111"
+        logs = ["Program {} invoke [1]".format(LOADER),
+                "Program {} invoke [2]".format(system),
+                "Program {} success".format(system),
+                "Program {} consumed 50000 of 200000 compute units".format(LOADER),
+                "Program {} success".format(LOADER)]
+        self.assertEqual(consumed_units({'result': {'meta': {'logMessages': logs}}}, LOADER), [(50000, 200000)])
+        self.assertTrue(budget_exceeded(exceeded()))
+        self.assertFalse(budget_exceeded(receipt([1000])))
+
+    def test_converges_to_target(self):
+        tuner = StepTuner(target=0.8, initial_steps=10)
+        for _ in range(30):
+            steps = tuner.next_steps()
+            tuner.observe(steps, OVERHEAD + UNITS_PER_STEP * steps, 200000)
+        steps = tuner.next_steps()
+        self.assertLessEqual(OVERHEAD + UNITS_PER_STEP * steps, 200000 * 0.8)
+        self.assertGreater(OVERHEAD + UNITS_PER_STEP * steps, 200000 * 0.75)
+
+    def test_exceeded(self):
+        tuner = StepTuner(initial_steps=2000)
+        tuner.exceeded(2000)
+        self.assertLessEqual(tuner.next_steps(), 1000)
+
+    def test_profiles(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'profiles.json')
+            key = profile_key(bytes(20), bytes.fromhex('a9059cbb') + bytes(64))
+            tuner = StepTuner(StepProfiles(path), key)
+            tuner.observe(100, 60000, 200000)
+            tuner.save()
+
+            tuner = StepTuner(StepProfiles(path), key)
+            self.assertEqual(tuner.units_per_step, 600)
+            self.assertEqual(tuner.next_steps(), 266)
+            self.assertEqual(StepProfiles(path).profiles[key]['samples'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
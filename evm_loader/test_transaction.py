@@ -3,6 +3,7 @@ import unittest
 import solana
 from base58 import b58decode
 from enum import IntEnum
+from spl.token.instructions import get_associated_token_address
 from solana_utils import *
 
 CONTRACTS_DIR = os.environ.get("CONTRACTS_DIR", "evm_loader/")
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from solana.publickey import PublicKey
+
+from trx_store import HEADER, KEY_SIZE, RECORD, JsonTrxWriter, TrxReader, TrxRecord, TrxWriter, read_json_records
+
+
+def make_records(count, contracts=3):
+    keys = [str(PublicKey(os.urandom(32))) for _ in range(contracts * 2 + 5)]
+    records = []
+    for i in range(count):
+        records.append(TrxRecord(os.urandom(20), os.urandom(65), os.urandom(100 + i % 7),
+                                 keys[i % contracts], os.urandom(20), keys[contracts + i % contracts] if i % 2 else "",
+                                 keys[2 * contracts + i % 5], os.urandom(20), os.urandom(20)))
+    return (records, keys)
+
+
+class TrxStoreTest(unittest.TestCase):
+    def test_roundtrip(self):
+        (records, keys) = make_records(50)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "transaction.bin")
+            with TrxWriter(path) as writer:
+                for record in records:
+                    writer.write(record)
+
+            # every key is stored once
+            self.assertEqual(os.path.getsize(path), HEADER.size + sum(RECORD.size + len(record.msg) for record in records)
+                             + len(keys) * KEY_SIZE)
+            with TrxReader(path) as reader:
+                self.assertEqual(len(reader), 50)
+                read = list(reader)
+                self.assertEqual(read, records)
+                self.assertIsInstance(read[0].msg, memoryview)
+                self.assertEqual(b'\x05' + read[1].from_addr + read[1].sign + read[1].msg,
+                                 b'\x05' + records[1].from_addr + records[1].sign + records[1].msg)
+                self.assertEqual(read[0].erc20_code, "")
+                del read
+
+            json_path = os.path.join(tmp, "transaction.json")
+            with JsonTrxWriter(json_path) as writer:
+                for record in records:
+                    writer.write(record)
+            self.assertEqual(list(read_json_records(json_path)), records)
+            self.assertLess(os.path.getsize(path) * 2, os.path.getsize(json_path))
+
+    def test_unfinished(self):
+        (records, _) = make_records(3)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "transaction.bin")
+            writer = TrxWriter(path)
+            writer.write(records[0])
+            writer._file.flush()
+            with self.assertRaises(Exception):
+                TrxReader(path)
+            writer.close()
+            with TrxReader(path) as reader:
+                self.assertEqual([bytes(record.sign) for record in reader], [records[0].sign])
+
+            with open(path, 'r+b') as f:
+                f.write(b"NEONTRX\1")
+            with self.assertRaises(Exception):
+                TrxReader(path)
+
+            # a failed create_trx leaves nothing that looks finished
+            with self.assertRaises(ValueError):
+                with TrxWriter(path) as writer:
+                    writer.write(records[1])
+                    raise ValueError("signing failed")
+            self.assertFalse(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from base58 import b58encode
+
+from evm_events import REVERTED, decode_transaction
+from verifier import EVENT, MISSING, NONCE, REVERT, SUCCESS, TOO_SMALL, UNKNOWN, Verifier, classify
+from test_helpers import LOADER, FakeRpcClient
+
+
+def receipt(status=0x12, err=None, events=0):
+    inner = [bytes([7]) + bytes(20) + bytes(8) for _ in range(events)] + [bytes([6, status]) + bytes(8)]
+    return {'result': {'slot': 7, 'meta': {'err': err, 'innerInstructions': [
+        {'index': 0, 'instructions': [{'programIdIndex': 0, 'data': b58encode(data).decode()} for data in inner]}]},
+        'transaction': {'signatures': [], 'message': {'accountKeys': [LOADER], 'instructions': [
+            {'programIdIndex': 0, 'data': ''}]}}}}
+
+
+class FakeNode:
+    """Receipts by signature; a receipt shows up after `delays[signature]` requests."""
+
+    def __init__(self, receipts, delays=None):
+        self.receipts = receipts
+        self.delays = dict(delays or {})
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_confirmed_transaction(self, signature):
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        if self.delays.get(signature, 0) > 0:
+            self.delays[signature] -= 1
+            return {'result': None}
+        return {'result': self.receipts[signature]['result']} if signature in self.receipts else {'result': None}
+
+
+def check(record, decoded):
+    return len(decoded.events) == record[0]
+
+
+class VerifierTest(unittest.TestCase):
+    def test_classify(self):
+        self.assertEqual(classify(None), MISSING)
+        self.assertEqual(classify(decode_transaction(receipt())), SUCCESS)
+        self.assertEqual(classify(decode_transaction(receipt(REVERTED))), REVERT)
+        self.assertEqual(classify(decode_transaction(receipt(REVERTED, events=1))), SUCCESS)
+        self.assertEqual(classify(decode_transaction(receipt(events=1)), lambda decoded: False), EVENT)
+        nonce = receipt(err={'InstructionError': [1, 'InvalidArgument']})
+        self.assertEqual(classify(decode_transaction(nonce)), NONCE)
+        too_small = receipt(err={'InstructionError': [1, 'AccountDataTooSmall']})
+        self.assertEqual(classify(decode_transaction(too_small)), TOO_SMALL)
+        self.assertEqual(classify(decode_transaction(receipt(err='AccountInUse'))), UNKNOWN)
+
+    def test_run(self):
+        receipts = {"sig{}".format(i): receipt(events=1) for i in range(20)}
+        receipts["sig3"] = receipt(REVERTED)
+        receipts["sig4"] = receipt(err={'InstructionError': [1, 'InvalidArgument']})
+        del receipts["sig5"]
+        node = FakeNode(receipts, delays={"sig6": 2})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "verify.json")
+            with open(path, 'w') as f:
+                for i in range(20):
+                    # sig7 expects two events
+                    f.write(json.dumps([2 if i == 7 else 1, "sig{}".format(i)]) + "\n")
+            (results, checkpoint) = (os.path.join(tmp, "results.txt"), os.path.join(tmp, "checkpoint.json"))
+
+            verifier = Verifier(FakeRpcClient(node), check, concurrency=4, retries=2, retry_delay=0.001, window=8)
+            summary = verifier.run(path, results, checkpoint, count=10)
+            self.assertEqual((summary['total'], summary[SUCCESS], summary[REVERT], summary[NONCE], summary[MISSING],
+                              summary[EVENT]), (10, 6, 1, 1, 1, 1))
+            self.assertLessEqual(node.max_in_flight, 4)
+            # sig6 showed up on the third request, sig5 never did
+            self.assertEqual(summary['retried'], 4)
+
+            # a window verified after the last checkpoint is verified again
+            with open(results, 'a') as f:
+                f.write("sig10 success 7\n")
+            verifier = Verifier(FakeRpcClient(node), check, concurrency=4, retry_delay=0.001, retries=0)
+            summary = verifier.run(path, results, checkpoint, resume=True)
+            self.assertEqual((summary['total'], summary[SUCCESS], summary[EVENT]), (20, 16, 1))
+            with open(results) as f:
+                lines = [line.split() for line in f]
+            self.assertEqual([line[0] for line in lines], ["sig{}".format(i) for i in range(20)])
+            self.assertEqual(lines[7], ["sig7", EVENT, "7"])
+            self.assertEqual(lines[5], ["sig5", MISSING, "None"])
+
+            verifier.write_summary(results + ".summary.json")
+            verifier.report()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from emulator import EmulationResult
+from wave_scheduler import WaveItem, WaveScheduler, account_sets_from_emulation, file_order_conflicts, \
+    partition_waves
+
+
+def item(name, writable, readonly=()):
+    return WaveItem(name, frozenset(writable), frozenset(readonly))
+
+
+def names(waves):
+    return [[item.tx for item in wave] for wave in waves]
+
+
+class WaveSchedulerTest(unittest.TestCase):
+    def test_partition(self):
+        items = [
+            item('t1', {'token_a', 'alice'}),
+            item('t2', {'token_b', 'bob'}),
+            # the same contract as t1
+            item('t3', {'token_a', 'carol'}),
+            item('t4', {'token_c', 'dave'}),
+            # the second transaction of alice stays after her first one
+            item('t5', {'token_b', 'alice'}),
+            # reads what t4 writes
+            item('r1', {'erin'}, {'token_c'}),
+            item('r2', {'frank'}, {'token_c'}),
+            # writes what r1 and r2 read
+            item('t6', {'token_c', 'gina'}),
+        ]
+        waves = partition_waves(items)
+        self.assertEqual(names(waves), [['t1', 't2', 't4'], ['t3', 't5', 'r1', 'r2'], ['t6']])
+        for wave in waves:
+            for (i, a) in enumerate(wave):
+                for b in wave[i + 1:]:
+                    self.assertFalse(a.writable & (b.writable | b.readonly) or b.writable & a.readonly)
+
+        self.assertEqual(names(partition_waves(items, max_width=2)),
+                         [['t1', 't2'], ['t3', 't4'], ['t5', 'r1'], ['r2'], ['t6']])
+
+    def test_file_order_conflicts(self):
+        hot = [item('t{}'.format(i), {'token_a', 'user{}'.format(i)}) for i in range(6)]
+        self.assertEqual(file_order_conflicts(hot, 3), 4)
+        self.assertEqual(file_order_conflicts(hot, 1), 0)
+
+    def test_run(self):
+        items = [item(i, {'token{}'.format(i % 2), 'user{}'.format(i)}) for i in range(10)]
+        dispatched = []
+
+        def dispatch(txs):
+            dispatched.append(txs)
+            return ['sig{}'.format(tx) for tx in txs]
+
+        scheduler = WaveScheduler(dispatch, batch=4)
+        results = list(scheduler.run(iter(items)))
+        self.assertEqual([result for (_, result) in results][:4], ['sig0', 'sig1', 'sig2', 'sig3'])
+        self.assertEqual(sorted(result for (_, result) in results), sorted('sig{}'.format(i) for i in range(10)))
+        # two hot contracts: two transactions per wave
+        self.assertEqual(scheduler.stats.widths, [2, 2, 2, 2, 2])
+        self.assertEqual(scheduler.stats.conflicts_avoided, 0)
+        self.assertEqual(len(dispatched), 5)
+        scheduler.stats.report()
+
+    def test_emulation_sets(self):
+        result = EmulationResult.from_json({
+            'exit_status': 'succeed',
+            'accounts': [
+                {'address': '0x01', 'account': 'caller', 'contract': None, 'writable': True},
+                {'address': '0x02', 'account': 'token', 'contract': 'token_code', 'writable': True},
+                {'address': '0x03', 'account': 'oracle', 'contract': 'oracle_code', 'writable': False},
+            ],
+            'solana_accounts': [{'pubkey': 'spl', 'is_signer': False, 'is_writable': False}],
+        })
+        (writable, readonly) = account_sets_from_emulation(result)
+        self.assertEqual(writable, {'caller', 'token', 'token_code'})
+        self.assertEqual(readonly, {'oracle', 'oracle_code', 'spl'})
+
+
+if __name__ == '__main__':
+    unittest.main()
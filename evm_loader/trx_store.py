@@ -0,0 +1,192 @@
+"""Binary store of pre-signed Ethereum transactions for the transfer benchmarks.
+
+create_transactions wrote transaction.json with every field hex encoded and every
+Solana account repeated as a base58 string, and send_transactions parsed JSON and hex
+per record. A store file is:
+
+    header   HEADER: magic, version, size of the fixed record part, key count,
+             record count, offset of the key dictionary
+    records  RECORD: from_addr[20], sign[65], erc20_eth[20], payer_eth[20],
+             receiver_eth[20], erc20_sol, erc20_code, payer_sol (u32 indexes into
+             the dictionary, NO_KEY for none), msg length (u32); then msg
+    keys     32 bytes per Solana account key
+
+TrxWriter writes the header last, so a file that was not closed is rejected, and
+removes the file if the `with` block fails.
+TrxReader maps the file and yields TrxRecords whose byte fields are memoryview slices
+of the mapping, so nothing is parsed or copied but the four integers of a record.
+JsonTrxWriter and read_json_records keep transaction.json for the Rust sender.
+"""
+import json
+import mmap
+import os
+import struct
+from typing import NamedTuple
+
+import base58
+
+MAGIC = b"NEONTRX\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIQQ")
+RECORD = struct.Struct("<20s65s20s20s20sIIII")
+KEYS_AND_LENGTH = struct.Struct("<IIII")
+KEY_SIZE = 32
+NO_KEY = 0xFFFFFFFF
+
+
+class TrxRecord(NamedTuple):
+    # bytes-like: bytes, or memoryview when read from a store file
+    from_addr: bytes
+    sign: bytes
+    msg: bytes
+    # base58, erc20_code is "" without code account
+    erc20_sol: str
+    erc20_eth: bytes
+    erc20_code: str
+    payer_sol: str
+    payer_eth: bytes
+    receiver_eth: bytes
+
+    @classmethod
+    def from_json(cls, rec):
+        return cls(bytes.fromhex(rec['from_addr']), bytes.fromhex(rec['sign']), bytes.fromhex(rec['msg']),
+                   rec['erc20_sol'], bytes.fromhex(rec['erc20_eth']), rec['erc20_code'], rec['payer_sol'],
+                   bytes.fromhex(rec['payer_eth']), bytes.fromhex(rec['receiver_eth']))
+
+    def to_json(self):
+        return {'from_addr': self.from_addr.hex(), 'sign': self.sign.hex(), 'msg': self.msg.hex(),
+                'erc20_sol': self.erc20_sol, 'erc20_eth': self.erc20_eth.hex(), 'erc20_code': self.erc20_code,
+                'payer_sol': self.payer_sol, 'payer_eth': self.payer_eth.hex(), 'receiver_eth': self.receiver_eth.hex()}
+
+
+class TrxWriter:
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self._keys = {}
+        self._file = open(path, 'wb')
+        self._file.write(bytes(HEADER.size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _key(self, key):
+        if not key:
+            return NO_KEY
+        key = str(key)
+        index = self._keys.get(key)
+        if index is None:
+            index = self._keys[key] = len(self._keys)
+        return index
+
+    def write(self, record):
+        msg = record.msg
+        self._file.write(RECORD.pack(bytes(record.from_addr), bytes(record.sign), bytes(record.erc20_eth),
+                                     bytes(record.payer_eth), bytes(record.receiver_eth), self._key(record.erc20_sol),
+                                     self._key(record.erc20_code), self._key(record.payer_sol), len(msg)))
+        self._file.write(msg)
+        self.records += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        keys_offset = self._file.tell()
+        for key in self._keys:
+            decoded = base58.b58decode(key)
+            if len(decoded) != KEY_SIZE:
+                raise Exception("TrxWriter: {} is not an account key".format(key))
+            self._file.write(decoded)
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(self._keys), self.records, keys_offset))
+        self._file.close()
+        self._file = None
+
+    def abort(self):
+        """Drop an unfinished file, e.g. after create_trx failed partway."""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        os.remove(self.path)
+
+
+class TrxReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        (magic, version, record_size, key_count, self.records, self._keys_offset) = \
+            HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise Exception("{} is not a transaction store of version {}".format(path, VERSION))
+        if self._keys_offset == 0:
+            raise Exception("{} was not closed".format(path))
+        # the few distinct keys are encoded once
+        self.keys = [base58.b58encode(bytes(self._view[offset:offset + KEY_SIZE])).decode()
+                     for offset in range(self._keys_offset, self._keys_offset + key_count * KEY_SIZE, KEY_SIZE)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.records
+
+    def _key(self, index):
+        return "" if index == NO_KEY else self.keys[index]
+
+    def __iter__(self):
+        view = self._view
+        pos = HEADER.size
+        for _ in range(self.records):
+            (erc20_sol, erc20_code, payer_sol, length) = KEYS_AND_LENGTH.unpack_from(view, pos + 145)
+            end = pos + RECORD.size + length
+            yield TrxRecord(view[pos:pos + 20], view[pos + 20:pos + 85], view[pos + RECORD.size:end],
+                            self._key(erc20_sol), view[pos + 85:pos + 105], self._key(erc20_code),
+                            self._key(payer_sol), view[pos + 105:pos + 125], view[pos + 125:pos + 145])
+            pos = end
+
+    def close(self):
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # records still in use keep the mapping alive until they are collected
+            pass
+
+
+class JsonTrxWriter:
+    """TrxWriter for the transaction.json lines."""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self._file = open(path, 'w')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, record):
+        self._file.write(json.dumps(record.to_json()) + "\n")
+        self.records += 1
+
+    def close(self):
+        self._file.close()
+
+
+def read_json_records(path):
+    with open(path) as f:
+        for line in f:
+            yield TrxRecord.from_json(json.loads(line))
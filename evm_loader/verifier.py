@@ -0,0 +1,165 @@
+"""Streaming, concurrent and resumable verification of the transactions of a benchmark run.
+
+verify_trx read the verify file line by line with one blocking getConfirmedTransaction
+per line. Verifier reads it in windows of `window` lines, fetches the receipts of a window
+concurrently (at most `concurrency` requests in flight) on the event loop of an
+rpc_client.RpcClient and retries receipts the node does not have yet with an exponential
+backoff. Every receipt is decoded once (evm_events) and classified into one of OUTCOMES;
+one line `signature outcome slot` per transaction goes to a results file. After every
+window the offsets of both files and the counters are saved to a checkpoint, so an
+interrupted run continues where it stopped.
+"""
+import asyncio
+import json
+import os
+from collections import Counter
+
+from evm_events import decode_transaction
+
+SUCCESS = 'success'
+REVERT = 'revert'
+# succeeded, but without the expected events
+EVENT = 'event'
+NONCE = 'nonce'
+TOO_SMALL = 'too_small'
+UNKNOWN = 'unknown'
+# no receipt after all retries
+MISSING = 'missing'
+OUTCOMES = (SUCCESS, REVERT, EVENT, NONCE, TOO_SMALL, UNKNOWN, MISSING)
+
+
+def classify(decoded, check=None):
+    """Outcome of an evm_events.DecodedTransaction (None without receipt); check(decoded) validates the events."""
+    if decoded is None:
+        return MISSING
+    if decoded.error is not None:
+        reasons = (decoded.error.get('InstructionError') or []) if isinstance(decoded.error, dict) else []
+        if "InvalidArgument" in reasons:
+            return NONCE
+        if "AccountDataTooSmall" in reasons:
+            return TOO_SMALL
+        return UNKNOWN
+    # the rule of tools.found_revert: a revert status only counts without events
+    if decoded.reverted and not decoded.events:
+        return REVERT
+    if check is not None and not check(decoded):
+        return EVENT
+    return SUCCESS
+
+
+def load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'offset': 0, 'results_offset': 0, 'lines': 0, 'counts': {}}
+
+
+def save_checkpoint(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+class Verifier:
+    def __init__(self, rpc, check=None, concurrency=64, retries=5, retry_delay=1.0, window=1000, index=None):
+        """rpc is an rpc_client.RpcClient; check(record, decoded) validates the events of a verify file record.
+
+        index (evm_events.EventIndex) keeps decoded receipts, indexed ones are not fetched again.
+        """
+        self.rpc = rpc
+        self.check = check
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.window = window
+        self.index = index
+        self.counts = Counter()
+        self.retried = 0
+        self.rpc_errors = 0
+
+    async def fetch(self, signature, semaphore):
+        """DecodedTransaction of the signature, None if the node has no receipt after all retries."""
+        if self.index is not None:
+            decoded = self.index.get(signature)
+            if decoded is not None:
+                return decoded
+        for attempt in range(self.retries + 1):
+            try:
+                async with semaphore:
+                    response = await self.rpc.rpc.get_confirmed_transaction(signature)
+            except Exception:
+                response = None
+                self.rpc_errors += 1
+            decoded = decode_transaction(response)
+            if decoded is not None:
+                if self.index is not None:
+                    self.index.add(decoded, signature)
+                return decoded
+            if attempt < self.retries:
+                self.retried += 1
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+        return None
+
+    async def _verify(self, record, semaphore):
+        decoded = await self.fetch(record[-1], semaphore)
+        check = None
+        if self.check is not None:
+            check = lambda decoded: self.check(record, decoded)
+        return (record[-1], classify(decoded, check), decoded.slot if decoded is not None else None)
+
+    async def verify_window(self, records):
+        """[(signature, outcome, slot)] of verify file records, the signature is the last field of a record."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*[self._verify(record, semaphore) for record in records])
+
+    def run(self, path, results_path, checkpoint_path=None, count=None, resume=False):
+        """Verify the first `count` records of the verify file `path`, continue from the checkpoint if resume."""
+        state = load_checkpoint(checkpoint_path) if resume else load_checkpoint(None)
+        self.counts = Counter(state['counts'])
+        lines = state['lines']
+        with open(path, 'rb') as verify, open(results_path, 'ab') as results:
+            # results of a window written after the last checkpoint are written again
+            results.truncate(state['results_offset'])
+            verify.seek(state['offset'])
+            while count is None or lines < count:
+                records = []
+                while len(records) < self.window and (count is None or lines + len(records) < count):
+                    line = verify.readline()
+                    if not line:
+                        break
+                    if line.strip():
+                        records.append(json.loads(line))
+                if not records:
+                    break
+                for (signature, outcome, slot) in self.rpc.run(self.verify_window(records)):
+                    self.counts[outcome] += 1
+                    results.write("{} {} {}\n".format(signature, outcome, slot).encode())
+                results.flush()
+                if self.index is not None:
+                    self.index.flush()
+                lines += len(records)
+                state = {'offset': verify.tell(), 'results_offset': results.tell(), 'lines': lines,
+                         'counts': dict(self.counts)}
+                if checkpoint_path:
+                    save_checkpoint(checkpoint_path, state)
+                print("verified {}: {}".format(lines, self.counts[SUCCESS]))
+        return self.summary()
+
+    def summary(self):
+        summary = {outcome: self.counts[outcome] for outcome in OUTCOMES}
+        summary['total'] = sum(self.counts.values())
+        summary['retried'] = self.retried
+        summary['rpc_errors'] = self.rpc_errors
+        return summary
+
+    def write_summary(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=1)
+
+    def report(self):
+        summary = self.summary()
+        print("\ntotal:", summary['total'])
+        for outcome in OUTCOMES:
+            print("{}: {}".format(outcome, summary[outcome]))
+        print("receipts retried: {}, rpc errors: {}".format(self.retried, self.rpc_errors))
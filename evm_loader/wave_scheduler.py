@@ -0,0 +1,121 @@
+"""Sending of pre-signed transactions in waves of transactions without common accounts.
+
+The evm_loader locks the ether accounts a transaction uses (rw_blocked_acc and
+ro_blocked_cnt of ACCOUNT_INFO_LAYOUT), so two transactions in flight that write the
+same account, e.g. the same hot ERC20 contract, collide and one of them fails. The
+WaveScheduler partitions a queue of transactions with their writable and read-only
+account sets (from the emulator or declared per transaction type) into waves: no
+transaction of a wave writes an account another one of the wave reads or writes, and a
+transaction never runs before an earlier one it conflicts with, so the nonces of a
+caller stay in order. Each wave is dispatched concurrently and the next wave starts
+once it is done.
+"""
+import statistics
+from typing import Any, NamedTuple
+
+
+class WaveItem(NamedTuple):
+    tx: Any
+    writable: frozenset
+    readonly: frozenset = frozenset()
+
+
+def account_sets_from_emulation(result):
+    """(writable, readonly) Solana accounts of an emulator.EmulationResult."""
+    writable = frozenset(result.writable_accounts)
+    used = {account["account"] for account in result.accounts}
+    used.update(account["contract"] for account in result.accounts if account.get("contract"))
+    used.update(account["pubkey"] for account in result.solana_accounts)
+    return (writable, frozenset(used) - writable)
+
+
+def partition_waves(items, max_width=None):
+    """Lists of WaveItems; a transaction goes to the first wave after every earlier conflicting one."""
+    waves = []
+    # account -> last wave that writes / reads it
+    last_write = {}
+    last_read = {}
+    for item in items:
+        wave = 0
+        for account in item.writable:
+            wave = max(wave, last_write.get(account, -1) + 1, last_read.get(account, -1) + 1)
+        for account in item.readonly:
+            wave = max(wave, last_write.get(account, -1) + 1)
+        while max_width and wave < len(waves) and len(waves[wave]) >= max_width:
+            wave += 1
+        if wave == len(waves):
+            waves.append([])
+        waves[wave].append(item)
+        for account in item.writable:
+            last_write[account] = max(last_write.get(account, -1), wave)
+        for account in item.readonly:
+            last_read[account] = max(last_read.get(account, -1), wave)
+    return waves
+
+
+def _conflict(a, b):
+    return bool(a.writable & (b.writable | b.readonly) or b.writable & a.readonly)
+
+
+def file_order_conflicts(items, width):
+    """Transactions that would be in flight with a conflicting one if sent in file order, `width` at a time."""
+    conflicts = 0
+    for i in range(0, len(items), max(int(width), 1)):
+        window = items[i:i + max(int(width), 1)]
+        for (j, item) in enumerate(window):
+            if any(_conflict(item, other) for other in window[:j]):
+                conflicts += 1
+    return conflicts
+
+
+class WaveStats:
+    def __init__(self):
+        self.widths = []
+        self.transactions = 0
+        # conflicts file-order sending with the same width would have run into
+        self.conflicts_avoided = 0
+
+    def add(self, waves, items):
+        widths = [len(wave) for wave in waves]
+        self.widths.extend(widths)
+        self.transactions += len(items)
+        if widths:
+            self.conflicts_avoided += file_order_conflicts(items, statistics.mean(widths))
+
+    def report(self):
+        if not self.widths:
+            print("waves: none")
+            return
+        print("waves: {}, transactions: {}, width mean {:.1f} max {}, lock conflicts avoided: {}".format(
+            len(self.widths), self.transactions, statistics.mean(self.widths), max(self.widths),
+            self.conflicts_avoided))
+
+
+class WaveScheduler:
+    def __init__(self, dispatch, max_width=None, batch=1000):
+        """dispatch(txs) sends the transactions of one wave concurrently, waits for them and returns their results.
+
+        The queue is partitioned `batch` transactions at a time, so it can be streamed.
+        """
+        self.dispatch = dispatch
+        self.max_width = max_width
+        self.batch = batch
+        self.stats = WaveStats()
+
+    def run(self, items):
+        """Yield (WaveItem, dispatch result) wave by wave."""
+        pending = []
+        for item in items:
+            pending.append(item)
+            if len(pending) >= self.batch:
+                yield from self._run_batch(pending)
+                pending = []
+        if pending:
+            yield from self._run_batch(pending)
+
+    def _run_batch(self, items):
+        waves = partition_waves(items, self.max_width)
+        self.stats.add(waves, items)
+        for wave in waves:
+            results = self.dispatch([item.tx for item in wave])
+            yield from zip(wave, results)